@@ -1,8 +1,12 @@
 """Do some CPU bound work synchronously."""
 import time
+from collections.abc import Iterable
 
+from math_backends import BACKENDS, do_math
 from rich import print
 
+ITERATIONS = 2_000_000
+
 
 def main():
     print("Starting tasks...", flush=True)
@@ -16,20 +20,25 @@ def main():
     print(f"\n{results=}", flush=True)
 
 
-def do_lots_of_math() -> list[float]:
-    return [do_math_once(num) for num in range(1, 21)]
+def do_lots_of_math(
+    starting_numbers: Iterable[int] = range(1, 21),
+    iterations: int = ITERATIONS,
+    backend: str | None = None,
+) -> list[float]:
+    """Do the math for each starting number, one after another.
+
+    With a `backend` from `math_backends.BACKENDS`, its kernel does all the
+    numbers in one call instead.
+    """
+    if backend is not None:
+        return BACKENDS[backend](list(starting_numbers), iterations)
+    return [do_math_once(num, iterations) for num in starting_numbers]
 
 
-def do_math_once(starting_number: int = 1) -> float:
+def do_math_once(starting_number: int = 1, iterations: int = ITERATIONS) -> float:
     """Do some CPU bound work."""
     print(f"[yellow]Doing math, {starting_number=}...", flush=True)
-    x = starting_number
-    for _ in range(2_000_000):
-        x **= 4
-        x **= 0.25
-        x **= 2
-        x **= 0.5
-        x += 1
+    x = do_math(starting_number, iterations)
     print(f"[green]Done with math, {starting_number=}.", flush=True)
     return x
 
@@ -1,10 +1,24 @@
-"""Do some CPU bound work synchronously."""
+"""Do some CPU bound work on threads.
+
+With the plain Python math, threads take turns holding the GIL, so they're no
+faster than doing the work synchronously. Pass a `backend` from
+`math_backends.BACKENDS` to split the numbers into one chunk per thread
+instead: the "numpy" backend lets go of the GIL while it works, so the same
+threads can each use a core (`bench_gil_scaling.py` compares them).
+"""
+import math
+import os
 import time
+from collections.abc import Callable, Iterable, Sequence
 from concurrent.futures import ThreadPoolExecutor as PoolExecutor
-from typing import Any, Callable
+from typing import Any
 
+from math_backends import BACKENDS, do_math
 from rich import print
 
+ITERATIONS = 2_000_000
+MAX_WORKERS = os.cpu_count() or 1
+
 
 def main():
     print("Starting tasks...", flush=True)
@@ -21,12 +35,21 @@ def main():
 TaskType = tuple[Callable[..., Any], tuple[Any, ...], dict[str, Any]]
 
 
-def do_lots_of_math() -> list[float]:
+def do_lots_of_math(
+    starting_numbers: Iterable[int] = range(1, 21),
+    iterations: int = ITERATIONS,
+    backend: str | None = None,
+    max_workers: int = MAX_WORKERS,
+) -> list[float]:
+    if backend is not None:
+        return do_lots_of_math_in_chunks(
+            list(starting_numbers), iterations, backend, max_workers
+        )
     print("Defining tasks...", flush=True)
     tasks: list[TaskType] = [
         # Function, args, kwargs
-        (do_math_once, (num,), {})
-        for num in range(1, 21)
+        (do_math_once, (num,), {"iterations": iterations})
+        for num in starting_numbers
     ]
     print("Kick off multiprocess tasks...", flush=True)
     with PoolExecutor() as executor:
@@ -36,16 +59,30 @@ def do_lots_of_math() -> list[float]:
     return [future.result() for future in work]
 
 
-def do_math_once(starting_number: int = 1) -> float:
+def do_lots_of_math_in_chunks(
+    starting_numbers: Sequence[int],
+    iterations: int = ITERATIONS,
+    backend: str = "numpy",
+    max_workers: int = MAX_WORKERS,
+) -> list[float]:
+    """Give each thread one chunk of the numbers, for `backend`'s kernel."""
+    kernel = BACKENDS[backend]
+    size = max(math.ceil(len(starting_numbers) / max_workers), 1)
+    chunks = [
+        starting_numbers[start : start + size]
+        for start in range(0, len(starting_numbers), size)
+    ]
+    print(f"Kick off {len(chunks)} {backend} chunks...", flush=True)
+    with PoolExecutor(max_workers) as executor:
+        work = [executor.submit(kernel, chunk, iterations) for chunk in chunks]
+    print("Done with work", flush=True)
+    return [result for future in work for result in future.result()]
+
+
+def do_math_once(starting_number: int = 1, iterations: int = ITERATIONS) -> float:
     """Do some CPU bound work."""
     print(f"[yellow]Doing math, {starting_number=}...", flush=True)
-    x = starting_number
-    for _ in range(2_000_000):
-        x **= 4
-        x **= 0.25
-        x **= 2
-        x **= 0.5
-        x += 1
+    x = do_math(starting_number, iterations)
     print(f"[green]Done with math, {starting_number=}.", flush=True)
     return x
 
@@ -1,9 +1,23 @@
 """Do some CPU bound work synchronously."""
+import math
+import os
 import time
+from collections.abc import Callable, Iterable, Iterator, Sized
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from concurrent.futures.process import ProcessPoolExecutor as PoolExecutor
-from typing import Any, Callable
+from itertools import islice
+from typing import Any
 
+from math_backends import BACKENDS, do_math
 from rich import print
+from warm_pool import WarmPool
+
+ITERATIONS = 2_000_000
+MAX_WORKERS = os.cpu_count() or 1
+# `iter_math` aims for this many chunks per worker when it picks the chunk size,
+# and uses `DEFAULT_CHUNKSIZE` when it can't tell how many numbers there are.
+CHUNKS_PER_WORKER = 4
+DEFAULT_CHUNKSIZE = 64
 
 
 def main():
@@ -21,31 +35,133 @@ def main():
 TaskType = tuple[Callable[..., Any], tuple[Any, ...], dict[str, Any]]
 
 
-def do_lots_of_math() -> list[float]:
+def do_lots_of_math(
+    starting_numbers: Iterable[int] = range(1, 21),
+    iterations: int = ITERATIONS,
+    chunksize: int | None = None,
+    pool: WarmPool | None = None,
+    backend: str | None = None,
+) -> list[float]:
+    """Do the math for each starting number, in a pool of processes.
+
+    With a `chunksize` or a `backend` from `math_backends.BACKENDS`, the
+    numbers are sent to the workers in chunks (see `iter_math`) instead of one
+    task per number. Without a `pool`, a new one is started for this call, and
+    shut down once it's done.
+    """
+    if chunksize is not None or backend is not None:
+        starting_numbers = list(starting_numbers)
+        results = dict(
+            iter_math(
+                starting_numbers, iterations, chunksize, pool=pool, backend=backend
+            )
+        )
+        return [results[num] for num in starting_numbers]
     print("Defining tasks...", flush=True)
     tasks: list[TaskType] = [
         # Function, args, kwargs
-        (do_math_once, (num,), {})
-        for num in range(1, 21)
+        (do_math_once, (num,), {"iterations": iterations})
+        for num in starting_numbers
     ]
     print("Kick off multiprocess tasks...", flush=True)
-    with PoolExecutor() as executor:
+    with pool.borrow() if pool else PoolExecutor() as executor:
         work = [executor.submit(func, *args, **kwargs) for func, args, kwargs in tasks]
         print("Waiting for work...", flush=True)
     print("Done with work", flush=True)
     return [future.result() for future in work]
 
 
-def do_math_once(starting_number: int = 1) -> float:
+def iter_math(
+    starting_numbers: Iterable[int] = range(1, 21),
+    iterations: int = ITERATIONS,
+    chunksize: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    pool: WarmPool | None = None,
+    backend: str | None = None,
+) -> Iterator[tuple[int, float]]:
+    """Like `do_lots_of_math`, but send the numbers to the workers in chunks.
+
+    Each task is a whole chunk of `chunksize` numbers, so pickling and passing
+    it between processes is paid once per chunk rather than once per number.
+    Without a `chunksize`, one is picked from how many numbers there are.
+
+    Yields `(starting_number, result)` for each chunk as soon as it's done, so
+    results come in completion order. At most two chunks per worker are
+    submitted at a time, so `starting_numbers` can be as long as you like
+    without piling up futures.
+
+    Runs on `pool` if given (it has its own number of workers), or else on a
+    new pool of `max_workers` processes. Each chunk is done by `backend`'s
+    kernel, or the plain Python loop by default.
+    """
+    if pool is not None:
+        max_workers = pool.max_workers
+    if chunksize is None:
+        chunksize = auto_chunksize(starting_numbers, max_workers)
+    pending: set[Future[list[tuple[int, float]]]] = set()
+    with pool.borrow() if pool else PoolExecutor(max_workers) as executor:
+        try:
+            for chunk in chunked(starting_numbers, chunksize):
+                if len(pending) >= max_workers * 2:
+                    yield from take_finished(pending)
+                pending.add(executor.submit(do_math_chunk, chunk, iterations, backend))
+            while pending:
+                yield from take_finished(pending)
+        finally:
+            for future in pending:
+                future.cancel()  # The caller stopped early
+
+
+def auto_chunksize(starting_numbers: Iterable[int], max_workers: int) -> int:
+    """Pick a chunk size that gives each worker about `CHUNKS_PER_WORKER` chunks.
+
+    That's the same rule `multiprocessing.Pool.map` uses. Fewer, bigger chunks
+    would leave workers idle at the end, when one is still on its last chunk.
+    """
+    if not isinstance(starting_numbers, Sized):
+        return DEFAULT_CHUNKSIZE
+    return max(math.ceil(len(starting_numbers) / (max_workers * CHUNKS_PER_WORKER)), 1)
+
+
+def chunked(items: Iterable[int], size: int) -> Iterator[list[int]]:
+    """Split `items` into lists of `size` (the last one may be shorter)."""
+    iterator = iter(items)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def take_finished(
+    pending: set[Future[list[tuple[int, float]]]]
+) -> Iterator[tuple[int, float]]:
+    """Wait for at least one chunk to finish and yield (and forget) its results."""
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+        yield from future.result()
+
+
+def do_math_chunk(
+    starting_numbers: list[int],
+    iterations: int = ITERATIONS,
+    backend: str | None = None,
+) -> list[tuple[int, float]]:
+    """Do `do_math_once` for a chunk of numbers, with one progress print each way."""
+    print(f"[yellow]Doing math, {len(starting_numbers)} numbers...", flush=True)
+    if backend is not None:
+        kernel_results = BACKENDS[backend](starting_numbers, iterations)
+        results = list(zip(starting_numbers, kernel_results))
+    else:
+        results = [(num, do_math(num, iterations)) for num in starting_numbers]
+    print(f"[green]Done with math, {len(starting_numbers)} numbers.", flush=True)
+    return results
+
+
+def do_math_once(starting_number: int = 1, iterations: int = ITERATIONS) -> float:
     """Do some CPU bound work."""
     print(f"[yellow]Doing math, {starting_number=}...", flush=True)
-    x = starting_number
-    for _ in range(2_000_000):
-        x **= 4
-        x **= 0.25
-        x **= 2
-        x **= 0.5
-        x += 1
+    x = do_math(starting_number, iterations)
     print(f"[green]Done with math, {starting_number=}.", flush=True)
     return x
 
@@ -0,0 +1,62 @@
+"""Do the same CPU bound work with NumPy, every starting number at once.
+
+The other scripts step one Python float at a time. Here each starting number in
+a batch is one slot of an array, and each step of the math is a single
+in-place ufunc call over the whole batch. The interpreter's overhead is paid
+once per step of the batch instead of once per step of every number, so the
+win grows with the batch size (`bench_vectorized.py` measures it).
+"""
+import time
+from collections.abc import Sequence
+
+import numpy as np
+from math_backends import do_math_in_place
+from rich import print
+
+ITERATIONS = 2_000_000
+# How many starting numbers share one array. Past a few thousand numbers,
+# bigger batches stop paying off.
+BATCH_SIZE = 4096
+
+
+def main():
+    print("Starting tasks...", flush=True)
+    t0 = time.time()
+    results = do_lots_of_math()
+    total_seconds = time.time() - t0
+    print(
+        f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
+        flush=True,
+    )
+    print(f"\n{results=}", flush=True)
+
+
+def do_lots_of_math(
+    starting_numbers: Sequence[int] = range(1, 21),
+    iterations: int = ITERATIONS,
+    batch_size: int = BATCH_SIZE,
+) -> list[float]:
+    """Run `do_math_batch` over `starting_numbers`, `batch_size` at a time.
+
+    One buffer is allocated up front and reused for every batch.
+    """
+    buffer = np.empty(min(batch_size, len(starting_numbers)), dtype=np.float64)
+    results: list[float] = []
+    for start in range(0, len(starting_numbers), batch_size):
+        batch = starting_numbers[start : start + batch_size]
+        x = buffer[: len(batch)]
+        x[:] = batch
+        results.extend(do_math_batch(x, iterations).tolist())
+    return results
+
+
+def do_math_batch(x: np.ndarray, iterations: int = ITERATIONS) -> np.ndarray:
+    """Do `do_math_once` for every starting number in `x`, in place."""
+    print(f"[yellow]Doing math, {len(x)} starting numbers...", flush=True)
+    do_math_in_place(x, iterations)
+    print(f"[green]Done with math, {len(x)} starting numbers.", flush=True)
+    return x
+
+
+if __name__ == "__main__":
+    main()
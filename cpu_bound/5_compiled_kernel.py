@@ -0,0 +1,63 @@
+"""Do the same CPU bound work, after letting `kernel_compiler` simplify the math.
+
+`do_math_once`'s loop body is registered in `kernel_compiler.KERNELS`. The
+compiler folds `x **= 4; x **= 0.25` and `x **= 2; x **= 0.5` away, leaving
+`x += 1`, which has a closed form. Run with `--strict` to only use it once it's
+been checked to give bit-for-bit the same floats as the literal loop.
+"""
+import argparse
+import time
+from collections.abc import Iterable
+
+from kernel_compiler import KERNELS, CompiledKernel, compile_kernel
+from rich import print
+
+ITERATIONS = 2_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Do some CPU bound work.")
+    parser.add_argument("--kernel", choices=KERNELS, default="do_math")
+    parser.add_argument("--strict", action="store_true")
+    args = parser.parse_args()
+    print("Compiling the kernel...", flush=True)
+    t0 = time.time()
+    kernel = compile_kernel(KERNELS[args.kernel], strict=args.strict)
+    print(
+        f"[blue]Compiled to a [cyan]{kernel.plan}[/cyan] "
+        f"in {time.time() - t0:,.2f} seconds:\n{kernel.source}",
+        flush=True,
+    )
+    print("Starting tasks...", flush=True)
+    t0 = time.time()
+    results = do_lots_of_math(kernel)
+    total_seconds = time.time() - t0
+    print(
+        f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
+        flush=True,
+    )
+    print(f"\n{results=}", flush=True)
+
+
+def do_lots_of_math(
+    kernel: CompiledKernel,
+    starting_numbers: Iterable[int] = range(1, 21),
+    iterations: int = ITERATIONS,
+) -> list[float]:
+    return [do_math_once(kernel, num, iterations) for num in starting_numbers]
+
+
+def do_math_once(
+    kernel: CompiledKernel, starting_number: int = 1, iterations: int = ITERATIONS
+) -> float:
+    """Do some CPU bound work, the cheapest way the compiler found."""
+    print(f"[yellow]Doing math, {starting_number=}...", flush=True)
+    if not kernel.can_take_shortcut(starting_number, iterations):
+        print(f"[red]No shortcut for {starting_number=}, running the loop.", flush=True)
+    x = kernel(starting_number, iterations)
+    print(f"[green]Done with math, {starting_number=}.", flush=True)
+    return x
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measure the process pool's throughput against chunk size and input count.
+
+Each starting number only gets a little math here (`--iterations`), like the
+millions of small inputs real jobs have. That makes the cost of sending each
+task to a worker and its result back stand out. The unchunked row submits one
+future per number, like `do_lots_of_math` without a chunk size; the rest send
+chunks with `iter_math`, the last using the chunk size it picks by itself.
+"""
+import argparse
+import time
+from collections.abc import Callable
+
+from bench_utils import load_script, silence
+from rich import print
+from rich.table import Table
+
+ITERATIONS = 100
+INPUT_COUNTS = (1_000, 10_000, 100_000)
+CHUNK_SIZES = (1, 10, 100, 1_000, 10_000)
+
+multiprocess = load_script("3_multiprocess")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    args = parser.parse_args()
+    silence(multiprocess)
+
+    table = Table(
+        title=(
+            f"Numbers/sec with {multiprocess.MAX_WORKERS} workers, "
+            f"{args.iterations:,} iterations each"
+        )
+    )
+    table.add_column("Chunk size", justify="right")
+    for count in INPUT_COUNTS:
+        table.add_column(f"{count:,} numbers", justify="right")
+
+    runs: dict[str, Callable[[range], list[float]]] = {
+        "unchunked": lambda nums: multiprocess.do_lots_of_math(nums, args.iterations),
+    }
+    for chunksize in CHUNK_SIZES:
+        runs[f"{chunksize:,}"] = lambda nums, chunksize=chunksize: (
+            multiprocess.do_lots_of_math(nums, args.iterations, chunksize)
+        )
+    runs["auto"] = lambda nums: [
+        result for _, result in multiprocess.iter_math(nums, args.iterations)
+    ]
+    for name, run in runs.items():
+        row = []
+        for count in INPUT_COUNTS:
+            starting_numbers = range(1, count + 1)
+            t0 = time.perf_counter()
+            results = run(starting_numbers)
+            throughput = count / (time.perf_counter() - t0)
+            if len(results) != count:
+                raise AssertionError(f"{name}: {len(results)} results for {count}")
+            row.append(f"{throughput:,.0f}")
+        table.add_row(name, *row)
+        print(f"Done with chunk size {name}.", flush=True)
+    print(table)
+    auto_sizes = ", ".join(
+        f"{multiprocess.auto_chunksize(range(count), multiprocess.MAX_WORKERS):,}"
+        for count in INPUT_COUNTS
+    )
+    print(f"The auto chunk sizes were {auto_sizes}.")
+
+
+if __name__ == "__main__":
+    main()
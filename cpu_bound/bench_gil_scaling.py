@@ -0,0 +1,86 @@
+"""Compare how the GIL-bound and GIL-releasing kernels scale with threads.
+
+Each run splits the same starting numbers into one chunk per thread with
+`2_threaded_no_improvement.do_lots_of_math_in_chunks`. The "python" kernel
+holds the GIL, so its threads take turns and extra threads add nothing. The
+"numpy" and "numba" kernels let go of it while they loop over each chunk, so
+their threads can use a core each. (Without Numba installed, the "numba"
+column is the python kernel again.) Numba compiles its kernel before anything
+is timed. "Cores busy" is CPU time over wall time: about 1 for a kernel whose
+threads take turns, up to the number of threads for one that doesn't.
+"""
+import argparse
+import math
+import os
+import time
+
+from bench_utils import load_script, silence
+from math_backends import BACKENDS, COMPILED, gil_enabled
+from rich import print
+from rich.table import Table
+
+ITERATIONS = 500
+STARTING_NUMBERS = range(1, 16_385)
+CORES = os.cpu_count() or 1
+
+threaded = load_script("2_threaded_no_improvement")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    args = parser.parse_args()
+    silence(threaded)
+    if COMPILED:
+        # Compile now, so the first timed run doesn't include compiling.
+        t0 = time.perf_counter()
+        BACKENDS["numba"]([1], 1)
+        print(f"Numba compiled its kernel in {time.perf_counter() - t0:,.2f}s.")
+
+    thread_counts = sorted({2**i for i in range((2 * CORES).bit_length())} | {CORES})
+    table = Table(
+        title=(
+            f"{len(STARTING_NUMBERS):,} numbers x {args.iterations:,} iterations "
+            f"on {CORES} cores"
+        ),
+        caption="Seconds, speedup over 1 thread, and cores busy for each kernel",
+    )
+    table.add_column("Threads", justify="right")
+    for backend in BACKENDS:
+        table.add_column(backend, justify="right")
+        table.add_column("Speedup", justify="right")
+        table.add_column("Cores", justify="right")
+    baselines: dict[str, float] = {}
+    expected = None
+    for threads in thread_counts:
+        row = [str(threads)]
+        for backend in BACKENDS:
+            t0, cpu0 = time.perf_counter(), time.process_time()
+            results = threaded.do_lots_of_math_in_chunks(
+                STARTING_NUMBERS, args.iterations, backend, threads
+            )
+            seconds = time.perf_counter() - t0
+            cpu_seconds = time.process_time() - cpu0
+            if expected is None:
+                expected = results
+            elif not all(
+                # The backends may round differently; only rounding error is OK.
+                math.isclose(result, want, rel_tol=1e-12)
+                for result, want in zip(results, expected, strict=True)
+            ):
+                raise AssertionError(f"{backend} on {threads} threads differs")
+            baseline = baselines.setdefault(backend, seconds)
+            row += [
+                f"{seconds:,.3f}",
+                f"{baseline / seconds:,.2f}x",
+                f"{cpu_seconds / seconds:,.2f}",
+            ]
+        table.add_row(*row)
+    print(table)
+    print(f"GIL enabled: {gil_enabled()}")
+    if CORES == 1:
+        print("[yellow]Only one core here, so no kernel can scale.")
+
+
+if __name__ == "__main__":
+    main()
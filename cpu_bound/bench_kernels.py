@@ -0,0 +1,86 @@
+"""Time every kernel in `math_backends` on every driver.
+
+The drivers are the sync, threaded and process pool scripts, each passed
+`backend=...`. The sync driver runs the kernel once over all the numbers. The
+threaded one gives each thread a chunk. The process pool one sends chunks to
+its workers. A kernel's speedup and a driver's speedup multiply, as long as
+the kernel lets go of the GIL (for threads) and the machine has spare cores
+(for threads and processes).
+
+Every cell is compared with the python kernel on the sync driver: it shows the
+seconds and the speedup over that, and the results must match it.
+"""
+import argparse
+import math
+import os
+import time
+
+from bench_utils import load_script, silence
+from math_backends import BACKENDS, COMPILED
+from rich import print
+from rich.table import Table
+
+ITERATIONS = 500
+STARTING_NUMBERS = range(1, 4097)
+
+sync = load_script("1_sync")
+threaded = load_script("2_threaded_no_improvement")
+multiprocess = load_script("3_multiprocess")
+
+DRIVERS = {
+    "sync": sync.do_lots_of_math,
+    "threaded": threaded.do_lots_of_math,
+    "multiprocess": multiprocess.do_lots_of_math,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    args = parser.parse_args()
+    silence(sync, threaded, multiprocess)
+
+    if COMPILED:
+        # Compile before forking workers, so each doesn't compile its own.
+        t0 = time.perf_counter()
+        BACKENDS["numba"]([1], 1)
+        print(f"Numba compiled its kernel in {time.perf_counter() - t0:,.2f}s.")
+    else:
+        print("[yellow]Numba isn't installed, so its row is the python kernel.")
+
+    table = Table(
+        title=(
+            f"{len(STARTING_NUMBERS):,} numbers x {args.iterations:,} iterations "
+            f"on {os.cpu_count()} cores"
+        ),
+        caption="Seconds (speedup vs the python kernel on the sync driver)",
+    )
+    table.add_column("Kernel")
+    for driver in DRIVERS:
+        table.add_column(driver, justify="right")
+    baseline = None
+    expected = None
+    for backend in BACKENDS:
+        row = [backend]
+        for driver, do_lots_of_math in DRIVERS.items():
+            t0 = time.perf_counter()
+            results = do_lots_of_math(
+                STARTING_NUMBERS, args.iterations, backend=backend
+            )
+            seconds = time.perf_counter() - t0
+            if expected is None:
+                baseline, expected = seconds, results
+            elif not all(
+                # NumPy and numba needn't round exactly like Python does.
+                math.isclose(result, want, rel_tol=1e-12)
+                for result, want in zip(results, expected, strict=True)
+            ):
+                raise AssertionError(f"{backend} on {driver} differs")
+            row.append(f"{seconds:,.3f} ({baseline / seconds:,.1f}x)")
+        table.add_row(*row)
+        print(f"Done with {backend}.", flush=True)
+    print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare a new process pool per job with one warm pool, for small jobs.
+
+Each job is `3_multiprocess.do_lots_of_math` over 20 numbers with only a little
+math each (`--iterations`), so starting the pool is most of the work:
+
+- Cold: a new pool for every job, as `do_lots_of_math` does on its own. Every
+  job pays for starting the workers, and (except with "fork") for each worker
+  importing `3_multiprocess` and `rich`.
+- Warm: one `WarmPool` for every job. Its workers are started and preloaded
+  once (the warm-up column), and every job after that just sends them tasks.
+
+Each start method the platform supports is measured.
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+from collections.abc import Callable
+from functools import partial
+
+from bench_utils import load_script, silence
+from rich import print
+from rich.table import Table
+from warm_pool import WarmPool
+
+ITERATIONS = 100
+JOBS = 10
+STARTING_NUMBERS = range(1, 21)
+PRELOAD = ("rich", "3_multiprocess")
+
+multiprocess = load_script("3_multiprocess")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    args = parser.parse_args()
+    silence(multiprocess)
+
+    table = Table(
+        title=(
+            f"{len(STARTING_NUMBERS)} numbers x {args.iterations:,} iterations "
+            f"per job, {multiprocess.MAX_WORKERS} workers"
+        )
+    )
+    table.add_column("Start method")
+    table.add_column("Cold job (ms)", justify="right")
+    table.add_column("Warm-up (ms)", justify="right")
+    table.add_column("Warm job (ms)", justify="right")
+    table.add_column("Warm speedup", justify="right")
+    for start_method in multiprocessing.get_all_start_methods():
+        cold = median_ms(partial(cold_job, start_method, args.iterations))
+        with WarmPool(
+            start_method=start_method,
+            preload=PRELOAD,
+            initializer=quiet_worker,
+        ) as pool:
+            t0 = time.perf_counter()
+            pool.warm_up()
+            warm_up_ms = (time.perf_counter() - t0) * 1000
+            warm = median_ms(
+                lambda: multiprocess.do_lots_of_math(
+                    STARTING_NUMBERS, args.iterations, pool=pool
+                )
+            )
+        table.add_row(
+            start_method,
+            f"{cold:,.1f}",
+            f"{warm_up_ms:,.1f}",
+            f"{warm:,.1f}",
+            f"{cold / warm:,.1f}x",
+        )
+        print(f"Done with {start_method}.", flush=True)
+    print(table)
+
+
+def cold_job(start_method: str, iterations: int) -> None:
+    """One job on a pool started just for it."""
+    with WarmPool(start_method=start_method, initializer=quiet_worker) as pool:
+        multiprocess.do_lots_of_math(STARTING_NUMBERS, iterations, pool=pool)
+
+
+def median_ms(job: Callable[[], object]) -> float:
+    """Run `job` `JOBS` times and return the median milliseconds it took."""
+    timings = []
+    for _ in range(JOBS):
+        t0 = time.perf_counter()
+        job()
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings) * 1000
+
+
+def quiet_worker() -> None:
+    """Silence the progress prints in a worker started with a fresh interpreter."""
+    silence(load_script("3_multiprocess"))
+
+
+if __name__ == "__main__":
+    main()
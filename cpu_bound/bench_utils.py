@@ -0,0 +1,14 @@
+"""Helpers shared by the `bench_*.py` scripts in this directory."""
+import importlib
+from types import ModuleType
+
+
+def load_script(name: str) -> ModuleType:
+    """Import one of the numbered example scripts, e.g. `1_sync`."""
+    return importlib.import_module(name)
+
+
+def silence(*modules: ModuleType) -> None:
+    """Swap out the per-number progress prints so they don't skew the timings."""
+    for module in modules:
+        module.print = lambda *args, **kwargs: None
@@ -0,0 +1,97 @@
+"""Compare the NumPy version of the math with the sync, threaded and process pool ones.
+
+The pure Python drivers do the usual 20 starting numbers; the NumPy version
+does batches of 1 up to tens of thousands of numbers. Throughput is starting
+numbers finished per second, so the speedup columns compare like with like.
+Every NumPy result is checked against the sync script's result for the same
+starting number.
+
+The full 2,000,000 iterations would take minutes at the bigger batch sizes, so
+this runs fewer (`--iterations`). The cost per iteration doesn't change.
+"""
+import argparse
+import math
+import time
+from collections.abc import Callable, Sequence
+from functools import partial
+
+from bench_utils import load_script, silence
+from rich import print
+from rich.table import Table
+
+ITERATIONS = 20_000
+BATCH_SIZES = (1, 20, 100, 1_000, 4_096, 10_000, 50_000)
+STARTING_NUMBERS = range(1, 21)
+
+sync = load_script("1_sync")
+threaded = load_script("2_threaded_no_improvement")
+multiprocess = load_script("3_multiprocess")
+vectorized = load_script("4_numpy_vectorized")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    args = parser.parse_args()
+    silence(sync, threaded, multiprocess, vectorized)
+
+    drivers = {
+        "sync": sync.do_lots_of_math,
+        "threaded": threaded.do_lots_of_math,
+        "multiprocess": multiprocess.do_lots_of_math,
+    }
+    expected = None
+    driver_throughput = {}
+    for name, do_lots_of_math in drivers.items():
+        seconds, results = timed(do_lots_of_math, STARTING_NUMBERS, args.iterations)
+        if expected is None:
+            expected = results
+        elif results != expected:
+            raise AssertionError(f"{name} doesn't match the sync results")
+        driver_throughput[name] = len(STARTING_NUMBERS) / seconds
+        print(f"{name}: {driver_throughput[name]:,.1f} numbers/sec", flush=True)
+
+    table = Table(title=f"NumPy batches, {args.iterations:,} iterations each")
+    table.add_column("Batch size", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Numbers/sec", justify="right")
+    for name in drivers:
+        table.add_column(f"vs {name}", justify="right")
+    for batch_size in BATCH_SIZES:
+        starting_numbers = range(1, batch_size + 1)
+        seconds, results = timed(
+            partial(vectorized.do_lots_of_math, batch_size=batch_size),
+            starting_numbers,
+            args.iterations,
+        )
+        check_close(results[: len(expected)], expected)
+        throughput = batch_size / seconds
+        table.add_row(
+            f"{batch_size:,}",
+            f"{seconds:,.2f}",
+            f"{throughput:,.1f}",
+            *(f"{throughput / driver_throughput[name]:,.2f}x" for name in drivers),
+        )
+    print(table)
+
+
+def timed(
+    do_lots_of_math: Callable[[Sequence[int], int], list[float]],
+    starting_numbers: Sequence[int],
+    iterations: int,
+) -> tuple[float, list[float]]:
+    """Return the seconds `do_lots_of_math` took, and its results."""
+    t0 = time.perf_counter()
+    results = do_lots_of_math(starting_numbers, iterations)
+    return time.perf_counter() - t0, results
+
+
+def check_close(results: list[float], expected: list[float]) -> None:
+    """Raise if NumPy drifted from Python's floats by more than rounding error."""
+    for num, (result, want) in enumerate(zip(results, expected), start=1):
+        if not math.isclose(result, want, rel_tol=1e-12):
+            raise AssertionError(f"Starting number {num}: {result!r} != {want!r}")
+
+
+if __name__ == "__main__":
+    main()
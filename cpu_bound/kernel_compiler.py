@@ -0,0 +1,236 @@
+"""A registry of math kernels, and a compiler that finds cheaper ways to run them.
+
+A kernel is the body of a loop like `do_math_once`'s, written down as data: a
+list of steps such as `x **= 4` or `x += 1`, run `iterations` times. As data,
+the body can be analyzed before it's turned into Python:
+
+- Two of the same operation in a row fold into one: `x **= 4; x **= 0.25` is
+  `x **= 1.0`, which does nothing, and `x += 1; x += 2` is `x += 3`. Folding
+  powers is only exact in real arithmetic, and only for x >= 0. With floats
+  each power rounds (or overflows), so the folded loop can drift.
+- A body that's nothing but `x += c` after folding has a closed form,
+  `x + c * iterations`.
+
+By default a compiled kernel takes the cheapest form whenever the starting
+number is in the domain where folding holds in real arithmetic. With
+`strict=True`, it first checks that the cheaper form gives the same floats, bit
+for bit, as the literal loop for a sweep of starting numbers, and runs the
+literal loop for anything the sweep didn't cover.
+"""
+import operator
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+Step = tuple[str, float]
+KernelFunction = Callable[[float, int], float]
+
+# The Python statement for each operation a kernel can use.
+STATEMENTS = {"pow": "x **= {!r}", "add": "x += {!r}", "mul": "x *= {!r}"}
+# How two of the same operation in a row fold into one.
+FOLDS = {"pow": operator.mul, "add": operator.add, "mul": operator.mul}
+# The operand that makes each operation do nothing.
+IDENTITIES = {"pow": 1, "add": 0, "mul": 1}
+
+
+@dataclass(frozen=True)
+class Kernel:
+    """The body of a math loop, as `(operation, operand)` steps."""
+
+    name: str
+    steps: tuple[Step, ...]
+
+    @property
+    def keeps_positive(self) -> bool:
+        """Does the body map positive numbers to positive numbers?"""
+        return not any(
+            operation == "add" and operand < 0 or operation == "mul" and operand <= 0
+            for operation, operand in self.steps
+        )
+
+    @property
+    def makes_floats(self) -> bool:
+        """Does one pass of the body turn an int into a float?"""
+        return any(isinstance(operand, float) for _, operand in self.steps)
+
+
+KERNELS: dict[str, Kernel] = {}
+
+
+def register(name: str, *steps: Step) -> Kernel:
+    """Add a kernel to `KERNELS`."""
+    if name in KERNELS:
+        raise ValueError(f"A kernel named {name!r} is already registered")
+    for operation, _ in steps:
+        if operation not in STATEMENTS:
+            raise ValueError(f"Unknown operation {operation!r} in kernel {name!r}")
+    KERNELS[name] = Kernel(name, steps)
+    return KERNELS[name]
+
+
+# The loop body of `do_math_once` in the numbered scripts.
+DO_MATH = register(
+    "do_math", ("pow", 4), ("pow", 0.25), ("pow", 2), ("pow", 0.5), ("add", 1)
+)
+
+
+def fold(steps: Iterable[Step], fold_powers: bool = True) -> tuple[Step, ...]:
+    """Fold runs of the same operation together, and drop steps that do nothing."""
+    folded: list[Step] = []
+    for operation, operand in steps:
+        if (
+            folded
+            and folded[-1][0] == operation
+            and (operation != "pow" or fold_powers)
+        ):
+            operand = FOLDS[operation](folded.pop()[1], operand)
+        if operand != IDENTITIES[operation]:
+            folded.append((operation, operand))
+    return tuple(folded)
+
+
+def loop_source(name: str, steps: Iterable[Step]) -> str:
+    """Python source for `name(x, iterations)`, running `steps` in a loop."""
+    body = "".join(
+        f"        {STATEMENTS[operation].format(operand)}\n"
+        for operation, operand in steps
+    )
+    return (
+        f"def {name}(x, iterations):\n"
+        f"    for _ in range(iterations):\n"
+        f"{body or '        pass' + chr(10)}"
+        f"    return x\n"
+    )
+
+
+def closed_form_source(name: str, increment: float, makes_floats: bool) -> str:
+    """Python source for `name(x, iterations)`, adding `increment` per iteration."""
+    to_float = "    if iterations:\n        x = float(x)\n" if makes_floats else ""
+    return (
+        f"def {name}(x, iterations):\n"
+        f"{to_float}"
+        f"    return x + {increment!r} * iterations\n"
+    )
+
+
+def build(source: str, name: str) -> KernelFunction:
+    """Compile the source for one function and return the function."""
+    namespace: dict[str, KernelFunction] = {}
+    exec(compile(source, f"<kernel {name}>", "exec"), namespace)  # noqa: S102
+    return namespace[name]
+
+
+@dataclass
+class CompiledKernel:
+    """A kernel compiled to its literal loop and, if there is one, a cheaper form.
+
+    Call it like `do_math_once`: `compiled(starting_number, iterations)`.
+    """
+
+    kernel: Kernel
+    plan: str
+    source: str
+    literal: KernelFunction
+    fast: KernelFunction
+    # Whether the cheaper form relies on folding powers, so needs x >= 0.
+    needs_positive: bool
+    # What one pass adds, for the closed form.
+    increment: float | None = None
+    strict: bool = False
+    # For `strict`: how many iterations from each starting number are known to
+    # give identical results, see `check`.
+    checked: dict[tuple[type, float], int] = field(default_factory=dict)
+
+    def __call__(self, x: float, iterations: int) -> float:
+        if self.can_take_shortcut(x, iterations):
+            return self.fast(x, iterations)
+        return self.literal(x, iterations)
+
+    def can_take_shortcut(self, x: float, iterations: int) -> bool:
+        """Is the cheaper form known to be safe for this run?"""
+        if self.plan == "literal loop":
+            return False
+        if self.strict:
+            return self.checked.get((type(x), x), 0) >= iterations
+        return x > 0 or not self.needs_positive
+
+    def check(self, starting_numbers: Iterable[float], iterations: int) -> None:
+        """Check the cheaper form against the literal loop, one pass at a time.
+
+        From each starting number, every state the literal loop passes through
+        in `iterations` passes gets one pass of both forms, and they must give
+        the same type and value. That covers every shorter run too.
+
+        The closed form adds `increment * iterations` in one go rather than
+        one pass at a time, which only rounds the same way while every state
+        is a whole number that fits a float exactly. Those states are
+        `increment` apart, so nearby starting numbers pass through mostly the
+        same states, and those are only checked once.
+        """
+        closed_form = self.plan == "closed form"
+        # The furthest state checked so far in each progression of states.
+        checked_up_to: dict[float, float] = {}
+        for start in sorted(starting_numbers):
+            state, passes = start, 0
+            while passes < iterations:
+                try:
+                    after = self.literal(state, 1)
+                except OverflowError:
+                    break
+                expected = self.fast(state, 1)
+                if type(after) is not type(expected) or after != expected:
+                    break
+                if closed_form and not is_exact_whole_number(after):
+                    break
+                state, passes = after, passes + 1
+                if closed_form and passes == 1 and self.increment > 0:
+                    progression = state % self.increment
+                    furthest = max(checked_up_to.get(progression, state), state)
+                    passes += round((furthest - state) / self.increment)
+                    state = furthest
+            if closed_form and passes and self.increment > 0:
+                checked_up_to[state % self.increment] = state
+            self.checked[(type(start), start)] = passes
+
+
+def is_exact_whole_number(x: float) -> bool:
+    """Is `x` a whole number that a float holds exactly?"""
+    return float(x).is_integer() and abs(x) < 2**53
+
+
+def compile_kernel(
+    kernel: Kernel,
+    strict: bool = False,
+    starting_numbers: Iterable[float] = range(1, 21),
+    iterations: int = 2_000_000,
+) -> CompiledKernel:
+    """Compile `kernel`, picking the cheapest way to run it.
+
+    With `strict`, the cheaper form is only used for runs it has been checked
+    on: starting from one of `starting_numbers`, for up to `iterations`.
+    """
+    literal_source = loop_source(kernel.name, kernel.steps)
+    folded = fold(kernel.steps, fold_powers=kernel.keeps_positive)
+    increment = folded[0][1] if folded else 0
+    adds_only = not folded or (len(folded) == 1 and folded[0][0] == "add")
+    if adds_only and (not strict or is_exact_whole_number(increment)):
+        plan = "closed form"
+        fast_source = closed_form_source(kernel.name, increment, kernel.makes_floats)
+    elif len(folded) < len(kernel.steps):
+        plan = "folded loop"
+        fast_source = loop_source(kernel.name, folded)
+    else:
+        plan = "literal loop"
+        fast_source = literal_source
+    compiled = CompiledKernel(
+        kernel=kernel,
+        plan=plan,
+        source=fast_source,
+        literal=build(literal_source, kernel.name),
+        fast=build(fast_source, kernel.name),
+        needs_positive=fold(kernel.steps, fold_powers=False) != folded,
+        increment=increment if plan == "closed form" else None,
+        strict=strict,
+    )
+    if strict and plan != "literal loop":
+        compiled.check(starting_numbers, iterations)
+    return compiled
@@ -0,0 +1,100 @@
+"""Interchangeable kernels that do `do_math_once`'s math for a chunk of numbers.
+
+Each takes a sequence of starting numbers and the number of iterations, and
+returns the results in the same order:
+
+- "python": the plain loop, one number at a time. It holds the GIL the whole
+  time, so threads running it take turns, unless this is a free-threaded
+  build of Python (see `gil_enabled`).
+- "numpy": every number in the chunk at once, as in `4_numpy_vectorized.py`.
+  NumPy lets go of the GIL while a ufunc loops over an array (once the array
+  has more than a few hundred items), so threads running it on big enough
+  chunks can each use a core.
+- "numba": the plain loop, compiled to machine code by Numba the first time
+  it runs, and run without the GIL. If Numba isn't installed, this is the
+  "python" kernel instead (`COMPILED` says which you got).
+"""
+import sys
+from collections.abc import Callable, Sequence
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # Optional: `pip install numba` for the compiled kernel
+    numba = None
+
+Kernel = Callable[[Sequence[int], int], list[float]]
+
+
+def do_math(x: float, iterations: int) -> float:
+    """The math itself, for one starting number.
+
+    The numbered scripts do their math with this too, so every kernel and
+    script computes the same thing.
+    """
+    for _ in range(iterations):
+        x **= 4
+        x **= 0.25
+        x **= 2
+        x **= 0.5
+        x += 1
+    return x
+
+
+def do_math_in_place(x: np.ndarray, iterations: int) -> np.ndarray:
+    """`do_math` for every starting number in `x` at once, overwriting `x`."""
+    for _ in range(iterations):
+        np.power(x, 4, out=x)
+        np.power(x, 0.25, out=x)
+        np.power(x, 2, out=x)
+        np.power(x, 0.5, out=x)
+        np.add(x, 1, out=x)
+    return x
+
+
+def python_kernel(starting_numbers: Sequence[int], iterations: int) -> list[float]:
+    return [do_math(x, iterations) for x in starting_numbers]
+
+
+def numpy_kernel(starting_numbers: Sequence[int], iterations: int) -> list[float]:
+    x = np.array(starting_numbers, dtype=np.float64)
+    return do_math_in_place(x, iterations).tolist()
+
+
+if numba is not None:
+    # `do_math`'s loop again, since Numba compiles its own copy of the source.
+    @numba.njit(nogil=True, cache=True)
+    def compiled_loop(x: np.ndarray, iterations: int) -> None:
+        for i in range(x.shape[0]):
+            value = x[i]
+            for _ in range(iterations):
+                value **= 4
+                value **= 0.25
+                value **= 2
+                value **= 0.5
+                value += 1
+            x[i] = value
+
+    def numba_kernel(starting_numbers: Sequence[int], iterations: int) -> list[float]:
+        x = np.array(starting_numbers, dtype=np.float64)
+        compiled_loop(x, iterations)
+        return x.tolist()
+
+else:
+    numba_kernel = python_kernel
+
+COMPILED = numba is not None
+
+
+def gil_enabled() -> bool:
+    """Is the GIL on? Only free-threaded builds (Python 3.13+) can turn it off."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled() if is_gil_enabled is not None else True
+
+
+BACKENDS: dict[str, Kernel] = {
+    "python": python_kernel,
+    "numpy": numpy_kernel,
+    "numba": numba_kernel,
+}
@@ -0,0 +1,116 @@
+"""A process pool that's started once and reused, rather than once per job.
+
+Starting a `ProcessPoolExecutor` costs a new process per worker. With the
+"spawn" and "forkserver" start methods, each of those also imports our modules
+(and `rich`) from scratch before it does any work. For small jobs that's most
+of the time they take. A `WarmPool` starts its workers the first time it's
+used and keeps them until `shutdown()`. It can also import modules in each
+worker as it starts (`preload`), so the first task doesn't pay for that either.
+"""
+import importlib
+import multiprocessing
+import os
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
+from types import TracebackType
+from typing import Any, Self, TypeVar
+
+T = TypeVar("T")
+
+
+class WarmPool:
+    """A lazily started, reusable process pool.
+
+    `start_method` is "fork", "forkserver" or "spawn" (the platform's default
+    if not given). Each worker imports the `preload` modules and then runs
+    `initializer(*initargs)` as it starts.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        start_method: str | None = None,
+        preload: Sequence[str] = (),
+        initializer: Callable[..., None] | None = None,
+        initargs: tuple[Any, ...] = (),
+    ) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.start_method = start_method or multiprocessing.get_start_method()
+        self.preload = tuple(preload)
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The pool's executor, started on first use."""
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.start_method == "forkserver":
+                    # The fork server imports these once, and every worker it
+                    # forks starts with them already imported. There's only
+                    # one fork server per program, so this only counts if no
+                    # pool has used it yet.
+                    context.set_forkserver_preload(list(self.preload))
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers,
+                    mp_context=context,
+                    initializer=start_worker,
+                    initargs=(self.preload, self.initializer, self.initargs),
+                )
+            return self._executor
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def warm_up(self) -> None:
+        """Start every worker now, and wait until they're all ready for work."""
+        futures = [self.executor.submit(os.getpid) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future[T]:
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def borrow(self) -> AbstractContextManager[ProcessPoolExecutor]:
+        """Use the executor in a `with` block that leaves it running afterwards.
+
+        Code written as `with ProcessPoolExecutor() as executor:` can take
+        `with pool.borrow() as executor:` instead.
+        """
+        return nullcontext(self.executor)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        """Stop the workers. Using the pool again starts new ones."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.shutdown()
+
+
+def start_worker(
+    preload: Sequence[str],
+    initializer: Callable[..., None] | None,
+    initargs: tuple[Any, ...],
+) -> None:
+    """Run in each worker as it starts: import `preload`, then the initializer."""
+    for name in preload:
+        importlib.import_module(name)
+    if initializer is not None:
+        initializer(*initargs)
@@ -1,7 +1,13 @@
-"""Run simulated banking transactions."""
+"""Run simulated banking transactions.
+
+Run with `--ledger` to apply the transfers in batches of `BATCH_SIZE`, with
+one write per batch (see `ledger.py`).
+"""
+import argparse
 import random
 import time
 
+from ledger import commit_batch
 from rich import print
 
 BANK_DATA = {
@@ -12,12 +18,17 @@ BANK_DATA = {
     "bank_5": 1000,
 }
 
+BATCH_SIZE = 10
+
 
 def main() -> None:
     """Run the main program."""
+    parser = argparse.ArgumentParser(description="Run simulated transactions.")
+    parser.add_argument("--ledger", action="store_true")
+    args = parser.parse_args()
     t0 = time.time()
     print(f"\ninitial={BANK_DATA}\n", flush=True)
-    run_transactions()
+    run_transactions(batch_size=BATCH_SIZE if args.ledger else None)
     total_seconds = time.time() - t0
 
     print(f"\n\nfinal={BANK_DATA}", flush=True)
@@ -28,15 +39,33 @@ def main() -> None:
     )
 
 
-def run_transactions() -> None:
-    """Run a series of bank transactions."""
-    for _ in range(20):
+def run_transactions(
+    transaction_count: int = 20, batch_size: int | None = None
+) -> None:
+    """Run a series of bank transactions.
+
+    With a `batch_size`, the transfers are applied that many at a time.
+    """
+    expected_total = sum(BANK_DATA.values())
+    batch = []
+    for _ in range(transaction_count):
         banks = list(BANK_DATA.keys())
         sending_bank = random.choice(banks)
         banks.remove(sending_bank)
         receiving_bank = random.choice(list(banks))
         amount = random.randint(1, 100)
-        run_transaction(sending_bank, receiving_bank, amount)
+        if batch_size is None:
+            run_transaction(sending_bank, receiving_bank, amount)
+            continue
+        verify_user()
+        batch.append((sending_bank, receiving_bank, amount))
+        if len(batch) == batch_size:
+            commit_batch(BANK_DATA, batch, expected_total)
+            print("." * len(batch), end="", flush=True)
+            batch = []
+    if batch:
+        commit_batch(BANK_DATA, batch, expected_total)
+        print("." * len(batch), end="", flush=True)
 
 
 def run_transaction(sending_bank: str, receiving_bank: str, amount) -> None:
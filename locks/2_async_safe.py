@@ -1,9 +1,21 @@
-"""Run simulated banking transactions."""
+"""Run simulated banking transactions.
+
+By default one global lock guards every transfer. Run with `--locking
+per-account` to only lock the two accounts each transfer touches (see
+`lock_table.py`), so transfers between unrelated accounts can overlap,
+`--locking optimistic` to take no locks and commit with compare-and-swap
+instead (see `versioned_store.py`), or `--locking ledger` to queue the
+transfers and apply them in batches (see `ledger.py`).
+"""
+import argparse
 import asyncio
 import random
 import time
 
+from ledger import AsyncLedger
+from lock_table import AsyncLockTable
 from rich import print
+from versioned_store import VersionedStore, backoff_seconds
 
 BANK_DATA = {
     "bank_1": 1000,
@@ -14,13 +26,21 @@ BANK_DATA = {
 }
 
 TRANSACTION_LOCK = asyncio.Lock()
+# One lock per account, for `locking="per-account"`.
+ACCOUNT_LOCKS = AsyncLockTable()
+# Versions for every balance in `BANK_DATA`, for `locking="optimistic"`.
+BANK_STORE = VersionedStore(BANK_DATA)
+LOCKING_MODES = ("global", "per-account", "optimistic", "ledger")
 
 
 def main() -> None:
     """Run the main program."""
+    parser = argparse.ArgumentParser(description="Run simulated transactions.")
+    parser.add_argument("--locking", choices=LOCKING_MODES, default="global")
+    args = parser.parse_args()
     t0 = time.time()
     print(f"\ninitial={BANK_DATA}\n", flush=True)
-    asyncio.run(run_transactions())
+    asyncio.run(run_transactions(locking=args.locking))
     total_seconds = time.time() - t0
 
     print(f"\n\nfinal={BANK_DATA}", flush=True)
@@ -31,26 +51,99 @@ def main() -> None:
     )
 
 
-async def run_transactions() -> None:
-    """Run a series of bank transactions."""
+async def run_transactions(
+    transaction_count: int = 20,
+    locking: str = "global",
+    ledger: AsyncLedger | None = None,
+) -> list[float]:
+    """Run a series of bank transactions.
+
+    With `locking="ledger"`, the transfers go through `ledger`, or a new
+    `AsyncLedger` if none is given.
+
+    Returns how many seconds each transaction waited for its locks (or, when
+    optimistic, lost to attempts that had to be retried, or with the ledger,
+    waited for its batch to be committed).
+    """
+    if locking not in LOCKING_MODES:
+        raise ValueError(f"locking must be one of {LOCKING_MODES}, not {locking!r}")
+    if locking == "ledger" and ledger is None:
+        ledger = AsyncLedger(BANK_DATA)
     coroutines = []
-    for _ in range(20):
+    for _ in range(transaction_count):
         banks = list(BANK_DATA.keys())
         sending_bank = random.choice(banks)
         banks.remove(sending_bank)
         receiving_bank = random.choice(list(banks))
         amount = random.randint(1, 100)
-        coroutines.append(run_transaction(sending_bank, receiving_bank, amount))
-    await asyncio.gather(*coroutines)
-
-
-async def run_transaction(sending_bank: str, receiving_bank: str, amount) -> None:
-    """Run a bank transaction."""
+        coroutines.append(
+            run_transaction(sending_bank, receiving_bank, amount, locking, ledger)
+        )
+    if locking != "ledger":
+        return await asyncio.gather(*coroutines)
+    async with ledger:
+        return await asyncio.gather(*coroutines)
+
+
+async def run_transaction(
+    sending_bank: str,
+    receiving_bank: str,
+    amount,
+    locking: str = "global",
+    ledger: AsyncLedger | None = None,
+) -> float:
+    """Run a bank transaction, and return how long it waited for its locks."""
+    if locking == "ledger" and ledger is None:
+        raise ValueError('locking="ledger" needs a ledger')
     await verify_user()
-    async with TRANSACTION_LOCK:
+    if locking == "ledger":
+        t0 = time.perf_counter()
+        await ledger.transfer(sending_bank, receiving_bank, amount)
+        print(".", end="", flush=True)
+        return time.perf_counter() - t0
+    if locking == "optimistic":
+        waited = await transfer_optimistically(sending_bank, receiving_bank, amount)
+        print(".", end="", flush=True)
+        return waited
+    if locking == "per-account":
+        lock = ACCOUNT_LOCKS.hold(sending_bank, receiving_bank)
+    else:
+        lock = TRANSACTION_LOCK
+    t0 = time.perf_counter()
+    async with lock:
+        waited = time.perf_counter() - t0
         await update_bank(sending_bank, -amount)
         await update_bank(receiving_bank, amount)
     print(".", end="", flush=True)
+    return waited
+
+
+async def transfer_optimistically(
+    sending_bank: str, receiving_bank: str, amount
+) -> float:
+    """Move `amount` with no locks, retrying whenever another transfer won the race.
+
+    Returns the seconds spent on attempts that had to be retried.
+    """
+    t0 = time.perf_counter()
+    attempt = 1
+    while True:
+        attempt_started = time.perf_counter()
+        read = BANK_STORE.read(sending_bank, receiving_bank)
+        await asyncio.sleep(0.0001)
+        committed = BANK_STORE.compare_and_swap(
+            {name: version for name, (_, version) in read.items()},
+            {
+                sending_bank: read[sending_bank][0] - amount,
+                receiving_bank: read[receiving_bank][0] + amount,
+            },
+            attempt,
+        )
+        await asyncio.sleep(0.0001)
+        if committed:
+            return attempt_started - t0
+        await asyncio.sleep(backoff_seconds(attempt))
+        attempt += 1
 
 
 async def verify_user() -> None:
@@ -1,10 +1,23 @@
-"""Run simulated banking transactions."""
+"""Run simulated banking transactions.
+
+By default one global lock guards every transfer. Run with `--locking
+per-bank` to only lock the two banks each transfer touches (see
+`lock_table.py`), so transfers between unrelated banks can run in parallel,
+`--locking optimistic` to take no locks and commit with compare-and-swap
+instead (see `versioned_store.py`), or `--locking ledger` to queue the
+transfers and apply them in batches (see `ledger.py`).
+"""
+import argparse
 import random
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
-import threading
+from contextlib import nullcontext
 
+from ledger import Ledger
+from lock_table import LockTable
 from rich import print
+from versioned_store import VersionedStore, backoff_seconds
 
 BANK_DATA = {
     "bank_1": 1000,
@@ -15,13 +28,21 @@ BANK_DATA = {
 }
 
 TRANSACTION_LOCK = threading.RLock()
+# One lock per bank, for `locking="per-bank"`.
+BANK_LOCKS = LockTable()
+# Versions for every balance in `BANK_DATA`, for `locking="optimistic"`.
+BANK_STORE = VersionedStore(BANK_DATA)
+LOCKING_MODES = ("global", "per-bank", "optimistic", "ledger")
 
 
 def main() -> None:
     """Run the main program."""
+    parser = argparse.ArgumentParser(description="Run simulated transactions.")
+    parser.add_argument("--locking", choices=LOCKING_MODES, default="global")
+    args = parser.parse_args()
     t0 = time.time()
     print(f"\ninitial={BANK_DATA}\n", flush=True)
-    run_transactions()
+    run_transactions(locking=args.locking)
     total_seconds = time.time() - t0
 
     print(f"\n\nfinal={BANK_DATA}", flush=True)
@@ -32,10 +53,23 @@ def main() -> None:
     )
 
 
-def run_transactions() -> None:
-    """Run a series of bank transactions."""
+def run_transactions(
+    transaction_count: int = 20,
+    locking: str = "global",
+    max_workers: int | None = None,
+    ledger: Ledger | None = None,
+) -> None:
+    """Run a series of bank transactions.
+
+    With `locking="ledger"`, the transfers go through `ledger`, or a new
+    `Ledger` if none is given.
+    """
+    if locking not in LOCKING_MODES:
+        raise ValueError(f"locking must be one of {LOCKING_MODES}, not {locking!r}")
+    if locking == "ledger" and ledger is None:
+        ledger = Ledger(BANK_DATA)
     tasks = []
-    for _ in range(20):
+    for _ in range(transaction_count):
         banks = list(BANK_DATA.keys())
         sending_bank = random.choice(banks)
         banks.remove(sending_bank)
@@ -43,21 +77,69 @@ def run_transactions() -> None:
         amount = random.randint(1, 100)
         tasks.append(
             # func, args, kwargs
-            (run_transaction, (sending_bank, receiving_bank), {"amount": amount})
+            (
+                run_transaction,
+                (sending_bank, receiving_bank),
+                {"amount": amount, "locking": locking, "ledger": ledger},
+            )
         )
-    with ThreadPoolExecutor() as executor:
-        [executor.submit(func, *args, **kwargs) for func, args, kwargs in tasks]
-
-
-def run_transaction(sending_bank: str, receiving_bank: str, amount) -> None:
+    committer = ledger if locking == "ledger" else nullcontext()
+    with committer, ThreadPoolExecutor(max_workers) as executor:
+        work = [executor.submit(func, *args, **kwargs) for func, args, kwargs in tasks]
+    for future in work:
+        future.result()  # Raise any error from the transactions
+
+
+def run_transaction(
+    sending_bank: str,
+    receiving_bank: str,
+    amount,
+    locking: str = "global",
+    ledger: Ledger | None = None,
+) -> None:
     """Run a bank transaction."""
+    if locking == "ledger" and ledger is None:
+        raise ValueError('locking="ledger" needs a ledger')
     verify_user()
-    with TRANSACTION_LOCK:
+    if locking == "ledger":
+        ledger.transfer(sending_bank, receiving_bank, amount)
+        print(".", end="", flush=True)
+        return
+    if locking == "optimistic":
+        transfer_optimistically(sending_bank, receiving_bank, amount)
+        print(".", end="", flush=True)
+        return
+    if locking == "per-bank":
+        lock = BANK_LOCKS.hold(sending_bank, receiving_bank)
+    else:
+        lock = TRANSACTION_LOCK
+    with lock:
         update_bank(sending_bank, -amount)
         update_bank(receiving_bank, amount)
     print(".", end="", flush=True)
 
 
+def transfer_optimistically(sending_bank: str, receiving_bank: str, amount) -> None:
+    """Move `amount` with no locks, retrying whenever another transfer won the race."""
+    attempt = 1
+    while True:
+        read = BANK_STORE.read(sending_bank, receiving_bank)
+        time.sleep(0.0001)
+        committed = BANK_STORE.compare_and_swap(
+            {name: version for name, (_, version) in read.items()},
+            {
+                sending_bank: read[sending_bank][0] - amount,
+                receiving_bank: read[receiving_bank][0] + amount,
+            },
+            attempt,
+        )
+        time.sleep(0.0001)
+        if committed:
+            return
+        time.sleep(backoff_seconds(attempt))
+        attempt += 1
+
+
 def verify_user() -> None:
     """Simulate verifying the user can make the transaction."""
     time.sleep(0.1)
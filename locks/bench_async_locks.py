@@ -0,0 +1,95 @@
+"""Compare one global lock with per-account locks in `2_async_safe.py`.
+
+Every run starts the same number of transfers at once, between a different
+number of accounts. `verify_user` is skipped, because it runs before any lock
+is taken. For each run this reports transactions/sec and how long the
+transfers waited for their locks. It also reports the most per-account locks
+alive at once, and how many are still alive afterwards (none should be, since
+idle locks are dropped).
+"""
+import asyncio
+import statistics
+import time
+
+from bench_utils import (
+    load_script,
+    reset_async_locks,
+    reset_banks,
+    silence,
+    skip_verify_user,
+)
+from rich import print
+from rich.table import Table
+
+TRANSACTIONS = 1_000
+ACCOUNT_COUNTS = (5, 100, 1_000)
+# Upper bounds (in seconds) of the lock wait histogram's buckets.
+WAIT_BUCKETS = (0.0001, 0.001, 0.01, 0.1, float("inf"))
+
+async_safe = load_script("2_async_safe")
+LOCKING_MODES = ("global", "per-account")
+
+
+def main() -> None:
+    silence(async_safe)
+    async_safe.verify_user = skip_verify_user
+    summary = Table(title=f"{TRANSACTIONS:,} transfers started at once")
+    waits_table = Table(title="How many transfers waited this long for their locks")
+    for table in (summary, waits_table):
+        table.add_column("Accounts", justify="right")
+        table.add_column("Locking")
+    summary.add_column("Tx/sec", justify="right")
+    summary.add_column("p50 wait (ms)", justify="right")
+    summary.add_column("p99 wait (ms)", justify="right")
+    summary.add_column("Peak/live locks", justify="right")
+    for upper in WAIT_BUCKETS:
+        label = "More" if upper == float("inf") else f"< {upper * 1000:g} ms"
+        waits_table.add_column(label, justify="right")
+    for account_count in ACCOUNT_COUNTS:
+        for locking in LOCKING_MODES:
+            throughput, waits = measure(account_count, locking)
+            waits.sort()
+            lock_counts = "-"
+            if locking == "per-account":
+                locks = async_safe.ACCOUNT_LOCKS
+                lock_counts = f"{locks.peak_size:,}/{len(locks):,}"
+            summary.add_row(
+                f"{account_count:,}",
+                locking,
+                f"{throughput:,.0f}",
+                f"{statistics.median(waits) * 1000:,.2f}",
+                f"{waits[int(len(waits) * 0.99)] * 1000:,.2f}",
+                lock_counts,
+            )
+            waits_table.add_row(
+                f"{account_count:,}",
+                locking,
+                *(f"{count:,}" for count in histogram(waits)),
+            )
+    print(summary)
+    print(waits_table)
+
+
+def measure(account_count: int, locking: str) -> tuple[float, list[float]]:
+    """Return transactions/sec and the lock waits, after checking the total."""
+    reset_banks(async_safe.BANK_DATA, account_count)
+    reset_async_locks(async_safe)
+    t0 = time.perf_counter()
+    waits = asyncio.run(async_safe.run_transactions(TRANSACTIONS, locking=locking))
+    total_seconds = time.perf_counter() - t0
+    total = sum(async_safe.BANK_DATA.values())
+    if total != account_count * 1000:
+        raise AssertionError(f"{locking} locking: the accounts hold {total}")
+    return TRANSACTIONS / total_seconds, waits
+
+
+def histogram(waits: list[float]) -> list[int]:
+    """Count the waits that fall in each of `WAIT_BUCKETS`."""
+    counts = [0] * len(WAIT_BUCKETS)
+    for wait in waits:
+        counts[next(i for i, upper in enumerate(WAIT_BUCKETS) if wait < upper)] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    main()
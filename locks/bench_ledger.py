@@ -0,0 +1,103 @@
+"""Compare the batched ledger with per-transfer updates: sync, threaded and async.
+
+Each run does the same transfers between the usual five banks. Per transfer,
+every transfer makes its own two `update_bank` writes. With the ledger, they're
+netted down and written a batch at a time (see `ledger.py`). The sync run
+batches `BATCH_SIZE` transfers at a time. The threaded and async runs batch
+whatever has queued up while the last batch was being written. `verify_user` is
+skipped, so the writes are all that's timed.
+"""
+import asyncio
+import time
+
+from bench_utils import (
+    load_script,
+    reset_async_locks,
+    reset_banks,
+    silence,
+    skip_verify_user,
+)
+from ledger import AsyncLedger, Ledger
+from rich import print
+from rich.table import Table
+
+TRANSACTIONS = 500
+WORKERS = 16
+BANK_COUNT = 5
+BATCH_SIZE = 50
+
+sync = load_script("1_sync")
+threaded = load_script("3_threaded_safe")
+async_safe = load_script("2_async_safe")
+
+
+def main() -> None:
+    silence(sync, threaded, async_safe)
+    sync.verify_user = threaded.verify_user = lambda: None
+    async_safe.verify_user = skip_verify_user
+    table = Table(title=f"{TRANSACTIONS} transfers between {BANK_COUNT} banks")
+    table.add_column("Variant")
+    table.add_column("Mode")
+    table.add_column("Tx/sec", justify="right")
+    table.add_column("Batches", justify="right")
+    table.add_column("Avg batch", justify="right")
+    table.add_column("Speedup", justify="right")
+    for variant, module, modes in (
+        ("sync", sync, ("per-transfer", "ledger")),
+        ("threaded", threaded, ("global", "per-bank", "ledger")),
+        ("async", async_safe, ("global", "per-account", "ledger")),
+    ):
+        baseline = None
+        for mode in modes:
+            throughput, batches = measure(module, mode)
+            baseline = baseline or throughput
+            table.add_row(
+                variant,
+                mode,
+                f"{throughput:,.0f}",
+                f"{batches:,}" if batches else "-",
+                f"{TRANSACTIONS / batches:,.1f}" if batches else "-",
+                f"{throughput / baseline:,.1f}x",
+            )
+        table.add_section()
+    print(table)
+
+
+def measure(module, mode: str) -> tuple[float, int | None]:
+    """Return transactions/sec and how many batches the ledger wrote, if any.
+
+    Checks no money was lost or made.
+    """
+    reset_banks(module.BANK_DATA, BANK_COUNT)
+    batches = None
+    t0 = time.perf_counter()
+    if module is sync:
+        batch_size = BATCH_SIZE if mode == "ledger" else None
+        sync.run_transactions(TRANSACTIONS, batch_size=batch_size)
+        if batch_size is not None:
+            batches = -(-TRANSACTIONS // batch_size)
+    elif module is threaded:
+        ledger = Ledger(threaded.BANK_DATA) if mode == "ledger" else None
+        threaded.run_transactions(
+            TRANSACTIONS, locking=mode, max_workers=WORKERS, ledger=ledger
+        )
+        batches = None if ledger is None else ledger.batches
+    else:
+        reset_async_locks(async_safe)
+        batches = asyncio.run(measure_async(mode))
+    total_seconds = time.perf_counter() - t0
+    total = sum(module.BANK_DATA.values())
+    if total != BANK_COUNT * 1000:
+        raise AssertionError(f"{mode}: the banks hold {total}")
+    return TRANSACTIONS / total_seconds, batches
+
+
+async def measure_async(mode: str) -> int | None:
+    """Run the async transactions, and return how many batches the ledger wrote."""
+    ledger = AsyncLedger(async_safe.BANK_DATA) if mode == "ledger" else None
+    await async_safe.run_transactions(TRANSACTIONS, locking=mode, ledger=ledger)
+    return None if ledger is None else ledger.batches
+
+
+if __name__ == "__main__":
+    main()
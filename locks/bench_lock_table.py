@@ -0,0 +1,66 @@
+"""Compare one global lock with per-bank locks in `3_threaded_safe.py`.
+
+Every run does the same number of transfers with a different number of banks
+and worker threads. `verify_user` is skipped: it runs outside any lock, so it
+would only add the same 0.1 s per transfer to both kinds of locking. What's
+left is `update_bank`'s simulated I/O, inside the lock.
+
+With one global lock, transfers take turns however many banks and workers
+there are. With per-bank locks, transfers between different banks overlap, so
+throughput grows with workers, up to about half the number of banks (each
+transfer holds two).
+"""
+import time
+
+from bench_utils import load_script, reset_banks, silence
+from rich import print
+from rich.table import Table
+
+TRANSACTIONS = 500
+BANK_COUNTS = (2, 5, 20, 100)
+WORKER_COUNTS = (1, 4, 16, 64)
+
+threaded = load_script("3_threaded_safe")
+LOCKING_MODES = ("global", "per-bank")
+
+
+def main() -> None:
+    silence(threaded)
+    threaded.verify_user = lambda: None
+    table = Table(title=f"Transactions/sec over {TRANSACTIONS} transfers")
+    table.add_column("Banks", justify="right")
+    table.add_column("Workers", justify="right")
+    for locking in LOCKING_MODES:
+        table.add_column(f"{locking} lock", justify="right")
+    table.add_column("Speedup", justify="right")
+    for bank_count in BANK_COUNTS:
+        for workers in WORKER_COUNTS:
+            throughputs = {
+                locking: measure(bank_count, workers, locking)
+                for locking in LOCKING_MODES
+            }
+            speedup = throughputs["per-bank"] / throughputs["global"]
+            table.add_row(
+                str(bank_count),
+                str(workers),
+                *(f"{throughput:,.0f}" for throughput in throughputs.values()),
+                f"{speedup:,.2f}x",
+            )
+        table.add_section()
+    print(table)
+
+
+def measure(bank_count: int, workers: int, locking: str) -> float:
+    """Return transactions/sec, after checking no money was lost or made."""
+    reset_banks(threaded.BANK_DATA, bank_count)
+    t0 = time.perf_counter()
+    threaded.run_transactions(TRANSACTIONS, locking=locking, max_workers=workers)
+    total_seconds = time.perf_counter() - t0
+    total = sum(threaded.BANK_DATA.values())
+    if total != bank_count * 1000:
+        raise AssertionError(f"{locking} locking: the banks hold {total}")
+    return TRANSACTIONS / total_seconds
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare optimistic compare-and-swap transfers with locking, threaded and async.
+
+Each run does the same transfers between either a few banks (high contention:
+most transfers race for the same balances) or many (low contention). The
+threaded runs use `WORKERS` threads, and the async runs start every transfer
+at once. `verify_user` is skipped, since it happens before any locking.
+
+Locks make racing transfers wait; compare-and-swap lets them all go ahead and
+makes the losers start over. So optimistic transfers should win when races
+are rare, and waste work on conflicts when they're common.
+"""
+import asyncio
+import time
+
+from bench_utils import (
+    load_script,
+    reset_async_locks,
+    reset_banks,
+    silence,
+    skip_verify_user,
+)
+from rich import print
+from rich.table import Table
+
+TRANSACTIONS = 500
+WORKERS = 16
+# Contention: high with a few banks, low with many.
+BANK_COUNTS = (3, 1_000)
+
+threaded = load_script("3_threaded_safe")
+async_safe = load_script("2_async_safe")
+
+
+def main() -> None:
+    silence(threaded, async_safe)
+    threaded.verify_user = lambda: None
+    async_safe.verify_user = skip_verify_user
+    table = Table(title=f"{TRANSACTIONS} transfers")
+    table.add_column("Variant")
+    table.add_column("Banks", justify="right")
+    table.add_column("Locking")
+    table.add_column("Tx/sec", justify="right")
+    table.add_column("Conflicts", justify="right")
+    table.add_column("Retried tx", justify="right")
+    table.add_column("Most attempts", justify="right")
+    for variant, module, modes in (
+        ("threaded", threaded, ("global", "per-bank", "optimistic")),
+        ("async", async_safe, ("global", "per-account", "optimistic")),
+    ):
+        for bank_count in BANK_COUNTS:
+            for locking in modes:
+                throughput = measure(module, bank_count, locking)
+                stats = module.BANK_STORE.stats
+                optimistic = locking == "optimistic"
+                table.add_row(
+                    variant,
+                    f"{bank_count:,}",
+                    locking,
+                    f"{throughput:,.0f}",
+                    f"{stats.conflicts:,}" if optimistic else "-",
+                    f"{stats.retried:,}" if optimistic else "-",
+                    f"{stats.max_attempts:,}" if optimistic else "-",
+                )
+        table.add_section()
+    print(table)
+
+
+def measure(module, bank_count: int, locking: str) -> float:
+    """Return transactions/sec, after checking no money was lost or made."""
+    reset_banks(module.BANK_DATA, bank_count)
+    module.BANK_STORE.reset_stats()
+    t0 = time.perf_counter()
+    if module is threaded:
+        threaded.run_transactions(TRANSACTIONS, locking=locking, max_workers=WORKERS)
+    else:
+        reset_async_locks(async_safe)
+        asyncio.run(async_safe.run_transactions(TRANSACTIONS, locking=locking))
+    total_seconds = time.perf_counter() - t0
+    total = sum(module.BANK_DATA.values())
+    if total != bank_count * 1000:
+        raise AssertionError(f"{locking} locking: the banks hold {total}")
+    return TRANSACTIONS / total_seconds
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Helpers shared by the `bench_*.py` scripts in this directory."""
+import asyncio
+import importlib
+from types import ModuleType
+
+
+def load_script(name: str) -> ModuleType:
+    """Import one of the numbered example scripts, e.g. `3_threaded_safe`."""
+    return importlib.import_module(name)
+
+
+def silence(*modules: ModuleType) -> None:
+    """Swap out the per-transaction progress dots so they don't skew the timings."""
+    for module in modules:
+        module.print = lambda *args, **kwargs: None
+
+
+def reset_banks(bank_data: dict[str, int], bank_count: int) -> None:
+    """Replace the banks in `bank_data` with `bank_count` banks of 1,000 each."""
+    bank_data.clear()
+    bank_data.update({f"bank_{i}": 1000 for i in range(1, bank_count + 1)})
+
+
+def reset_async_locks(async_safe: ModuleType) -> None:
+    """Give `2_async_safe` a fresh global lock and lock table.
+
+    Each run's `asyncio.run` makes a new event loop, and the locks shouldn't
+    carry over anything from the last one.
+    """
+    async_safe.TRANSACTION_LOCK = asyncio.Lock()
+    async_safe.ACCOUNT_LOCKS = async_safe.AsyncLockTable()
+
+
+async def skip_verify_user() -> None:
+    """Stands in for the async scripts' `verify_user`, which only sleeps."""
@@ -0,0 +1,218 @@
+"""A ledger that applies transfers in batches, with one write per batch.
+
+Applying a transfer with `update_bank` costs two writes, each with its own
+simulated I/O. A ledger queues transfers instead. A single committer takes
+whatever has queued up (up to `max_batch` transfers) and nets it down to one
+change per bank: bank_1 -> bank_2 for 10 plus bank_2 -> bank_1 for 4 is just
+bank_1 -6 and bank_2 +6. Then it writes those changes in one go. This is group
+commit, the way databases flush many transactions' log records with one disk
+write. While one batch is being written, the next one queues up, so the busier
+it gets, the bigger the batches. Each transfer is done once its batch is
+written.
+
+After every batch, the ledger checks that the banks still hold the same total
+as when it started.
+
+`Ledger` is for threads, `AsyncLedger` for asyncio, and `commit_batch` does one
+batch for code that has no committer.
+"""
+import asyncio
+import queue
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import Future
+from types import TracebackType
+from typing import Self
+
+# (sending bank, receiving bank, amount)
+Transfer = tuple[str, str, int]
+
+MAX_BATCH = 1_000
+
+
+class LedgerError(Exception):
+    """The banks' total changed, so money was lost or made."""
+
+
+def net_changes(transfers: Iterable[Transfer]) -> dict[str, int]:
+    """Net `transfers` down to one change per bank, leaving out the zeros."""
+    changes: Counter[str] = Counter()
+    for sending_bank, receiving_bank, amount in transfers:
+        changes[sending_bank] -= amount
+        changes[receiving_bank] += amount
+    return {bank: change for bank, change in changes.items() if change}
+
+
+def apply_changes(
+    bank_data: dict[str, int], changes: dict[str, int], expected_total: int
+) -> None:
+    """Add `changes` to `bank_data`, then check the total hasn't moved."""
+    for bank, change in changes.items():
+        bank_data[bank] += change
+    total = sum(bank_data.values())
+    if total != expected_total:
+        raise LedgerError(f"The banks hold {total}, not {expected_total}")
+
+
+def commit_batch(
+    bank_data: dict[str, int], transfers: Iterable[Transfer], expected_total: int
+) -> None:
+    """Apply a batch of transfers to `bank_data` with one (simulated) write."""
+    changes = net_changes(transfers)
+    time.sleep(0.0001)
+    apply_changes(bank_data, changes, expected_total)
+    time.sleep(0.0001)
+
+
+class Ledger:
+    """Transfers queued from any thread, committed in batches by one thread.
+
+    Use it as a context manager: it starts its committer on the way in, and
+    commits whatever is still queued on the way out.
+    """
+
+    def __init__(self, bank_data: dict[str, int], max_batch: int = MAX_BATCH) -> None:
+        self.bank_data = bank_data
+        self.max_batch = max_batch
+        self.expected_total = sum(bank_data.values())
+        self.batches = 0
+        self.transfers = 0
+        self._queue: queue.Queue[tuple[Transfer, Future[None]] | None] = queue.Queue()
+        self._committer = threading.Thread(target=self._commit_loop, daemon=True)
+
+    def __enter__(self) -> Self:
+        self._committer.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._queue.put(None)  # Tells the committer to stop
+        self._committer.join()
+
+    def submit(
+        self, sending_bank: str, receiving_bank: str, amount: int
+    ) -> Future[None]:
+        """Queue a transfer. The future is done once it's been committed."""
+        future: Future[None] = Future()
+        self._queue.put(((sending_bank, receiving_bank, amount), future))
+        return future
+
+    def transfer(self, sending_bank: str, receiving_bank: str, amount: int) -> None:
+        """Queue a transfer and wait until it's been committed."""
+        self.submit(sending_bank, receiving_bank, amount).result()
+
+    def _commit_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch: list[tuple[Transfer, Future[None]]]) -> None:
+        try:
+            commit_batch(
+                self.bank_data, (transfer for transfer, _ in batch), self.expected_total
+            )
+        except Exception as error:  # noqa: BLE001
+            for _, future in batch:
+                if not future.done():  # Unless its transfer was cancelled
+                    future.set_exception(error)
+            return
+        self.batches += 1
+        self.transfers += len(batch)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+
+class AsyncLedger:
+    """Transfers queued from any task, committed in batches by one task.
+
+    Use it as an async context manager: it starts its committer on the way in,
+    and commits whatever is still queued on the way out.
+    """
+
+    def __init__(self, bank_data: dict[str, int], max_batch: int = MAX_BATCH) -> None:
+        self.bank_data = bank_data
+        self.max_batch = max_batch
+        self.expected_total = sum(bank_data.values())
+        self.batches = 0
+        self.transfers = 0
+        self._queue: asyncio.Queue[
+            tuple[Transfer, asyncio.Future[None]] | None
+        ] = asyncio.Queue()
+        self._committer: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> Self:
+        self._committer = asyncio.create_task(self._commit_loop())
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self._queue.put(None)  # Tells the committer to stop
+        if self._committer is not None:
+            await self._committer
+
+    async def transfer(
+        self, sending_bank: str, receiving_bank: str, amount: int
+    ) -> None:
+        """Queue a transfer and wait until it's been committed."""
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        await self._queue.put(((sending_bank, receiving_bank, amount), future))
+        await future
+
+    async def _commit_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+
+    async def _commit(self, batch: list[tuple[Transfer, asyncio.Future[None]]]) -> None:
+        changes = net_changes(transfer for transfer, _ in batch)
+        await asyncio.sleep(0.0001)
+        try:
+            apply_changes(self.bank_data, changes, self.expected_total)
+        except Exception as error:  # noqa: BLE001
+            for _, future in batch:
+                if not future.done():  # Unless its transfer was cancelled
+                    future.set_exception(error)
+            return
+        await asyncio.sleep(0.0001)
+        self.batches += 1
+        self.transfers += len(batch)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
@@ -0,0 +1,77 @@
+"""Tables of locks, one per bank, always taken in the same order.
+
+A transfer only touches two banks. Locking just those two lets transfers
+between unrelated banks (bank_1 -> bank_2 and bank_3 -> bank_4) run at the
+same time, where one global lock makes every transfer wait its turn.
+
+Holding two locks at once risks deadlock: one thread holds bank_1 and waits
+for bank_2, while another holds bank_2 and waits for bank_1. Taking them in a
+fixed order (sorted by name) rules that out, because whoever holds the first
+lock in that order can always go on to get the rest. The same goes for
+coroutines, which can wait on a second lock while holding the first.
+
+`LockTable` is for threads, `AsyncLockTable` for asyncio.
+"""
+import asyncio
+import threading
+import weakref
+from collections.abc import AsyncIterator, Iterator
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+
+
+class LockTable:
+    """One lock per name, created the first time that name is locked."""
+
+    def __init__(self) -> None:
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def lock_for(self, name: str) -> threading.Lock:
+        with self._guard:
+            if name not in self._locks:
+                self._locks[name] = threading.Lock()
+            return self._locks[name]
+
+    @contextmanager
+    def hold(self, *names: str) -> Iterator[None]:
+        """Hold the lock for every one of `names`, taking them in sorted order."""
+        with ExitStack() as stack:
+            for name in sorted(set(names)):
+                stack.enter_context(self.lock_for(name))
+            yield
+
+
+class AsyncLockTable:
+    """One `asyncio.Lock` per name, created when needed and dropped once idle.
+
+    The table only holds weak references. A lock lives while some coroutine
+    holds it or waits for it, and is freed as soon as none do. With thousands
+    of accounts, only the ones in use take up memory.
+    """
+
+    def __init__(self) -> None:
+        self._locks: weakref.WeakValueDictionary[
+            str, asyncio.Lock
+        ] = weakref.WeakValueDictionary()
+        self.peak_size = 0
+
+    def __len__(self) -> int:
+        """How many locks are alive right now."""
+        return len(self._locks)
+
+    def lock_for(self, name: str) -> asyncio.Lock:
+        lock = self._locks.get(name)
+        if lock is None:
+            lock = self._locks[name] = asyncio.Lock()
+            self.peak_size = max(self.peak_size, len(self._locks))
+        return lock
+
+    @asynccontextmanager
+    async def hold(self, *names: str) -> AsyncIterator[None]:
+        """Hold the lock for every one of `names`, taking them in sorted order."""
+        # Keeping the locks in this list is what keeps them alive meanwhile.
+        locks = [self.lock_for(name) for name in sorted(set(names))]
+        async with AsyncExitStack() as stack:
+            for lock in locks:
+                await stack.enter_async_context(lock)
+            yield
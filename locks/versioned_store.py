@@ -0,0 +1,90 @@
+"""Bank balances with optimistic concurrency: version numbers and compare-and-swap.
+
+`update_bank`'s read, slow I/O, write is the classic lost update: two
+transfers read the same balance, and the second write wipes out the first.
+Locks fix that pessimistically, by making everyone else wait through the slow
+part. This fixes it optimistically instead. Every balance carries a version,
+bumped on each write. A transfer reads its balances and their versions, does
+its slow work without holding anything, and then commits with
+compare-and-swap: the new balances are only written if no version has changed
+since the read. If one has, the transfer lost a race, and it reads again and
+retries.
+
+Only the compare-and-swap itself is atomic (under a lock held for a few
+microseconds, never across I/O), so it works the same from threads and from
+asyncio.
+"""
+import random
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+# Retries back off for a random time of up to `BACKOFF_SECONDS * 2**retries`,
+# capped at `MAX_BACKOFF_SECONDS`, so racing transfers don't collide again.
+BACKOFF_SECONDS = 0.0001
+MAX_BACKOFF_SECONDS = 0.01
+
+
+@dataclass
+class ConflictStats:
+    """How often the store's compare-and-swaps won and lost."""
+
+    commits: int = 0
+    # Commits refused because a balance changed after it was read.
+    conflicts: int = 0
+    # Transactions that only committed after one or more retries.
+    retried: int = 0
+    max_attempts: int = 0
+
+
+class VersionedStore:
+    """Versioned balances, kept in (and updated in) the `balances` dict."""
+
+    def __init__(self, balances: dict[str, int]) -> None:
+        self.balances = balances
+        self.versions: dict[str, int] = {}
+        self.stats = ConflictStats()
+        self._lock = threading.Lock()
+
+    def read(self, *names: str) -> dict[str, tuple[int, int]]:
+        """Return `{name: (balance, version)}`, consistent with each other."""
+        with self._lock:
+            return {
+                name: (self.balances[name], self.versions.get(name, 0))
+                for name in names
+            }
+
+    def compare_and_swap(
+        self,
+        read_versions: Mapping[str, int],
+        new_balances: Mapping[str, int],
+        attempt: int = 1,
+    ) -> bool:
+        """Write `new_balances` if every version still matches `read_versions`.
+
+        `attempt` says how many times this transaction has tried to commit,
+        for the stats. Returns whether the write happened.
+        """
+        with self._lock:
+            if any(
+                self.versions.get(name, 0) != version
+                for name, version in read_versions.items()
+            ):
+                self.stats.conflicts += 1
+                return False
+            for name, balance in new_balances.items():
+                self.balances[name] = balance
+                self.versions[name] = self.versions.get(name, 0) + 1
+            self.stats.commits += 1
+            self.stats.retried += attempt > 1
+            self.stats.max_attempts = max(self.stats.max_attempts, attempt)
+            return True
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = ConflictStats()
+
+
+def backoff_seconds(attempt: int) -> float:
+    """How long to wait before trying to commit for the `attempt`th time."""
+    return random.uniform(0, min(BACKOFF_SECONDS * 2**attempt, MAX_BACKOFF_SECONDS))
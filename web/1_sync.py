@@ -1,38 +1,101 @@
 """Download the first 20 Pokémon synchronously."""
+import os
 import time
+from functools import partial
 
 import requests
-from bs4 import BeautifulSoup
+from crawl_engine import call_with_retries
+from h1_parser import get_h1, get_h1_from_chunks
+from http_cache import HTTPCache, cached_get_requests
 from rich import print
 
+BASE_URL = os.environ.get("POKEDEX_BASE_URL", "https://pokemondb.net/pokedex")
+
+# Give up on a download after the server has been silent this long.
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+# Besides 429/5xx replies, retry downloads that fail with these.
+RETRY_ON = (requests.Timeout, requests.ConnectionError)
+
+# How much of the body to read at a time when streaming it.
+STREAM_CHUNK_BYTES = 4096
+
 
 def main() -> None:
     t0 = time.time()
     print("Starting coordinating function...", flush=True)
-    results = download_pokemon_list()
+    with HTTPCache() as cache:
+        results = download_pokemon_list(cache=cache)
     total_seconds = time.time() - t0
     print(
         f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
         flush=True,
     )
+    print(f"[bold green]HTTP cache: [cyan]{cache.summary()}", flush=True)
+    errors = [result for _, result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"[bold red]{len(errors)} Pokémon failed to download.", flush=True)
     print(f"\n{results=}", flush=True)
 
 
-def download_pokemon_list() -> list[tuple[int, str]]:
-    """Download a list of Pokémon from 'pokemondb.net'."""
-    return [download_single_pokemon(num) for num in range(1, 21)]
+def download_pokemon_list(
+    stream: bool = False, cache: HTTPCache | None = None
+) -> list[tuple[int, str | Exception]]:
+    """Download a list of Pokémon from 'pokemondb.net'.
+
+    Timeouts, dropped connections and 429/5xx replies are retried with
+    backoff. A Pokémon that still fails gets its exception in place of its
+    header, and the rest are still downloaded.
+
+    With `stream`, each body is only read until its H1 has closed; the rest of
+    the page is never downloaded or decoded.
 
+    With a `cache`, pages are read from (and saved to) the on-disk HTTP cache.
+    Cached pages are always read whole, so `stream` doesn't apply to them.
+    """
+    results: list[tuple[int, str | Exception]] = []
+    for num in range(1, 21):
+        try:
+            results.append(download_with_retries(num, stream, cache))
+        except Exception as exc:  # noqa: BLE001
+            results.append((num, exc))
+    return results
 
-def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
+
+def download_with_retries(
+    pokemon_num: int = 1, stream: bool = False, cache: HTTPCache | None = None
+) -> tuple[int, str]:
+    """`download_single_pokemon`, retried with backoff if it times out, loses its
+    connection or gets a 429/5xx (see `crawl_engine.call_with_retries`)."""
+    return call_with_retries(
+        partial(download_single_pokemon, pokemon_num, stream, cache), RETRY_ON
+    )
+
+
+def download_single_pokemon(
+    pokemon_num: int = 1, stream: bool = False, cache: HTTPCache | None = None
+) -> tuple[int, str]:
     """Get a Pokémon from 'pokemondb.net' by its pokedex number."""
     print(
         f"[yellow]Downloading Pokémon {pokemon_num:02}... [/yellow]",
         flush=True,
     )
-    url = f"https://pokemondb.net/pokedex/{pokemon_num}"
-    resp = requests.get(url, allow_redirects=True)
-    resp.raise_for_status()
-    header = get_h1(resp.text)
+    url = f"{BASE_URL}/{pokemon_num}"
+    if cache is not None:
+        header = get_h1(
+            cached_get_requests(cache, url, timeout=REQUEST_TIMEOUT_SECONDS)
+        )
+    else:
+        resp = requests.get(
+            url, allow_redirects=True, stream=stream, timeout=REQUEST_TIMEOUT_SECONDS
+        )
+        resp.raise_for_status()
+        if stream:
+            with resp:
+                chunks = resp.iter_content(STREAM_CHUNK_BYTES)
+                header = get_h1_from_chunks(chunks, resp.encoding or "utf-8")
+        else:
+            header = get_h1(resp.text)
     print(
         f"[green]Retrieved [magenta]{pokemon_num:02}={header}",
         flush=True,
@@ -40,11 +103,5 @@ def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
     return (pokemon_num, header)
 
 
-def get_h1(html: str) -> str:
-    """Parse the HTML and return the first H1 tag."""
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.h1.text
-
-
 if __name__ == "__main__":
     main()
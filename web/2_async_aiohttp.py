@@ -1,48 +1,262 @@
-"""Download the first 20 Pokémon asynchronously using aiohttp."""
+"""Download the first 20 Pokémon asynchronously using aiohttp.
+
+Run with `--output results.jsonl` (or `.csv`) to write each result to that
+file as it arrives, instead of collecting them all and printing them.
+
+Run with `--store` to save each H1 in the result store and reuse it on later
+runs without downloading the page again. `--refresh` uses the store too, but
+downloads every page again, only skipping the parse for pages that haven't
+changed.
+"""
+import argparse
 import asyncio
+import os
 import time
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import Executor
+from contextlib import aclosing, nullcontext
+from functools import partial
+from pathlib import Path
+from typing import Any
 
 import aiohttp
-from bs4 import BeautifulSoup
+from crawl_engine import CrawlEngine
+from h1_parser import aget_h1_from_chunks, get_h1
+from http_cache import HTTPCache, cached_get_aiohttp
+from parse_pool import ParseStage
+from result_sink import ResultSink
+from result_store import ResultStore, content_hash
 from rich import print
 
+BASE_URL = os.environ.get("POKEDEX_BASE_URL", "https://pokemondb.net/pokedex")
+
+# Connection pool settings shared by every download in a run.
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 20
+KEEPALIVE_SECONDS = 30
+DNS_CACHE_SECONDS = 300
+
+# Downloads in flight at the start; the crawl engine adapts it from there.
+MAX_IN_FLIGHT = 10
+
+# Give up on (and retry) a download attempt after this long.
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+# How much of the body to read at a time when streaming it.
+STREAM_CHUNK_BYTES = 4096
+
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Download Pokémon H1s.")
+    parser.add_argument("--output", type=Path, help="a .jsonl or .csv file")
+    parser.add_argument(
+        "--store", action="store_true", help="reuse results saved by earlier runs"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="--store, but check every page again"
+    )
+    args = parser.parse_args()
+    store = None
+    if args.refresh:
+        store = ResultStore(max_age=0)  # Nothing is recent enough to skip
+    elif args.store:
+        store = ResultStore()
+    if args.output is not None:
+        return write_results(args.output, store, args.refresh)
     t0 = time.time()
     print("Starting coordinating coroutine...", flush=True)
-    results = asyncio.run(download_pokemon_list())
+    with HTTPCache() as cache, store or nullcontext():
+        results = asyncio.run(
+            download_pokemon_list(cache=cache, store=store, refresh=args.refresh)
+        )
     total_seconds = time.time() - t0
     print(
         f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
         flush=True,
     )
+    print(f"[bold green]HTTP cache: [cyan]{cache.summary()}", flush=True)
+    if store is not None:
+        print(f"[bold green]Result store: [cyan]{store.summary()}", flush=True)
+    errors = [result for _, result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"[bold red]{len(errors)} Pokémon failed to download.", flush=True)
     print(f"\n{results=}", flush=True)
 
 
-async def download_pokemon_list() -> list[tuple[int, str]]:
-    """Download a list of Pokémon from 'pokemondb.net'."""
-    print("Creating coroutine objects...", flush=True)
-    coroutines = [download_single_pokemon(num) for num in range(1, 21)]
-    print("Gathering coroutines into tasks...", flush=True)
-    tasks = asyncio.gather(*coroutines)
-    print("Done gathering tasks. Running + awaiting tasks...", flush=True)
-    results = await tasks
-    print("Done gathering results.", flush=True)
-    return results
+def write_results(
+    output: Path, store: ResultStore | None = None, refresh: bool = False
+) -> None:
+    """Download the Pokémon, writing each result to `output` as it arrives.
+
+    Closes `store` when done, if there is one.
+    """
+    t0 = time.time()
+    print(f"Streaming results to [cyan]{output}[/cyan]...", flush=True)
+    with HTTPCache() as cache, store or nullcontext(), ResultSink(output) as sink:
+        results = iter_pokemon(cache=cache, store=store, refresh=refresh)
+        written = asyncio.run(sink.awrite_all(results))
+    total_seconds = time.time() - t0
+    print(
+        f"\n[bold green]Wrote [cyan]{written}[/cyan] results in "
+        f"[cyan]{total_seconds:,.2f}[green] seconds.",
+        flush=True,
+    )
+    print(f"[bold green]HTTP cache: [cyan]{cache.summary()}", flush=True)
+    if store is not None:
+        print(f"[bold green]Result store: [cyan]{store.summary()}", flush=True)
+
+
+async def download_pokemon_list(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    max_in_flight: int = MAX_IN_FLIGHT,
+    parse_executor: Executor | None = None,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+    store: ResultStore | None = None,
+    refresh: bool = False,
+    timeout: float | None = REQUEST_TIMEOUT_SECONDS,
+    hedge_percentile: float | None = None,
+) -> list[tuple[int, str | Exception]]:
+    """Download a list of Pokémon from 'pokemondb.net'.
+
+    A Pokémon that can't be downloaded gets the exception as its header; the
+    rest still come back. Attempts taking longer than `timeout` seconds, or
+    answered with a 429/5xx, are retried with exponential backoff. With
+    `hedge_percentile` (e.g. 95), a download slower than that percentile of
+    recent ones gets a duplicate request, and the first answer wins.
+
+    At most `max_in_flight` downloads run at once to start with. The crawl
+    engine then grows or shrinks that limit based on how the server responds.
 
+    Pages are parsed on the event loop unless a `parse_executor` (a thread or
+    process pool) is given to parse them in instead.
 
-async def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
+    With `stream`, each body is only read until its H1 has closed; the rest of
+    the page is never downloaded or decoded.
+
+    With a `cache`, pages are read from (and saved to) the on-disk HTTP cache.
+    Cached pages are always read whole, so `stream` doesn't apply to them.
+
+    With a result `store`, Pokémon it already has a header for aren't fetched
+    at all. With `refresh` too, only those checked within the store's
+    `max_age` are skipped; stale ones are re-fetched, but only re-parsed if
+    their page changed. Stored Pokémon are read whole, like cached ones.
+    """
+    pokemon_nums = list(pokemon_nums)
+    headers = {
+        num: header
+        async for num, header in iter_pokemon(
+            pokemon_nums,
+            max_in_flight=max_in_flight,
+            parse_executor=parse_executor,
+            stream=stream,
+            cache=cache,
+            store=store,
+            refresh=refresh,
+            timeout=timeout,
+            hedge_percentile=hedge_percentile,
+        )
+    }
+    return [(num, headers[num]) for num in pokemon_nums]
+
+
+async def iter_pokemon(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    max_in_flight: int = MAX_IN_FLIGHT,
+    parse_executor: Executor | None = None,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+    store: ResultStore | None = None,
+    refresh: bool = False,
+    timeout: float | None = REQUEST_TIMEOUT_SECONDS,
+    hedge_percentile: float | None = None,
+) -> AsyncIterator[tuple[int, str | Exception]]:
+    """Like `download_pokemon_list`, but yield each Pokémon as it's downloaded.
+
+    Results come in completion order, and only the ones in flight are held in
+    memory, so `pokemon_nums` can be as long as you like. Feed them to a
+    `ResultSink` to save them as they arrive.
+    """
+    known: dict[int, str] = {}
+    if store is not None:
+        # Only the store needs every number up front; otherwise stay lazy.
+        pokemon_nums = list(pokemon_nums)
+        known = store.known(pokemon_nums, refresh)
+    if known:
+        print(f"Reusing [cyan]{len(known)}[/cyan] stored results.", flush=True)
+        for num, header in known.items():
+            yield num, header
+    parser = ParseStage(get_h1, parse_executor) if parse_executor else None
+    async with make_session() as session, parser or nullcontext():
+        engine = CrawlEngine(
+            partial(
+                download_single_pokemon,
+                session,
+                parser=parser,
+                stream=stream,
+                cache=cache,
+                store=store,
+            ),
+            max_in_flight=max_in_flight,
+            max_limit=CONNECTION_LIMIT_PER_HOST,
+            timeout=timeout,
+            hedge_percentile=hedge_percentile,
+        )
+        print("Crawling with the adaptive crawl engine...", flush=True)
+        to_fetch = (num for num in pokemon_nums if num not in known)
+        async with aclosing(engine.as_completed(to_fetch)) as completed:
+            async for num, result in completed:
+                yield num, result if isinstance(result, Exception) else result[1]
+    stats = engine.stats()
+    print(
+        f"Done gathering results: [cyan]{stats.throughput:,.1f}[/cyan] Pokémon/sec, "
+        f"final limit [cyan]{stats.limit}[/cyan], "
+        f"[cyan]{stats.throttled}[/cyan] throttled, "
+        f"[cyan]{stats.timed_out}[/cyan] timed out, "
+        f"[cyan]{stats.hedged}[/cyan] hedged, "
+        f"[cyan]{stats.failed}[/cyan] failed.",
+        flush=True,
+    )
+
+
+def make_session(**session_kwargs: Any) -> aiohttp.ClientSession:
+    """Create one session whose connection pool is reused by every download.
+
+    Must be called from a running event loop. Extra keyword arguments are
+    passed through to `aiohttp.ClientSession`.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=KEEPALIVE_SECONDS,
+        ttl_dns_cache=DNS_CACHE_SECONDS,
+    )
+    return aiohttp.ClientSession(connector=connector, **session_kwargs)
+
+
+async def download_single_pokemon(
+    session: aiohttp.ClientSession,
+    pokemon_num: int = 1,
+    parser: ParseStage | None = None,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+    store: ResultStore | None = None,
+) -> tuple[int, str]:
     """Get a Pokémon from 'pokemondb.net' by its pokedex number."""
     print(
         f"[yellow]Downloading Pokémon {pokemon_num:02}... [/yellow]",
         flush=True,
     )
-    url = f"https://pokemondb.net/pokedex/{pokemon_num}"
-    async with aiohttp.ClientSession() as session, session.get(url) as resp:
-        resp.raise_for_status()
-        text = await resp.text()
-    resp.raise_for_status()
-    header = get_h1(text)
+    url = f"{BASE_URL}/{pokemon_num}"
+    if stream and cache is None and store is None:
+        header = await stream_h1(session, url)
+    else:
+        text = await fetch_text(session, url, cache)
+        header = store.header_for(pokemon_num, content_hash(text)) if store else None
+        if header is None:
+            header = get_h1(text) if parser is None else await parser.parse(text)
+            if store is not None:
+                store.put(pokemon_num, content_hash(text), header)
     print(
         f"[green]Retrieved [magenta]{pokemon_num:02}={header}",
         flush=True,
@@ -50,10 +264,25 @@ async def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
     return (pokemon_num, header)
 
 
-def get_h1(html: str) -> str:
-    """Parse the HTML and return the first H1 tag."""
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.h1.text
+async def fetch_text(
+    session: aiohttp.ClientSession, url: str, cache: HTTPCache | None = None
+) -> str:
+    """Download a whole page, through the HTTP cache if there is one."""
+    if cache is not None:
+        return await cached_get_aiohttp(cache, session, url)
+    async with session.get(url) as resp:
+        resp.raise_for_status()
+        return await resp.text()
+
+
+async def stream_h1(session: aiohttp.ClientSession, url: str) -> str:
+    """Read a page only until its H1 has closed and return the H1's text."""
+    async with session.get(url) as resp:
+        resp.raise_for_status()
+        # Leaving the block before the body is fully read closes the connection.
+        return await aget_h1_from_chunks(
+            resp.content.iter_chunked(STREAM_CHUNK_BYTES), resp.charset or "utf-8"
+        )
 
 
 if __name__ == "__main__":
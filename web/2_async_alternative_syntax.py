@@ -1,100 +1,315 @@
-"""Download the first 20 Pokémon asynchronously with various alternative methods."""
+"""Download the first 20 Pokémon asynchronously with various alternative methods.
+
+Pick one with `--strategy`, and run it on uvloop with `--loop uvloop` (if
+uvloop is installed). `bench_event_loops.py` compares them.
+
+Every strategy retries timeouts, dropped connections and 429/5xx replies with
+backoff, and a Pokémon that still fails gets its exception in place of its
+header, so one bad page doesn't cost the rest of the run.
+"""
+import argparse
 import asyncio
+import os
 import time
+from collections.abc import Awaitable, Callable, Coroutine, Iterable
+from functools import partial
+from typing import Any, TypeVar
 
 import aiohttp
-from bs4 import BeautifulSoup
+from crawl_engine import acall_with_retries
+from h1_parser import get_h1
 from rich import print
 
+try:
+    import uvloop
+except ImportError:  # Optional: `pip install uvloop` for a faster event loop
+    uvloop = None
+
+T = TypeVar("T")
+LoopFactory = Callable[[], asyncio.AbstractEventLoop]
+Results = list[tuple[int, str | Exception]]
+
+BASE_URL = os.environ.get("POKEDEX_BASE_URL", "https://pokemondb.net/pokedex")
+
+# Connection pool settings shared by every download in a run.
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 20
+KEEPALIVE_SECONDS = 30
+DNS_CACHE_SECONDS = 300
+
+# How many downloads each strategy below lets run at the same time.
+MAX_IN_FLIGHT = 10
+
+# Besides 429/5xx replies, retry downloads that fail with these.
+RETRY_ON = (asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Download Pokémon H1s.")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="from-sync")
+    parser.add_argument("--loop", choices=LOOP_FACTORIES, default="asyncio")
+    args = parser.parse_args()
     t0 = time.time()
-    print("Starting coordinating function...", flush=True)
-    results = coordinate_from_sync()
+    print(f"Starting with the [cyan]{args.strategy}[/cyan] strategy...", flush=True)
+    results = STRATEGIES[args.strategy](loop_factory=LOOP_FACTORIES[args.loop])
     total_seconds = time.time() - t0
     print(
         f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
         flush=True,
     )
+    errors = [result for _, result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"[bold red]{len(errors)} Pokémon failed to download.", flush=True)
     print(f"\n{results=}", flush=True)
 
 
-def run_asyncio_run():
-    """Start `download_pokemon_list` using `asyncio.run`."""
-    return asyncio.run(download_pokemon_list_gather())
+def run_asyncio_run(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    loop_factory: LoopFactory | None = None,
+) -> Results:
+    """Start `download_pokemon_list_gather` using `asyncio.run`."""
+    return run(with_session(download_pokemon_list_gather, pokemon_nums), loop_factory)
+
+
+def run_new_event_loop(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    loop_factory: LoopFactory | None = None,
+) -> Results:
+    """Start `download_pokemon_list_gather` using `asyncio.new_event_loop`."""
+    loop = (loop_factory or asyncio.new_event_loop)()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(
+            with_session(download_pokemon_list_gather, pokemon_nums)
+        )
+    finally:
+        close_loop(loop)
+
 
+def coordinate_from_sync(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    loop_factory: LoopFactory | None = None,
+) -> Results:
+    """Start `download_single_pokemon` tasks and run them from a sync function.
 
-def run_new_event_loop():
-    """Start `download_pokemon_list` using `asyncio.new_event_loop`."""
-    loop = asyncio.new_event_loop()
+    The loop is created here and every task is created on it explicitly.
+    Calling `asyncio.get_event_loop()` (or `asyncio.gather` on bare coroutines)
+    with no loop running is deprecated, and stops working on newer Pythons.
+    """
+    pokemon_nums = list(pokemon_nums)
+    loop = (loop_factory or asyncio.new_event_loop)()
     asyncio.set_event_loop(loop)
     try:
-        return loop.run_until_complete(download_pokemon_list_gather())
+        session = loop.run_until_complete(open_session())
+        semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+        try:
+            print("Creating coroutine objects...", flush=True)
+            coroutines = [
+                bounded(semaphore, download_with_retries, session, num)
+                for num in pokemon_nums
+            ]
+            print("Creating tasks on the loop...", flush=True)
+            tasks = [loop.create_task(coroutine) for coroutine in coroutines]
+            print("Done creating tasks. Running + awaiting tasks...", flush=True)
+            gathered = asyncio.gather(*tasks, return_exceptions=True)
+            return with_errors(pokemon_nums, loop.run_until_complete(gathered))
+        finally:
+            cancel_pending(loop)
+            loop.run_until_complete(session.close())
     finally:
+        close_loop(loop)
+
+
+def run_manual(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    loop_factory: LoopFactory | None = None,
+) -> Results:
+    """Start `download_pokemon_list_manual` using `asyncio.run`."""
+    return run(with_session(download_pokemon_list_manual, pokemon_nums), loop_factory)
+
+
+def run_task_group(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    loop_factory: LoopFactory | None = None,
+) -> Results:
+    """Start `download_pokemon_list_task_group` using `asyncio.run`."""
+    return run(
+        with_session(download_pokemon_list_task_group, pokemon_nums), loop_factory
+    )
+
+
+def run(coroutine: Coroutine[Any, Any, T], loop_factory: LoopFactory | None) -> T:
+    """`asyncio.run(coroutine)`, on a loop from `loop_factory` if there is one."""
+    if loop_factory is None:
+        return asyncio.run(coroutine)
+    # `asyncio.run` only takes a `loop_factory` from Python 3.12; this is what it
+    # does with one.
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(coroutine)
+
+
+def cancel_pending(loop: asyncio.AbstractEventLoop) -> None:
+    """Cancel the tasks still running on `loop` and wait for them to finish."""
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+
+def close_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Clean up and close a loop we created, the way `asyncio.run` does."""
+    try:
+        cancel_pending(loop)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.run_until_complete(loop.shutdown_default_executor())
+    finally:
+        asyncio.set_event_loop(None)
         loop.close()
 
 
-def coordinate_from_sync():
-    """Start `download_single_pokemon` tasks and run from a sync function."""
-    print("Creating coroutine objects...", flush=True)
-    coroutines = [download_single_pokemon(num) for num in range(1, 21)]
-    print("Gathering coroutines into tasks...", flush=True)
-    tasks = asyncio.gather(*coroutines)
-    print("Done gathering tasks. Running + awaiting tasks...", flush=True)
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(tasks)
+async def with_session(
+    download_list: Callable[[aiohttp.ClientSession, Iterable[int]], Awaitable[T]],
+    pokemon_nums: Iterable[int] = range(1, 21),
+) -> T:
+    """Run a `download_pokemon_list_*` coroutine with one shared session."""
+    async with await open_session() as session:
+        return await download_list(session, pokemon_nums)
+
+
+async def open_session() -> aiohttp.ClientSession:
+    """Create one session whose connection pool is reused by every download."""
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=KEEPALIVE_SECONDS,
+        ttl_dns_cache=DNS_CACHE_SECONDS,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
 
+async def bounded(
+    semaphore: asyncio.Semaphore,
+    function: Callable[..., Awaitable[T]],
+    *args: Any,
+) -> T:
+    """Await `function(*args)` once `semaphore` has a free slot.
 
-async def download_pokemon_list_gather() -> list[tuple[int, str]]:
+    The coroutine is only created once it can run, so a task cancelled while
+    it waits doesn't leave a never-awaited coroutine behind.
+    """
+    async with semaphore:
+        return await function(*args)
+
+
+async def download_pokemon_list_gather(
+    session: aiohttp.ClientSession,
+    pokemon_nums: Iterable[int] = range(1, 21),
+) -> Results:
     """Download a list of Pokémon from 'pokemondb.net' using  `asyncio.gather`."""
+    pokemon_nums = list(pokemon_nums)
+    semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
     print("Creating coroutine objects...", flush=True)
-    coroutines = [download_single_pokemon(num) for num in range(1, 21)]
+    coroutines = [
+        bounded(semaphore, download_with_retries, session, num) for num in pokemon_nums
+    ]
     print("Gathering coroutines into tasks...", flush=True)
-    tasks = asyncio.gather(*coroutines)
+    tasks = asyncio.gather(*coroutines, return_exceptions=True)
     print("Done gathering tasks. Running + awaiting tasks...", flush=True)
     results = await tasks
     print("Done gathering results.", flush=True)
-    return results
+    return with_errors(pokemon_nums, results)
 
 
-async def download_pokemon_list_manual() -> list[tuple[int, str]]:
+async def download_pokemon_list_manual(
+    session: aiohttp.ClientSession,
+    pokemon_nums: Iterable[int] = range(1, 21),
+) -> Results:
     """Download a list of Pokémon from 'pokemondb.net'.
 
     Manually get the event loop, create and await tasks."""
-    coroutines = [download_single_pokemon(num) for num in range(1, 21)]
-    loop = asyncio.get_event_loop()
+    pokemon_nums = list(pokemon_nums)
+    semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+    coroutines = [
+        bounded(semaphore, download_with_retries, session, num) for num in pokemon_nums
+    ]
+    loop = asyncio.get_running_loop()
     print("Gathering coroutines into tasks...", flush=True)
     tasks = [loop.create_task(c) for c in coroutines]
     print("Done gathering tasks. Running + awaiting tasks...", flush=True)
-    results = [await t for t in tasks]
+    results = [await settle(t) for t in tasks]
     print("Done gathering results.", flush=True)
-    return results
+    return with_errors(pokemon_nums, results)
 
 
-async def download_pokemon_list_task_group() -> list[tuple[int, str]]:
+async def download_pokemon_list_task_group(
+    session: aiohttp.ClientSession,
+    pokemon_nums: Iterable[int] = range(1, 21),
+) -> Results:
     """Download a list of Pokémon from 'pokemondb.net' using  a task group.
 
     Task groups are only available in Python 3.11+.
 
     The advantage of a task group is that it automatically cancels all tasks
     if one task raises an exception or if the task group itself is cancelled.
+    A failed download is caught by `settle` instead, so it doesn't cancel the
+    others; only an error outside the downloads does.
     """
+    pokemon_nums = list(pokemon_nums)
+    semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
     async with asyncio.TaskGroup() as tg:
         print("Gathering coroutines into tasks...", flush=True)
-        results = [tg.create_task(download_single_pokemon(num)) for num in range(1, 21)]
+        tasks = [
+            tg.create_task(
+                settle(bounded(semaphore, download_with_retries, session, num))
+            )
+            for num in pokemon_nums
+        ]
         print("Done gathering tasks. Running + awaiting tasks...", flush=True)
     print("Done awaiting results.", flush=True)
-    return [result.result() for result in results]
+    return with_errors(pokemon_nums, [task.result() for task in tasks])
+
+
+async def settle(awaitable: Awaitable[T]) -> T | Exception:
+    """Await `awaitable`, returning its error instead of raising it."""
+    try:
+        return await awaitable
+    except Exception as exc:  # noqa: BLE001
+        return exc
+
 
+def with_errors(
+    pokemon_nums: Iterable[int],
+    results: Iterable[tuple[int, str] | BaseException],
+) -> Results:
+    """Pair each Pokémon with its header, or with the error it failed with."""
+    paired: Results = []
+    for num, result in zip(pokemon_nums, results, strict=True):
+        if not isinstance(result, Exception) and isinstance(result, BaseException):
+            raise result  # Cancelled: don't pass that off as a failed download
+        paired.append((num, result if isinstance(result, Exception) else result[1]))
+    return paired
 
-async def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
+
+async def download_with_retries(
+    session: aiohttp.ClientSession, pokemon_num: int = 1
+) -> tuple[int, str]:
+    """`download_single_pokemon`, retried with backoff if it times out, loses its
+    connection or gets a 429/5xx (see `crawl_engine.acall_with_retries`)."""
+    return await acall_with_retries(
+        partial(download_single_pokemon, session, pokemon_num), RETRY_ON
+    )
+
+
+async def download_single_pokemon(
+    session: aiohttp.ClientSession, pokemon_num: int = 1
+) -> tuple[int, str]:
     """Get a Pokémon from 'pokemondb.net' by its pokedex number."""
     print(
         f"[yellow]Downloading Pokémon {pokemon_num:02}... [/yellow]",
         flush=True,
     )
-    url = f"https://pokemondb.net/pokedex/{pokemon_num}"
-    async with aiohttp.ClientSession() as session, session.get(url) as resp:
+    url = f"{BASE_URL}/{pokemon_num}"
+    async with session.get(url) as resp:
         resp.raise_for_status()
         text = await resp.text()
     resp.raise_for_status()
@@ -106,10 +321,18 @@ async def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
     return (pokemon_num, header)
 
 
-def get_h1(html: str) -> str:
-    """Parse the HTML and return the first H1 tag."""
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.h1.text
+# Every way above of running the downloads, by name.
+STRATEGIES: dict[str, Callable[..., Results]] = {
+    "asyncio-run": run_asyncio_run,
+    "new-event-loop": run_new_event_loop,
+    "from-sync": coordinate_from_sync,
+    "manual": run_manual,
+    "task-group": run_task_group,
+}
+
+LOOP_FACTORIES: dict[str, LoopFactory] = {"asyncio": asyncio.new_event_loop}
+if uvloop is not None:
+    LOOP_FACTORIES["uvloop"] = uvloop.new_event_loop
 
 
 if __name__ == "__main__":
@@ -2,53 +2,151 @@
 
 `httpx` code looks similar to `requests` code, and it feels nicer to work with
 than `aiohttp` code. However, I found it significantly slower than `aiohttp` in
-my tests for `async` code.
+my tests for `async` code. `bench_backends.py` measures the difference against
+a local stand-in server.
 """
 import asyncio
+import os
 import time
+from collections.abc import Iterable
+from concurrent.futures import Executor
+from contextlib import nullcontext
+from functools import partial
+from typing import Any
 
 import httpx
-from bs4 import BeautifulSoup
+from crawl_engine import CrawlEngine
+from h1_parser import aget_h1_from_chunks, get_h1
+from http_cache import HTTPCache, cached_get_httpx
+from parse_pool import ParseStage
 from rich import print
 
+BASE_URL = os.environ.get("POKEDEX_BASE_URL", "https://pokemondb.net/pokedex")
+
+# Connection pool settings shared by every download in a run.
+CONNECTION_LIMIT = 100
+KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_SECONDS = 30
+
+# Downloads in flight at the start; the crawl engine adapts it from there.
+MAX_IN_FLIGHT = 10
+
+# Give up on (and retry) a download attempt after this long.
+REQUEST_TIMEOUT_SECONDS = 10.0
+
 
 def main() -> None:
     t0 = time.time()
     print("Starting coordinating coroutine...", flush=True)
-    results = asyncio.run(download_pokemon_list())
+    with HTTPCache() as cache:
+        results = asyncio.run(download_pokemon_list(cache=cache))
     total_seconds = time.time() - t0
     print(
         f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
         flush=True,
     )
+    print(f"[bold green]HTTP cache: [cyan]{cache.summary()}", flush=True)
+    errors = [result for _, result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"[bold red]{len(errors)} Pokémon failed to download.", flush=True)
     print(f"\n{results=}", flush=True)
 
 
-async def download_pokemon_list() -> list[tuple[int, str]]:
-    """Download a list of Pokémon from 'pokemondb.net'."""
-    print("Creating coroutine objects...", flush=True)
-    coroutines = [download_single_pokemon(num) for num in range(1, 21)]
-    print("Gathering coroutines into tasks...", flush=True)
-    tasks = asyncio.gather(*coroutines)
-    print("Done gathering tasks. Running + awaiting tasks...", flush=True)
-    results = await tasks
-    print("Done gathering results.", flush=True)
-    return results
+async def download_pokemon_list(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    max_in_flight: int = MAX_IN_FLIGHT,
+    parse_executor: Executor | None = None,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+    timeout: float | None = REQUEST_TIMEOUT_SECONDS,
+    hedge_percentile: float | None = None,
+) -> list[tuple[int, str | Exception]]:
+    """Download a list of Pokémon from 'pokemondb.net'.
+
+    A Pokémon that can't be downloaded gets the exception as its header; the
+    rest still come back. Attempts taking longer than `timeout` seconds, or
+    answered with a 429/5xx, are retried with exponential backoff. With
+    `hedge_percentile` (e.g. 95), a download slower than that percentile of
+    recent ones gets a duplicate request, and the first answer wins.
+
+    At most `max_in_flight` downloads run at once to start with. The crawl
+    engine then grows or shrinks that limit based on how the server responds.
+
+    Pages are parsed on the event loop unless a `parse_executor` (a thread or
+    process pool) is given to parse them in instead.
+
+    With `stream`, each body is only read until its H1 has closed; the rest of
+    the page is never downloaded or decoded.
+
+    With a `cache`, pages are read from (and saved to) the on-disk HTTP cache.
+    Cached pages are always read whole, so `stream` doesn't apply to them.
+    """
+    parser = ParseStage(get_h1, parse_executor) if parse_executor else None
+    async with make_client() as client, parser or nullcontext():
+        engine = CrawlEngine(
+            partial(
+                download_single_pokemon,
+                client,
+                parser=parser,
+                stream=stream,
+                cache=cache,
+            ),
+            max_in_flight=max_in_flight,
+            timeout=timeout,
+            hedge_percentile=hedge_percentile,
+        )
+        print("Crawling with the adaptive crawl engine...", flush=True)
+        pokemon_nums = list(pokemon_nums)
+        results = await engine.run_partial(pokemon_nums)
+    stats = engine.stats()
+    print(
+        f"Done gathering results: [cyan]{stats.throughput:,.1f}[/cyan] Pokémon/sec, "
+        f"final limit [cyan]{stats.limit}[/cyan], "
+        f"[cyan]{stats.throttled}[/cyan] throttled, "
+        f"[cyan]{stats.timed_out}[/cyan] timed out, "
+        f"[cyan]{stats.hedged}[/cyan] hedged, "
+        f"[cyan]{stats.failed}[/cyan] failed.",
+        flush=True,
+    )
+    return [
+        (num, result) if isinstance(result, Exception) else result
+        for num, result in zip(pokemon_nums, results)
+    ]
+
+
+def make_client(**client_kwargs: Any) -> httpx.AsyncClient:
+    """Create one client whose connection pool is reused by every download.
+
+    Retries and hedged requests go through it too, so they reuse its
+    connections instead of opening new ones. Extra keyword arguments are
+    passed through to `httpx.AsyncClient`.
+    """
+    limits = httpx.Limits(
+        max_connections=CONNECTION_LIMIT,
+        max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_SECONDS,
+    )
+    return httpx.AsyncClient(limits=limits, **client_kwargs)
 
 
-async def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
+async def download_single_pokemon(
+    client: httpx.AsyncClient,
+    pokemon_num: int = 1,
+    parser: ParseStage | None = None,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+) -> tuple[int, str]:
     """Get a Pokémon from 'pokemondb.net' by its pokedex number."""
     print(
         f"[yellow]Downloading Pokémon {pokemon_num:02}... [/yellow]",
         flush=True,
     )
-    url = f"https://pokemondb.net/pokedex/{pokemon_num}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, follow_redirects=True)
-        resp.raise_for_status()
-    text = resp.text
-    resp.raise_for_status()
-    header = get_h1(text)
+    url = f"{BASE_URL}/{pokemon_num}"
+    if stream and cache is None:
+        header = await stream_h1(client, url)
+    else:
+        text = await fetch_text(client, url, cache)
+        header = get_h1(text) if parser is None else await parser.parse(text)
     print(
         f"[green]Retrieved [magenta]{header}",
         flush=True,
@@ -56,10 +154,22 @@ async def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
     return (pokemon_num, header)
 
 
-def get_h1(html: str) -> str:
-    """Parse the HTML and return the first H1 tag."""
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.h1.text
+async def fetch_text(
+    client: httpx.AsyncClient, url: str, cache: HTTPCache | None = None
+) -> str:
+    """Download a whole page, through the HTTP cache if there is one."""
+    if cache is not None:
+        return await cached_get_httpx(cache, client, url)
+    resp = await client.get(url, follow_redirects=True)
+    resp.raise_for_status()
+    return resp.text
+
+
+async def stream_h1(client: httpx.AsyncClient, url: str) -> str:
+    """Read a page only until its H1 has closed and return the H1's text."""
+    async with client.stream("GET", url, follow_redirects=True) as resp:
+        resp.raise_for_status()
+        return await aget_h1_from_chunks(resp.aiter_text())
 
 
 if __name__ == "__main__":
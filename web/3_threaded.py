@@ -1,54 +1,268 @@
-"""Download the first 20 Pokémon with threads."""
+"""Download the first 20 Pokémon with threads.
+
+Run with `--output results.jsonl` (or `.csv`) to write each result to that
+file as it arrives, instead of collecting them all and printing them.
+
+Run with `--store` to save each H1 in the result store and reuse it on later
+runs without downloading the page again. `--refresh` uses the store too, but
+downloads every page again, only skipping the parse for pages that haven't
+changed.
+"""
+import argparse
+import os
 import time
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Callable
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+from typing import Any
 
 import requests
-from bs4 import BeautifulSoup
+from crawl_engine import call_with_retries
+from h1_parser import get_h1, get_h1_from_chunks
+from http_cache import HTTPCache, cached_get_requests
+from requests.adapters import HTTPAdapter
+from result_sink import ResultSink
+from result_store import ResultStore, content_hash
 from rich import print
 
+BASE_URL = os.environ.get("POKEDEX_BASE_URL", "https://pokemondb.net/pokedex")
+
+# Threads downloading at once. Each gets its own pooled connection.
+MAX_WORKERS = 10
+
+# Give up on a download after the server has been silent this long.
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+# Besides 429/5xx replies, retry downloads that fail with these.
+RETRY_ON = (requests.Timeout, requests.ConnectionError)
+
+# How much of the body to read at a time when streaming it.
+STREAM_CHUNK_BYTES = 4096
+
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Download Pokémon H1s.")
+    parser.add_argument("--output", type=Path, help="a .jsonl or .csv file")
+    parser.add_argument(
+        "--store", action="store_true", help="reuse results saved by earlier runs"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="--store, but check every page again"
+    )
+    args = parser.parse_args()
+    store = None
+    if args.refresh:
+        store = ResultStore(max_age=0)  # Nothing is recent enough to skip
+    elif args.store:
+        store = ResultStore()
+    if args.output is not None:
+        return write_results(args.output, store, args.refresh)
     t0 = time.time()
     print("Starting coordinating function...", flush=True)
-    results = download_pokemon_list()
+    with HTTPCache() as cache, store or nullcontext():
+        results = download_pokemon_list(cache=cache, store=store, refresh=args.refresh)
     total_seconds = time.time() - t0
     print(
         f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
         flush=True,
     )
+    print(f"[bold green]HTTP cache: [cyan]{cache.summary()}", flush=True)
+    if store is not None:
+        print(f"[bold green]Result store: [cyan]{store.summary()}", flush=True)
+    errors = [result for _, result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"[bold red]{len(errors)} Pokémon failed to download.", flush=True)
     print(f"\n{results=}", flush=True)
 
 
+def write_results(
+    output: Path, store: ResultStore | None = None, refresh: bool = False
+) -> None:
+    """Download the Pokémon, writing each result to `output` as it arrives.
+
+    Closes `store` when done, if there is one.
+    """
+    t0 = time.time()
+    print(f"Streaming results to [cyan]{output}[/cyan]...", flush=True)
+    with HTTPCache() as cache, store or nullcontext(), ResultSink(output) as sink:
+        written = sink.write_all(
+            iter_pokemon(cache=cache, store=store, refresh=refresh)
+        )
+    total_seconds = time.time() - t0
+    print(
+        f"\n[bold green]Wrote [cyan]{written}[/cyan] results in "
+        f"[cyan]{total_seconds:,.2f}[green] seconds.",
+        flush=True,
+    )
+    print(f"[bold green]HTTP cache: [cyan]{cache.summary()}", flush=True)
+    if store is not None:
+        print(f"[bold green]Result store: [cyan]{store.summary()}", flush=True)
+
+
 TaskType = tuple[Callable[..., Any], tuple[Any, ...], dict[str, Any]]
 
 
-def download_pokemon_list() -> list[tuple[int, str]]:
-    """Download a list of Pokémon from 'pokemondb.net'."""
+def download_pokemon_list(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    max_workers: int = MAX_WORKERS,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+    store: ResultStore | None = None,
+    refresh: bool = False,
+) -> list[tuple[int, str | Exception]]:
+    """Download a list of Pokémon from 'pokemondb.net'.
+
+    A Pokémon that can't be downloaded gets the exception as its header; the
+    rest still come back. Timeouts, dropped connections and 429/5xx replies
+    are retried with exponential backoff first (see `download_with_retries`).
+
+    `max_workers` threads share one `requests.Session`, whose connection pool
+    holds as many connections as there are threads, so every download reuses
+    a kept-alive connection instead of opening its own.
+
+    With `stream`, each body is only read until its H1 has closed; the rest of
+    the page is never downloaded or decoded.
+
+    With a `cache`, pages are read from (and saved to) the on-disk HTTP cache.
+    Cached pages are always read whole, so `stream` doesn't apply to them.
+
+    With a result `store`, Pokémon it already has a header for aren't fetched
+    at all. With `refresh` too, only those checked within the store's
+    `max_age` are skipped; stale ones are re-fetched, but only re-parsed if
+    their page changed. Stored Pokémon are read whole, like cached ones.
+    """
+    pokemon_nums = list(pokemon_nums)
+    known = store.known(pokemon_nums, refresh) if store else {}
     print("Defining tasks...", flush=True)
-    tasks: list[TaskType] = [
-        # Function, args, kwargs
-        (download_single_pokemon, (num,), {})
-        for num in range(1, 21)
-    ]
-    print("Kick off threaded tasks...", flush=True)
-    with ThreadPoolExecutor() as executor:
-        work = [executor.submit(func, *args, **kwargs) for func, args, kwargs in tasks]
-        print("Waiting for downloads...", flush=True)
+    with make_session(max_workers) as session:
+        kwargs = {"stream": stream, "cache": cache, "store": store, "session": session}
+        tasks: list[TaskType] = [
+            # Function, args, kwargs
+            (download_with_retries, (num,), kwargs)
+            for num in pokemon_nums
+            if num not in known
+        ]
+        print("Kick off threaded tasks...", flush=True)
+        with ThreadPoolExecutor(max_workers) as executor:
+            work = {
+                args[0]: executor.submit(func, *args, **kwargs)
+                for func, args, kwargs in tasks
+            }
+            print("Waiting for downloads...", flush=True)
     print("Done", flush=True)
-    return [future.result() for future in work]
+    headers = known | dict(outcome(num, future) for num, future in work.items())
+    return [(num, headers[num]) for num in pokemon_nums]
+
+
+def iter_pokemon(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    max_workers: int = MAX_WORKERS,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+    store: ResultStore | None = None,
+    refresh: bool = False,
+) -> Iterator[tuple[int, str | Exception]]:
+    """Like `download_pokemon_list`, but yield each Pokémon as it's downloaded.
+
+    Results come in completion order. At most two downloads per worker are
+    submitted at a time, so `pokemon_nums` can be as long as you like without
+    piling up futures. A Pokémon that fails is yielded with its exception.
+    Feed the results to a `ResultSink` to save them as they arrive.
+    """
+    known: dict[int, str] = {}
+    if store is not None:
+        # Only the store needs every number up front; otherwise stay lazy.
+        pokemon_nums = list(pokemon_nums)
+        known = store.known(pokemon_nums, refresh)
+    yield from known.items()
+    kwargs = {"stream": stream, "cache": cache, "store": store}
+    pending: dict[Future[tuple[int, str]], int] = {}
+    session = make_session(max_workers)
+    with session, ThreadPoolExecutor(max_workers) as executor:
+        try:
+            for num in pokemon_nums:
+                if num in known:
+                    continue
+                if len(pending) >= max_workers * 2:
+                    yield from take_finished(pending)
+                future = executor.submit(
+                    download_with_retries, num, session=session, **kwargs
+                )
+                pending[future] = num
+            while pending:
+                yield from take_finished(pending)
+        finally:
+            for future in pending:
+                future.cancel()  # The caller stopped early
+
+
+def take_finished(
+    pending: dict[Future[tuple[int, str]], int]
+) -> Iterator[tuple[int, str | Exception]]:
+    """Wait for at least one download to finish and yield (and forget) them."""
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        yield outcome(pending.pop(future), future)
+
+
+def outcome(
+    pokemon_num: int, future: Future[tuple[int, str]]
+) -> tuple[int, str | Exception]:
+    """Return a finished download's result, or its error in place of the header."""
+    error = future.exception()
+    return (pokemon_num, error) if isinstance(error, Exception) else future.result()
+
 
+def make_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """Create a session that keeps up to `pool_size` connections per host alive.
 
-def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
+    Sharing it between threads is safe as long as nothing changes its
+    settings (headers, cookies, adapters) while downloads are running.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_with_retries(pokemon_num: int = 1, **kwargs: Any) -> tuple[int, str]:
+    """`download_single_pokemon`, retried with backoff if it times out, loses its
+    connection or gets a 429/5xx (see `crawl_engine.call_with_retries`)."""
+    return call_with_retries(
+        partial(download_single_pokemon, pokemon_num, **kwargs), RETRY_ON
+    )
+
+
+def download_single_pokemon(
+    pokemon_num: int = 1,
+    stream: bool = False,
+    cache: HTTPCache | None = None,
+    store: ResultStore | None = None,
+    session: requests.Session | None = None,
+) -> tuple[int, str]:
     """Get a Pokémon from 'pokemondb.net' by its pokedex number."""
     print(
         f"[yellow]Downloading Pokémon {pokemon_num:02}... [/yellow]",
         flush=True,
     )
-    url = f"https://pokemondb.net/pokedex/{pokemon_num}"
-    resp = requests.get(url, allow_redirects=True)
-    resp.raise_for_status()
-    header = get_h1(resp.text)
+    url = f"{BASE_URL}/{pokemon_num}"
+    http = session or requests
+    if cache is not None or store is not None:
+        header = get_h1_stored(pokemon_num, url, cache, store, session)
+    else:
+        resp = http.get(
+            url, allow_redirects=True, stream=stream, timeout=REQUEST_TIMEOUT_SECONDS
+        )
+        resp.raise_for_status()
+        if stream:
+            with resp:
+                chunks = resp.iter_content(STREAM_CHUNK_BYTES)
+                header = get_h1_from_chunks(chunks, resp.encoding or "utf-8")
+        else:
+            header = get_h1(resp.text)
     print(
         f"[green]Retrieved [magenta]{pokemon_num:02}={header}",
         flush=True,
@@ -56,10 +270,33 @@ def download_single_pokemon(pokemon_num: int = 1) -> tuple[int, str]:
     return (pokemon_num, header)
 
 
-def get_h1(html: str) -> str:
-    """Parse the HTML and return the first H1 tag."""
-    soup = BeautifulSoup(html, "html.parser")
-    return soup.h1.text
+def get_h1_stored(
+    pokemon_num: int,
+    url: str,
+    cache: HTTPCache | None,
+    store: ResultStore | None,
+    session: requests.Session | None = None,
+) -> str:
+    """Download a whole page and return its H1, reusing a stored one if unchanged."""
+    if cache is not None:
+        text = cached_get_requests(cache, url, session, REQUEST_TIMEOUT_SECONDS)
+    else:
+        text = fetch_text(url, session)
+    header = store.header_for(pokemon_num, content_hash(text)) if store else None
+    if header is None:
+        header = get_h1(text)
+        if store is not None:
+            store.put(pokemon_num, content_hash(text), header)
+    return header
+
+
+def fetch_text(url: str, session: requests.Session | None = None) -> str:
+    """Download a whole page, giving up after `REQUEST_TIMEOUT_SECONDS` of silence."""
+    resp = (session or requests).get(
+        url, allow_redirects=True, timeout=REQUEST_TIMEOUT_SECONDS
+    )
+    resp.raise_for_status()
+    return resp.text
 
 
 if __name__ == "__main__":
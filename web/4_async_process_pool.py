@@ -0,0 +1,114 @@
+"""Download Pokémon asynchronously and parse them in a process pool.
+
+This combines the two halves of the repo: the event loop only does I/O, like
+`2_async_aiohttp.py`, and the CPU-heavy parsing runs in a
+`ProcessPoolExecutor`, like `cpu_bound/3_multiprocess.py`. aiohttp fetches each
+page's raw bytes, and a `ParseStage` hands them to the pool with
+`loop.run_in_executor` to be decoded and parsed into a full DOM.
+
+The stage's queue is bounded. When the pool falls behind, fetchers wait for
+room instead of piling pages up in memory, and because they keep their crawl
+slot while they wait, fewer new downloads start.
+"""
+import asyncio
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import aiohttp
+from crawl_engine import CrawlEngine
+from h1_parser import get_h1_soup
+from parse_pool import ParseStage
+from rich import print
+
+BASE_URL = os.environ.get("POKEDEX_BASE_URL", "https://pokemondb.net/pokedex")
+
+# Downloads in flight at once, and processes parsing the pages.
+MAX_IN_FLIGHT = 20
+PARSE_WORKERS = os.cpu_count() or 1
+
+
+def main() -> None:
+    t0 = time.time()
+    print("Starting coordinating coroutine...", flush=True)
+    results = asyncio.run(download_pokemon_list())
+    total_seconds = time.time() - t0
+    print(
+        f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
+        flush=True,
+    )
+    print(f"\n{results=}", flush=True)
+
+
+async def download_pokemon_list(
+    pokemon_nums: Iterable[int] = range(1, 21),
+    max_in_flight: int = MAX_IN_FLIGHT,
+    parse_workers: int = PARSE_WORKERS,
+    queue_size: int | None = None,
+) -> list[tuple[int, str]]:
+    """Download a list of Pokémon from 'pokemondb.net'.
+
+    `parse_workers` processes parse the pages. At most `queue_size` pages
+    (twice `parse_workers` by default) wait for a free process.
+    """
+    with ProcessPoolExecutor(parse_workers) as pool:
+        parser = ParseStage(
+            extract_h1, pool, workers=parse_workers, queue_size=queue_size
+        )
+        return await crawl(parser, pokemon_nums, max_in_flight)
+
+
+async def crawl(
+    parser: ParseStage,
+    pokemon_nums: Iterable[int] = range(1, 21),
+    max_in_flight: int = MAX_IN_FLIGHT,
+) -> list[tuple[int, str]]:
+    """Download the Pokémon and parse their pages through `parser`."""
+    connector = aiohttp.TCPConnector(limit_per_host=max_in_flight)
+    async with aiohttp.ClientSession(connector=connector) as session, parser:
+        engine = CrawlEngine(
+            partial(download_single_pokemon, session, parser),
+            max_in_flight=max_in_flight,
+            adaptive=False,
+        )
+        print("Crawling and parsing...", flush=True)
+        results = await engine.run(pokemon_nums)
+    stats = engine.stats()
+    print(
+        f"Done gathering results: [cyan]{stats.throughput:,.1f}[/cyan] Pokémon/sec, "
+        f"parse queue peaked at [cyan]{parser.max_queue_depth}[/cyan] pages, "
+        f"fetchers held back for [cyan]{parser.blocked_seconds:,.2f}[/cyan] s.",
+        flush=True,
+    )
+    return results
+
+
+async def download_single_pokemon(
+    session: aiohttp.ClientSession, parser: ParseStage, pokemon_num: int = 1
+) -> tuple[int, str]:
+    """Get a Pokémon from 'pokemondb.net' by its pokedex number."""
+    print(
+        f"[yellow]Downloading Pokémon {pokemon_num:02}... [/yellow]",
+        flush=True,
+    )
+    url = f"{BASE_URL}/{pokemon_num}"
+    async with session.get(url) as resp:
+        resp.raise_for_status()
+        body, charset = await resp.read(), resp.charset or "utf-8"
+    header = await parser.parse(body, charset)
+    print(
+        f"[green]Retrieved [magenta]{pokemon_num:02}={header}",
+        flush=True,
+    )
+    return (pokemon_num, header)
+
+
+def extract_h1(body: bytes, charset: str) -> str:
+    """Decode a page and pull out its H1, in a worker process."""
+    return get_h1_soup(body.decode(charset, errors="replace"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Download Pokémon with one event loop per process.
+
+A single event loop runs on a single core, and everything aiohttp does for a
+download (TLS, HTTP parsing, our own H1 parsing) is Python on that loop. This
+splits the Pokédex numbers into one shard per process. Each process runs the
+`2_async_aiohttp.py` crawl over its shard with its own loop and session, and
+the shards' results are merged back into the order they were asked for.
+
+Shards are dealt out round robin (1, N+1, 2N+1, ... go to the first process),
+so slow and fast pages spread evenly across processes.
+"""
+import asyncio
+import importlib
+import os
+import pickle
+import time
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+from rich import print
+
+# The numbered script can't be imported with a plain `import` statement.
+aiohttp_downloader = importlib.import_module("2_async_aiohttp")
+
+PROCESSES = os.cpu_count() or 1
+
+
+def main() -> None:
+    t0 = time.time()
+    print("Starting shard processes...", flush=True)
+    results = download_pokemon_list()
+    total_seconds = time.time() - t0
+    print(
+        f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
+        flush=True,
+    )
+    print(f"\n{results=}", flush=True)
+
+
+def download_pokemon_list(
+    pokemon_nums: Sequence[int] = range(1, 21),
+    processes: int = PROCESSES,
+    max_in_flight: int = aiohttp_downloader.MAX_IN_FLIGHT,
+    quiet: bool = False,
+) -> list[tuple[int, str | Exception]]:
+    """Download a list of Pokémon from 'pokemondb.net' across `processes` loops.
+
+    Each process keeps up to `max_in_flight` downloads going at the start.
+    With `quiet`, the processes don't print per-Pokémon progress.
+    """
+    processes = max(min(processes, len(pokemon_nums)), 1)
+    shards = [list(pokemon_nums[shard::processes]) for shard in range(processes)]
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [
+            executor.submit(
+                crawl_shard,
+                shard_nums,
+                aiohttp_downloader.BASE_URL,
+                max_in_flight,
+                quiet,
+            )
+            for shard_nums in shards
+        ]
+        shard_results = [future.result() for future in futures]
+    # Take the results back in the same round robin the numbers were dealt in.
+    return [
+        shard_results[index % processes][index // processes]
+        for index in range(len(pokemon_nums))
+    ]
+
+
+def crawl_shard(
+    pokemon_nums: list[int], base_url: str, max_in_flight: int, quiet: bool
+) -> list[tuple[int, str | Exception]]:
+    """Crawl one shard on this process's own event loop."""
+    aiohttp_downloader.BASE_URL = base_url
+    if quiet:
+        aiohttp_downloader.print = lambda *args, **kwargs: None
+    else:
+        print(
+            f"[blue]Process {os.getpid()} crawling {len(pokemon_nums)} Pokémon...",
+            flush=True,
+        )
+    results = asyncio.run(
+        aiohttp_downloader.download_pokemon_list(
+            pokemon_nums, max_in_flight=max_in_flight
+        )
+    )
+    return [(num, picklable(header)) for num, header in results]
+
+
+def picklable(header: str | Exception) -> str | Exception:
+    """Swap an error that can't be sent back to the parent for one that can.
+
+    aiohttp's response errors hold the response headers, which don't pickle.
+    """
+    if isinstance(header, Exception):
+        try:
+            pickle.dumps(header)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return RuntimeError(f"{type(header).__name__}: {header}")
+    return header
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare every HTTP backend in `downloader.py` against the stand-in server.
+
+Each backend downloads the same pages from a local server that waits
+`--latency` seconds before answering and serves pages with `--table-rows`
+table rows. The table shows per-page latency percentiles (fetch and parse),
+throughput, and the CPU time the client process spent. The server runs in
+its own process, so its CPU time isn't counted.
+
+Run it with e.g. `python web/bench_backends.py --latency 0.05 --count 300`.
+"""
+import argparse
+import time
+
+import downloader
+from bench_utils import percentile, silence
+from pokedex_server import ServerSettings, render_page, serve_in_process
+from rich import print
+from rich.table import Table
+
+# Pages each backend downloads (and throws away) before it's measured.
+WARMUP_PAGES = 5
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the HTTP backends.")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--table-rows", type=int, default=600)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--max-in-flight", type=int, default=downloader.MAX_IN_FLIGHT)
+    args = parser.parse_args()
+    silence(downloader)
+    settings = ServerSettings(
+        latency=args.latency, table_rows=args.table_rows, cached_pages=args.count
+    )
+    page_kib = len(render_page(1, args.table_rows).encode()) / 1024
+    table = Table(
+        title=(
+            f"Downloading {args.count} Pokémon: {args.latency * 1000:,.0f} ms "
+            f"latency, {page_kib:,.0f} KiB pages, {args.max_in_flight} in flight"
+        )
+    )
+    table.add_column("Backend", no_wrap=True)
+    for column in ("p50 ms", "p95 ms", "p99 ms", "Pages/sec", "CPU s", "CPU ms/page"):
+        table.add_column(column, justify="right")
+    pokemon_nums = range(1, args.count + 1)
+    expected = None
+    with serve_in_process(settings) as base_url:
+        for backend in downloader.available_backends():
+            downloader.timed_downloads(
+                backend, range(1, WARMUP_PAGES + 1), base_url, args.max_in_flight
+            )
+            cpu0, t0 = time.process_time(), time.perf_counter()
+            downloads = downloader.timed_downloads(
+                backend, pokemon_nums, base_url, args.max_in_flight
+            )
+            total_seconds = time.perf_counter() - t0
+            cpu_seconds = time.process_time() - cpu0
+            headers = [download.header for download in downloads]
+            failed = [header for header in headers if isinstance(header, Exception)]
+            if failed:
+                raise AssertionError(f"{backend}: {len(failed)} downloads failed")
+            if expected is None:
+                expected = headers
+            elif headers != expected:
+                raise AssertionError(f"{backend} returned different headers")
+            latencies = [download.seconds for download in downloads]
+            table.add_row(
+                backend,
+                *(f"{percentile(latencies, pct) * 1000:,.1f}" for pct in (50, 95, 99)),
+                f"{len(downloads) / total_seconds:,.1f}",
+                f"{cpu_seconds:,.2f}",
+                f"{cpu_seconds / len(downloads) * 1000:,.2f}",
+            )
+    print(table)
+    if not downloader.HAS_HTTP2:
+        print(r"[yellow]httpx-http2 skipped: install `httpx\[http2]` to include it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare a fresh `aiohttp.ClientSession` per request with one shared session.
+
+Both runs fetch the same Pokédex pages from the local stand-in server and
+count the TCP connections aiohttp had to open to do it. Pages are fetched but
+not parsed, so the timings show the connection cost instead of BeautifulSoup's.
+"""
+import asyncio
+import time
+
+import aiohttp
+from bench_utils import load_script
+from pokedex_server import serve_in_thread
+from rich import print
+from rich.table import Table
+
+POKEMON_NUMS = range(1, 1001)
+
+downloader = load_script("2_async_aiohttp")
+
+
+def main() -> None:
+    table = Table(title=f"Downloading {len(POKEMON_NUMS)} Pokémon")
+    table.add_column("Strategy")
+    table.add_column("Connections opened", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Requests/sec", justify="right")
+    with serve_in_thread() as base_url:
+        downloader.BASE_URL = base_url
+        for name, strategy in (
+            ("Session per request", download_with_fresh_sessions),
+            ("Shared session", download_with_shared_session),
+        ):
+            connections, total_seconds = asyncio.run(strategy())
+            table.add_row(
+                name,
+                f"{connections:,}",
+                f"{total_seconds:,.2f}",
+                f"{len(POKEMON_NUMS) / total_seconds:,.0f}",
+            )
+    print(table)
+
+
+def connection_counter() -> tuple[aiohttp.TraceConfig, list[int]]:
+    """Make a trace config that counts every new connection aiohttp opens."""
+    opened = [0]
+
+    async def on_connection_create_end(*_) -> None:
+        opened[0] += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config, opened
+
+
+async def download_with_fresh_sessions() -> tuple[int, float]:
+    """Open a new session (and so a new connector) for every Pokémon."""
+    trace_config, opened = connection_counter()
+
+    async def download(pokemon_num: int) -> bytes:
+        async with aiohttp.ClientSession(trace_configs=[trace_config]) as session:
+            return await fetch(session, pokemon_num)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(download(num) for num in POKEMON_NUMS))
+    return opened[0], time.perf_counter() - t0
+
+
+async def download_with_shared_session() -> tuple[int, float]:
+    """Reuse the pooled session from `2_async_aiohttp.make_session`."""
+    trace_config, opened = connection_counter()
+    t0 = time.perf_counter()
+    async with downloader.make_session(trace_configs=[trace_config]) as session:
+        await asyncio.gather(*(fetch(session, num) for num in POKEMON_NUMS))
+    return opened[0], time.perf_counter() - t0
+
+
+async def fetch(session: aiohttp.ClientSession, pokemon_num: int) -> bytes:
+    """Fetch a single Pokédex page without parsing it."""
+    async with session.get(f"{downloader.BASE_URL}/{pokemon_num}") as resp:
+        resp.raise_for_status()
+        return await resp.read()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare the ways `2_async_alternative_syntax.py` runs its downloads.
+
+The downloads are swapped for stand-ins that never touch the network, so this
+measures only the strategy and event loop, for each one:
+
+- Startup: running with no Pokémon at all (loop and session setup/teardown).
+- Per task: the extra time each instant download adds to a big batch.
+- With a failure: one download fails while the rest are still waiting on a
+  slow server. Every strategy should keep going and hand back the others'
+  headers, with the error in place of the failed one's; this checks they do,
+  and times the run.
+
+Strategies are also run on uvloop if it's installed.
+"""
+import asyncio
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+import aiohttp
+from bench_utils import load_script, silence
+from rich import print
+from rich.table import Table
+
+STARTUP_RUNS = 20
+SCHEDULING_TASKS = 5_000
+# In the failure test, Pokémon 2 fails after `FAIL_AFTER` seconds, while
+# every other download takes `SLOW_DOWNLOAD` seconds.
+FAIL_AFTER = 0.05
+SLOW_DOWNLOAD = 0.2
+
+strategies = load_script("2_async_alternative_syntax")
+
+Strategy = Callable[..., Any]
+LoopFactory = Callable[[], asyncio.AbstractEventLoop]
+
+
+def main() -> None:
+    silence(strategies)
+    table = Table(title="Event loop strategies (no network)")
+    table.add_column("Strategy")
+    table.add_column("Loop")
+    table.add_column("Startup (ms)", justify="right")
+    table.add_column("Per task (µs)", justify="right")
+    table.add_column("With a failure (ms)", justify="right")
+    for loop_name, loop_factory in strategies.LOOP_FACTORIES.items():
+        for name, strategy in strategies.STRATEGIES.items():
+            startup = measure_startup(strategy, loop_factory)
+            per_task = measure_per_task(strategy, loop_factory, startup)
+            with_failure = measure_with_failure(strategy, loop_factory)
+            table.add_row(
+                name,
+                loop_name,
+                f"{startup * 1000:,.2f}",
+                f"{per_task * 1_000_000:,.1f}",
+                f"{with_failure * 1000:,.1f}",
+            )
+    print(table)
+    if "uvloop" not in strategies.LOOP_FACTORIES:
+        print("[yellow]uvloop skipped: `pip install uvloop` to include it.")
+
+
+def measure_startup(strategy: Strategy, loop_factory: LoopFactory) -> float:
+    """Median seconds to run the strategy with nothing to download."""
+    timings = []
+    for _ in range(STARTUP_RUNS):
+        t0 = time.perf_counter()
+        strategy(range(0), loop_factory=loop_factory)
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings)
+
+
+def measure_per_task(
+    strategy: Strategy, loop_factory: LoopFactory, startup: float
+) -> float:
+    """Seconds each instant download adds on top of `startup`."""
+    strategies.download_single_pokemon = instant_download
+    t0 = time.perf_counter()
+    strategy(range(SCHEDULING_TASKS), loop_factory=loop_factory)
+    total_seconds = time.perf_counter() - t0
+    strategies.download_single_pokemon = original_download
+    return (total_seconds - startup) / SCHEDULING_TASKS
+
+
+def measure_with_failure(strategy: Strategy, loop_factory: LoopFactory) -> float:
+    """Seconds to run 20 downloads when one fails, checking the rest came back."""
+
+    async def failing_download(
+        session: aiohttp.ClientSession, pokemon_num: int
+    ) -> tuple[int, str]:
+        if pokemon_num == 2:
+            await asyncio.sleep(FAIL_AFTER)
+            raise RuntimeError("Pokémon 2 failed")
+        await asyncio.sleep(SLOW_DOWNLOAD)
+        return pokemon_num, str(pokemon_num)
+
+    strategies.download_single_pokemon = failing_download
+    t0 = time.perf_counter()
+    try:
+        results = strategy(range(1, 21), loop_factory=loop_factory)
+    finally:
+        strategies.download_single_pokemon = original_download
+    total_seconds = time.perf_counter() - t0
+    failed = [num for num, header in results if isinstance(header, RuntimeError)]
+    others = [header == str(num) for num, header in results if num != 2]
+    if failed != [2] or len(others) != 19 or not all(others):
+        raise AssertionError(f"Expected only Pokémon 2 to fail: {results}")
+    return total_seconds
+
+
+async def instant_download(
+    session: aiohttp.ClientSession, pokemon_num: int
+) -> tuple[int, str]:
+    return pokemon_num, ""
+
+
+original_download = strategies.download_single_pokemon
+
+
+if __name__ == "__main__":
+    main()
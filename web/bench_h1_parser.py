@@ -0,0 +1,78 @@
+"""Compare the streaming `H1Parser` with the original BeautifulSoup `get_h1`.
+
+First checks both return the same header for every page in the fixture corpus
+(the edge cases in `fixtures/h1/` plus a rendered page for each of the first
+151 Pokémon), then reports per-page parse time and peak memory for each.
+"""
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from h1_parser import get_h1, get_h1_soup
+from pokedex_server import POKEMON_NAMES, render_page
+from rich import print
+from rich.table import Table
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "h1"
+MEMORY_SAMPLE_EVERY = 10
+
+
+def main() -> None:
+    corpus = load_corpus()
+    check_results_match(corpus)
+    pages = list(corpus.values())
+    table = Table(title=f"Finding the H1 in {len(pages)} pages")
+    table.add_column("Implementation")
+    table.add_column("ms per page", justify="right")
+    table.add_column("Peak memory (KiB)", justify="right")
+    for name, parse in (
+        ("BeautifulSoup (full tree)", get_h1_soup),
+        ("H1Parser (stops at </h1>)", get_h1),
+    ):
+        seconds_per_page, peak_bytes = measure(parse, pages)
+        table.add_row(
+            name, f"{1000 * seconds_per_page:,.3f}", f"{peak_bytes / 1024:,.0f}"
+        )
+    print(table)
+
+
+def load_corpus() -> dict[str, str]:
+    """Load the edge case fixtures and render a page for each named Pokémon."""
+    corpus = {
+        path.name: path.read_text() for path in sorted(FIXTURES_DIR.glob("*.html"))
+    }
+    for pokemon_num in range(1, len(POKEMON_NAMES) + 1):
+        corpus[f"pokedex/{pokemon_num}"] = render_page(pokemon_num)
+    return corpus
+
+
+def check_results_match(corpus: dict[str, str]) -> None:
+    """Fail loudly if the fast parser disagrees with BeautifulSoup anywhere."""
+    results = {name: (get_h1_soup(html), get_h1(html)) for name, html in corpus.items()}
+    mismatches = {name: pair for name, pair in results.items() if pair[0] != pair[1]}
+    if mismatches:
+        raise AssertionError(f"H1Parser disagrees with BeautifulSoup: {mismatches}")
+    print(f"[green]Both parsers agree on all {len(corpus)} pages.", flush=True)
+
+
+def measure(parse: Callable[[str], str], pages: list[str]) -> tuple[float, int]:
+    """Return the mean seconds per page and the peak memory of one parse.
+
+    Memory is traced on a sample of pages since tracing slows parsing down a lot.
+    """
+    t0 = time.perf_counter()
+    for html in pages:
+        parse(html)
+    seconds_per_page = (time.perf_counter() - t0) / len(pages)
+    peak_bytes = 0
+    for html in pages[::MEMORY_SAMPLE_EVERY]:
+        tracemalloc.start()
+        parse(html)
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return seconds_per_page, peak_bytes
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare parsing pages on the event loop with parsing them in a pool.
+
+Reports total wall time plus how late the event loop ran a task that wakes up
+every 5ms. The longer each inline parse blocks the loop, the larger that lag,
+and the longer every other in-flight download waits to be serviced.
+
+Pages are parsed with BeautifulSoup (`h1_parser.get_h1_soup`), the slow parse
+worth moving off the loop. The last row parses inline with the downloader's
+own fast `get_h1`, for comparison.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from bench_utils import LoopLagMonitor, load_script, percentile, silence
+from h1_parser import get_h1, get_h1_soup
+from pokedex_server import serve_in_process
+from rich import print
+from rich.table import Table
+
+POKEMON_NUMS = range(1, 201)
+MAX_IN_FLIGHT = 20
+PARSE_WORKERS = 4
+
+downloader = load_script("2_async_aiohttp")
+
+
+def main() -> None:
+    silence(downloader)
+    table = Table(title=f"Downloading + parsing {len(POKEMON_NUMS)} Pokémon")
+    table.add_column("Parsing", no_wrap=True)
+    table.add_column("Parser")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Mean loop lag (ms)", justify="right")
+    table.add_column("p99 loop lag (ms)", justify="right")
+    table.add_column("Max loop lag (ms)", justify="right")
+    with serve_in_process() as base_url:
+        downloader.BASE_URL = base_url
+        for name, parse, executor in (
+            ("Inline", get_h1_soup, None),
+            (
+                f"Thread pool ({PARSE_WORKERS})",
+                get_h1_soup,
+                ThreadPoolExecutor(PARSE_WORKERS),
+            ),
+            (
+                f"Process pool ({PARSE_WORKERS})",
+                get_h1_soup,
+                ProcessPoolExecutor(PARSE_WORKERS),
+            ),
+            ("Inline", get_h1, None),
+        ):
+            # The downloader parses with its module-level `get_h1`, in the pool too.
+            downloader.get_h1 = parse
+            total_seconds, lags = asyncio.run(download_all(executor))
+            if executor is not None:
+                executor.shutdown()
+            table.add_row(
+                name,
+                parse.__name__,
+                f"{total_seconds:,.2f}",
+                f"{1000 * sum(lags) / len(lags):,.1f}",
+                f"{1000 * percentile(lags, 99):,.1f}",
+                f"{1000 * max(lags):,.1f}",
+            )
+    print(table)
+
+
+async def download_all(executor: Executor | None) -> tuple[float, list[float]]:
+    """Download every Pokémon while watching the event loop's lag."""
+    t0 = time.perf_counter()
+    async with LoopLagMonitor() as monitor:
+        await downloader.download_pokemon_list(
+            POKEMON_NUMS, max_in_flight=MAX_IN_FLIGHT, parse_executor=executor
+        )
+    return time.perf_counter() - t0, monitor.lags
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Show how the asyncio + process pool pipeline scales with the number of cores.
+
+Each run crawls the same pages from the stand-in server with a different
+number of parse processes, from 1 up to twice the machine's core count. While
+the pool is the bottleneck, every extra core should add throughput, and the
+parse queue stays full, holding the fetchers back (the last column adds up
+how long each fetcher waited). Once fetching is the bottleneck, the queue
+drains and extra processes stop helping.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_utils import load_script, silence
+from parse_pool import ParseStage
+from pokedex_server import serve_in_process
+from rich import print
+from rich.table import Table
+
+POKEMON_NUMS = range(1, 81)
+MAX_IN_FLIGHT = 20
+CORES = os.cpu_count() or 1
+
+pipeline = load_script("4_async_process_pool")
+
+
+def main() -> None:
+    silence(pipeline)
+    # Up to twice the core count, to show where extra processes stop paying off.
+    worker_counts = sorted({2**i for i in range((2 * CORES).bit_length())} | {CORES})
+    table = Table(
+        title=f"Downloading + parsing {len(POKEMON_NUMS)} Pokémon on {CORES} cores"
+    )
+    table.add_column("Parse processes", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Pages/sec", justify="right")
+    table.add_column("Speedup vs 1", justify="right")
+    table.add_column("Peak parse queue", justify="right")
+    table.add_column("Fetchers' wait (s)", justify="right")
+    baseline = None
+    with serve_in_process() as base_url:
+        pipeline.BASE_URL = base_url
+        for workers in worker_counts:
+            with ProcessPoolExecutor(workers) as pool:
+                parser = ParseStage(pipeline.extract_h1, pool, workers=workers)
+                t0 = time.perf_counter()
+                asyncio.run(pipeline.crawl(parser, POKEMON_NUMS, MAX_IN_FLIGHT))
+                total_seconds = time.perf_counter() - t0
+            throughput = len(POKEMON_NUMS) / total_seconds
+            baseline = baseline or throughput
+            table.add_row(
+                str(workers),
+                f"{total_seconds:,.2f}",
+                f"{throughput:,.1f}",
+                f"{throughput / baseline:,.2f}x",
+                str(parser.max_queue_depth),
+                f"{parser.blocked_seconds:,.2f}",
+            )
+    print(table)
+    if CORES == 1:
+        print("[yellow]Only one core here, so extra processes can only take turns.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare collecting every result with streaming them to a `ResultSink`.
+
+Each run downloads the same Pokémon from the stand-in server, with both the
+aiohttp and the threaded downloader. "Collected" calls
+`download_pokemon_list`, which returns one list at the end. "Streamed" feeds
+`iter_pokemon` into a `ResultSink`, which writes each result to a JSONL file
+as it arrives. The table shows wall time and the peak memory traced by
+`tracemalloc` while downloading. Pages are kept small, so the memory is mostly
+the downloaders' own bookkeeping rather than page bodies.
+"""
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from bench_utils import load_script, silence
+from pokedex_server import ServerSettings, serve_in_process
+from result_sink import ResultSink
+from rich import print
+from rich.table import Table
+
+POKEMON_COUNTS = (1_000, 5_000)
+SMALL_PAGES = ServerSettings(table_rows=10, cached_pages=max(POKEMON_COUNTS))
+
+async_downloader = load_script("2_async_aiohttp")
+threaded_downloader = load_script("3_threaded")
+
+
+def main() -> None:
+    silence(async_downloader, threaded_downloader)
+    table = Table(title="Collecting vs streaming results")
+    table.add_column("Downloader")
+    table.add_column("Pokémon", justify="right")
+    table.add_column("Results")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Peak memory (KiB)", justify="right")
+    tmp = tempfile.TemporaryDirectory()
+    output = Path(tmp.name) / "results.jsonl"
+    with serve_in_process(SMALL_PAGES) as base_url, tmp:
+        async_downloader.BASE_URL = threaded_downloader.BASE_URL = base_url
+        for name, collect, stream in (
+            ("aiohttp", collect_async, stream_async),
+            ("threaded", collect_threaded, stream_threaded),
+        ):
+            for count in POKEMON_COUNTS:
+                for mode, run in (("Collected", collect), ("Streamed", stream)):
+                    total_seconds, peak_bytes = measure(run, count, output)
+                    table.add_row(
+                        name,
+                        f"{count:,}",
+                        mode,
+                        f"{total_seconds:,.2f}",
+                        f"{peak_bytes / 1024:,.0f}",
+                    )
+            table.add_section()
+    print(table)
+
+
+def measure(
+    run: Callable[[range, Path], int], count: int, output: Path
+) -> tuple[float, int]:
+    """Return wall time and peak traced memory, after checking every result."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    done = run(range(1, count + 1), output)
+    total_seconds = time.perf_counter() - t0
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if done != count:
+        raise AssertionError(f"Expected {count} results, got {done}")
+    return total_seconds, peak_bytes
+
+
+def collect_async(pokemon_nums: range, output: Path) -> int:
+    results = asyncio.run(async_downloader.download_pokemon_list(pokemon_nums))
+    return count_successes(results)
+
+
+def stream_async(pokemon_nums: range, output: Path) -> int:
+    with ResultSink(output) as sink:
+        asyncio.run(sink.awrite_all(async_downloader.iter_pokemon(pokemon_nums)))
+    return count_written(output)
+
+
+def collect_threaded(pokemon_nums: range, output: Path) -> int:
+    results = threaded_downloader.download_pokemon_list(pokemon_nums)
+    return count_successes(results)
+
+
+def stream_threaded(pokemon_nums: range, output: Path) -> int:
+    with ResultSink(output) as sink:
+        sink.write_all(threaded_downloader.iter_pokemon(pokemon_nums))
+    return count_written(output)
+
+
+def count_successes(results: list[tuple[int, str | Exception]]) -> int:
+    return sum(not isinstance(header, Exception) for _, header in results)
+
+
+def count_written(output: Path) -> int:
+    """Count the rows in a JSONL results file that didn't fail."""
+    with output.open(encoding="utf-8") as file:
+        return sum('"error": ""' in line for line in file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Measure the sharded crawler's throughput with 1..N event loop processes.
+
+Every run downloads the same pages from the stand-in server, split across a
+different number of processes. With spare cores, each extra process adds
+another loop's worth of Python overhead capacity until the server (or the
+network) becomes the bottleneck. The stand-in server runs in a process of its
+own, so it competes for cores too.
+"""
+import os
+import time
+
+from bench_utils import load_script
+from pokedex_server import ServerSettings, serve_in_process
+from rich import print
+from rich.table import Table
+
+POKEMON_NUMS = range(1, 3001)
+MAX_PROCESSES = max(os.cpu_count() or 1, 4)
+
+sharded = load_script("5_sharded_processes")
+
+
+def main() -> None:
+    table = Table(
+        title=(
+            f"Downloading {len(POKEMON_NUMS)} Pokémon on "
+            f"{os.cpu_count()} cores, one event loop per process"
+        )
+    )
+    table.add_column("Processes", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Pages/sec", justify="right")
+    table.add_column("Speedup vs 1", justify="right")
+    baseline = None
+    expected = None
+    with serve_in_process(ServerSettings(cached_pages=len(POKEMON_NUMS))) as base_url:
+        sharded.aiohttp_downloader.BASE_URL = base_url
+        for processes in range(1, MAX_PROCESSES + 1):
+            t0 = time.perf_counter()
+            results = sharded.download_pokemon_list(
+                POKEMON_NUMS, processes=processes, quiet=True
+            )
+            total_seconds = time.perf_counter() - t0
+            if expected is None:
+                expected = results
+            elif results != expected:
+                raise AssertionError(f"{processes} processes merged different results")
+            throughput = len(POKEMON_NUMS) / total_seconds
+            baseline = baseline or throughput
+            table.add_row(
+                str(processes),
+                f"{total_seconds:,.2f}",
+                f"{throughput:,.1f}",
+                f"{throughput / baseline:,.2f}x",
+            )
+    print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare buffering whole pages with streaming them until the H1 closes.
+
+The stand-in server sends each page in 8 KiB chunks with a short pause between
+them, like a real link would. The server counts the page bytes it managed to
+send before the client hung up. The table also shows wall time and the peak
+memory traced by `tracemalloc` while downloading.
+"""
+import asyncio
+import time
+import tracemalloc
+
+import aiohttp
+from bench_utils import load_script, silence
+from pokedex_server import ServerSettings, serve_in_process
+from rich import print
+from rich.table import Table
+
+POKEMON_NUMS = range(1, 301)
+MAX_IN_FLIGHT = 20
+SLOW_LINK = ServerSettings(chunk_bytes=8192, chunk_delay=0.02)
+
+downloader = load_script("2_async_aiohttp")
+
+
+def main() -> None:
+    silence(downloader)
+    table = Table(title=f"Downloading {len(POKEMON_NUMS)} Pokémon")
+    table.add_column("Body")
+    table.add_column("KiB sent", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Peak memory (KiB)", justify="right")
+    with serve_in_process(SLOW_LINK) as base_url:
+        downloader.BASE_URL = base_url
+        for name, stream in (("Buffered", False), ("Streamed", True)):
+            bytes_before = asyncio.run(bytes_sent(base_url))
+            total_seconds, peak_bytes = asyncio.run(download_all(stream))
+            # Give the server a moment to notice the connections we dropped.
+            time.sleep(SLOW_LINK.chunk_delay * 2)
+            bytes_after = asyncio.run(bytes_sent(base_url))
+            table.add_row(
+                name,
+                f"{(bytes_after - bytes_before) / 1024:,.0f}",
+                f"{total_seconds:,.2f}",
+                f"{peak_bytes / 1024:,.0f}",
+            )
+    print(table)
+
+
+async def download_all(stream: bool) -> tuple[float, int]:
+    """Download every Pokémon, returning wall time and peak traced memory."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    async with downloader.make_session() as session:
+        semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+        async def download(pokemon_num: int) -> tuple[int, str]:
+            async with semaphore:
+                return await downloader.download_single_pokemon(
+                    session, pokemon_num, stream=stream
+                )
+
+        await asyncio.gather(*(download(num) for num in POKEMON_NUMS))
+    total_seconds = time.perf_counter() - t0
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return total_seconds, peak_bytes
+
+
+async def bytes_sent(base_url: str) -> int:
+    """Ask the stand-in server how many page bytes it has sent so far."""
+    stats_url = base_url.removesuffix("/pokedex") + "/stats"
+    async with aiohttp.ClientSession() as session, session.get(stats_url) as resp:
+        return (await resp.json())["bytes_sent"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Sweep the threaded downloader's worker count to see where throughput levels off.
+
+Each run downloads the same pages from a stand-in server that takes
+`SERVER_LATENCY` seconds to answer, with the session's connection pool sized
+to match the worker count. While requests mostly wait on the server, more
+workers help almost linearly. Once the GIL-bound work (parsing, requests'
+own overhead) fills the CPU, extra workers stop paying for themselves.
+"""
+import time
+
+from bench_utils import load_script, silence
+from pokedex_server import ServerSettings, serve_in_process
+from rich import print
+from rich.table import Table
+
+POKEMON_NUMS = range(1, 401)
+WORKER_COUNTS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+SERVER_LATENCY = 0.05
+
+# A run counts as saturated when it's less than this much faster than the last.
+SATURATION_GAIN = 1.1
+
+downloader = load_script("3_threaded")
+
+
+def main() -> None:
+    silence(downloader)
+    table = Table(
+        title=(
+            f"Downloading {len(POKEMON_NUMS)} Pokémon with "
+            f"{SERVER_LATENCY * 1000:,.0f} ms server latency"
+        )
+    )
+    table.add_column("Workers", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Pages/sec", justify="right")
+    table.add_column("Speedup vs 1", justify="right")
+    table.add_column("CPU s", justify="right")
+    table.add_column("")
+    baseline = previous = None
+    saturated = False
+    with serve_in_process(ServerSettings(latency=SERVER_LATENCY)) as base_url:
+        downloader.BASE_URL = base_url
+        for workers in WORKER_COUNTS:
+            cpu0, t0 = time.process_time(), time.perf_counter()
+            downloader.download_pokemon_list(POKEMON_NUMS, max_workers=workers)
+            total_seconds = time.perf_counter() - t0
+            cpu_seconds = time.process_time() - cpu0
+            throughput = len(POKEMON_NUMS) / total_seconds
+            baseline = baseline or throughput
+            note = ""
+            if previous and not saturated and throughput < previous * SATURATION_GAIN:
+                saturated = True
+                note = "[yellow]saturated"
+            previous = throughput
+            table.add_row(
+                str(workers),
+                f"{total_seconds:,.2f}",
+                f"{throughput:,.1f}",
+                f"{throughput / baseline:,.1f}x",
+                f"{cpu_seconds:,.2f}",
+                note,
+            )
+    print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Helpers shared by the `bench_*.py` scripts in this directory."""
+import asyncio
+import importlib
+import math
+import time
+from collections.abc import Sequence
+from types import ModuleType
+from typing import Self
+
+
+def load_script(name: str) -> ModuleType:
+    """Import one of the numbered example scripts, e.g. `2_async_aiohttp`."""
+    return importlib.import_module(name)
+
+
+def silence(*modules: ModuleType) -> None:
+    """Swap out the per-Pokémon progress prints so they don't skew the timings."""
+    for module in modules:
+        module.print = lambda *args, **kwargs: None
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Return the `pct`th percentile of `values` (nearest rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+class LoopLagMonitor:
+    """Record how late the event loop wakes up a task sleeping `interval` seconds.
+
+    Anything that blocks the loop, like parsing a page inline, shows up as lag.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> Self:
+        self._task = asyncio.create_task(self._watch())
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _watch(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - t0 - self.interval)
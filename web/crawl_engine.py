@@ -0,0 +1,519 @@
+"""A bounded-concurrency crawl engine whose limit adapts to the server (AIMD).
+
+`asyncio.gather` starts every download at once. That's fine for 20 Pokémon,
+but for thousands it floods the remote host and runs out of file descriptors.
+`CrawlEngine` caps how many downloads are in flight. After each window of
+healthy responses it raises that cap by one (additive increase). When it sees
+a 429/5xx, or a response slower than `latency_target`, it halves the cap
+(multiplicative decrease).
+
+To keep one slow or failing page from holding up (or sinking) the whole
+crawl, each attempt can be given a `timeout`, retryable failures are retried
+after an exponential backoff with full jitter (or, when a 429/503 says how
+long to wait with `Retry-After`, after at least that long), and an
+attempt that runs past
+the `hedge_percentile` of recent latencies gets a duplicate request racing it.
+`run_partial()` returns each item's error in place of its result instead of
+cancelling the crawl, and `as_completed()` yields results as they arrive.
+
+Code that runs without an engine, like the threaded downloader, can retry
+one call the same way with `call_with_retries()` (or `acall_with_retries()`).
+"""
+import asyncio
+import random
+import statistics
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Generic, TypeVar, cast
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+OVERLOAD_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Statuses whose `Retry-After` header says when to try again.
+RETRY_AFTER_STATUSES = frozenset({429, 503})
+
+# Retry defaults: attempts in all, and the backoff before retry `n`, which is
+# random between 0 and `BACKOFF_SECONDS * 2 ** (n - 1)`, capped at
+# `MAX_BACKOFF_SECONDS`. An item the server asks to come back more than
+# `MAX_RETRY_AFTER_SECONDS` later fails instead.
+MAX_ATTEMPTS = 6
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 10.0
+MAX_RETRY_AFTER_SECONDS = 120.0
+
+
+@dataclass(frozen=True)
+class CrawlStats:
+    """A snapshot of how a crawl is going."""
+
+    completed: int
+    failed: int
+    throttled: int
+    timed_out: int
+    hedged: int
+    in_flight: int
+    queue_depth: int
+    limit: int
+    elapsed_seconds: float
+    mean_latency_seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Completed downloads per second."""
+        return self.completed / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class AIMDLimiter:
+    """A concurrency limit that grows additively and shrinks multiplicatively."""
+
+    def __init__(
+        self,
+        limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        decrease_factor: float = 0.5,
+        latency_target: float | None = None,
+    ) -> None:
+        self.limit = limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._healthy_in_window = 0
+        self._last_decrease = 0.0
+        self._slot_freed = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """Wait until there is room for one more request in flight."""
+        async with self._slot_freed:
+            await self._slot_freed.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool) -> None:
+        """Give back a slot and adjust the limit based on how the request went."""
+        async with self._slot_freed:
+            self.in_flight -= 1
+            if overloaded or (
+                self.latency_target is not None and latency > self.latency_target
+            ):
+                self._decrease(latency)
+            else:
+                self._increase()
+            self._slot_freed.notify(max(self.limit - self.in_flight, 0))
+
+    def _increase(self) -> None:
+        # One extra slot per `limit` healthy responses, i.e. roughly per round trip.
+        self._healthy_in_window += 1
+        if self._healthy_in_window >= self.limit:
+            self._healthy_in_window = 0
+            self.limit = min(self.limit + 1, self.max_limit)
+
+    def _decrease(self, latency: float) -> None:
+        # A burst of bad responses from the same round trip should only count once.
+        now = time.monotonic()
+        if now - self._last_decrease < latency:
+            return
+        self._last_decrease = now
+        self._healthy_in_window = 0
+        self.limit = max(int(self.limit * self.decrease_factor), self.min_limit)
+
+
+class CrawlEngine(Generic[ItemT, ResultT]):
+    """Run `fetch` over many items with at most `limiter.limit` in flight.
+
+    The limit starts at `max_in_flight` and, when `adaptive`, moves between 1
+    and `max_limit` (four times `max_in_flight` by default).
+
+    Items that fail with a 429/5xx, or take longer than `timeout` seconds, are
+    retried up to `max_attempts` times in all. Retry `n` waits a random time
+    between 0 and `backoff * 2 ** (n - 1)` seconds, capped at `max_backoff`.
+    A 429/503 with a `Retry-After` header waits that long on top, so never
+    comes back early; one asking for more than `max_retry_after` seconds
+    fails instead. Any other exception cancels the crawl and is re-raised,
+    like `gather`.
+
+    With `hedge_percentile` (between 0 and 100, e.g. 95), once `hedge_min_samples` downloads have
+    completed, an attempt still running after that percentile of the recent
+    latencies gets a second, identical request; whichever finishes first wins.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[ItemT], Awaitable[ResultT]],
+        max_in_flight: int = 10,
+        max_limit: int | None = None,
+        adaptive: bool = True,
+        max_attempts: int = MAX_ATTEMPTS,
+        latency_target: float | None = None,
+        timeout: float | None = None,
+        backoff: float = BACKOFF_SECONDS,
+        max_backoff: float = MAX_BACKOFF_SECONDS,
+        max_retry_after: float = MAX_RETRY_AFTER_SECONDS,
+        hedge_percentile: float | None = None,
+        hedge_min_samples: int = 20,
+    ) -> None:
+        if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+            raise ValueError(
+                f"hedge_percentile must be between 0 and 100, not {hedge_percentile}"
+            )
+        self.fetch = fetch
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        if not adaptive:
+            max_limit = max_in_flight
+        self.limiter = AIMDLimiter(
+            limit=max_in_flight,
+            min_limit=1 if adaptive else max_in_flight,
+            max_limit=max_limit or max_in_flight * 4,
+            latency_target=latency_target,
+        )
+        self._queue: asyncio.Queue[tuple[int, ItemT, int]] = asyncio.Queue()
+        self._completed = 0
+        self._failed = 0
+        self._throttled = 0
+        self._timed_out = 0
+        self._hedged = 0
+        self._total_latency = 0.0
+        self._recent_latencies: deque[float] = deque(maxlen=200)
+        self._t0 = time.perf_counter()
+        self._t1: float | None = None
+
+    def stats(self) -> CrawlStats:
+        """Return throughput, queue depth and the current limit."""
+        return CrawlStats(
+            completed=self._completed,
+            failed=self._failed,
+            throttled=self._throttled,
+            timed_out=self._timed_out,
+            hedged=self._hedged,
+            in_flight=self.limiter.in_flight,
+            queue_depth=self._queue.qsize(),
+            limit=self.limiter.limit,
+            elapsed_seconds=(self._t1 or time.perf_counter()) - self._t0,
+            mean_latency_seconds=(
+                self._total_latency / self._completed if self._completed else 0.0
+            ),
+        )
+
+    async def run(self, items: Iterable[ItemT]) -> list[ResultT]:
+        """Fetch every item and return the results in the order of `items`."""
+        # Without `return_exceptions` the first error is raised instead.
+        return cast(list[ResultT], await self._run(items, return_exceptions=False))
+
+    async def run_partial(self, items: Iterable[ItemT]) -> list[ResultT | Exception]:
+        """Like `run`, but an item that fails gets its exception as its result."""
+        return await self._run(items, return_exceptions=True)
+
+    async def as_completed(
+        self, items: Iterable[ItemT]
+    ) -> AsyncIterator[tuple[ItemT, ResultT | Exception]]:
+        """Yield `(item, result)` pairs in the order the fetches finish.
+
+        An item that fails is yielded with its exception as its result. Items
+        are only taken from `items` as fast as they're fetched, so however
+        many there are, memory use stays flat.
+        """
+        async with aclosing(self._completed_items(items)) as completed:
+            async for _, item, result in completed:
+                yield item, result
+
+    async def _run(
+        self, items: Iterable[ItemT], return_exceptions: bool
+    ) -> list[ResultT | Exception]:
+        results: dict[int, ResultT | Exception] = {}
+        async with aclosing(self._completed_items(items)) as completed:
+            async for index, _, result in completed:
+                if isinstance(result, Exception) and not return_exceptions:
+                    raise result
+                results[index] = result
+        return [results[index] for index in range(len(results))]
+
+    async def _completed_items(
+        self, items: Iterable[ItemT]
+    ) -> AsyncIterator[tuple[int, ItemT, ResultT | Exception]]:
+        self._t0, self._t1 = time.perf_counter(), None
+        # `None` marks that every item has been queued.
+        finished: asyncio.Queue[tuple[int, ItemT, ResultT | Exception] | None]
+        finished = asyncio.Queue()
+        # Don't queue more items than the workers could be busy with.
+        window = asyncio.Semaphore(self.limiter.max_limit * 2)
+
+        async def feed() -> int:
+            count = 0
+            try:
+                for count, item in enumerate(items, start=1):
+                    await window.acquire()
+                    self._queue.put_nowait((count - 1, item, 1))
+            finally:
+                finished.put_nowait(None)
+            return count
+
+        feeder = asyncio.create_task(feed())
+        workers = [
+            asyncio.create_task(self._worker(finished))
+            for _ in range(self.limiter.max_limit)
+        ]
+        try:
+            yielded, total = 0, None
+            while total is None or yielded < total:
+                entry = await finished.get()
+                if entry is None:
+                    total = feeder.result()  # Re-raise if `items` raised
+                    continue
+                window.release()
+                yielded += 1
+                yield entry
+        finally:
+            for task in (feeder, *workers):
+                task.cancel()
+            await asyncio.gather(feeder, *workers, return_exceptions=True)
+            self._t1 = time.perf_counter()
+
+    async def _worker(
+        self, finished: asyncio.Queue[tuple[int, ItemT, ResultT | Exception] | None]
+    ) -> None:
+        while True:
+            index, item, attempt = await self._queue.get()
+            result: ResultT | Exception
+            try:
+                result = await self._fetch_one(item, attempt)
+            except _Retry as retry:
+                # Back off without holding a slot, then queue the item again.
+                await asyncio.sleep(self._backoff_delay(attempt, retry.after))
+                self._queue.put_nowait((index, item, attempt + 1))
+                continue
+            except Exception as exc:  # noqa: BLE001
+                result = exc
+            finished.put_nowait((index, item, result))
+
+    async def _fetch_one(self, item: ItemT, attempt: int) -> ResultT:
+        await self.limiter.acquire()
+        t0 = time.perf_counter()
+        overloaded = False
+        try:
+            async with asyncio.timeout(self.timeout):
+                result = await self._fetch_hedged(item)
+        except Exception as exc:
+            timed_out = isinstance(exc, TimeoutError)
+            overloaded = timed_out or status_code(exc) in OVERLOAD_STATUSES
+            after = retry_after(exc)
+            if (
+                not overloaded
+                or attempt >= self.max_attempts
+                or (after is not None and after > self.max_retry_after)
+            ):
+                self._failed += 1
+                raise
+            if timed_out:
+                self._timed_out += 1
+            else:
+                self._throttled += 1
+            raise _Retry(after) from exc
+        else:
+            latency = time.perf_counter() - t0
+            self._completed += 1
+            self._total_latency += latency
+            self._recent_latencies.append(latency)
+            return result
+        finally:
+            await self.limiter.release(time.perf_counter() - t0, overloaded)
+
+    async def _fetch_hedged(self, item: ItemT) -> ResultT:
+        """Fetch `item`, racing a second request against a slow first one."""
+        hedge_after = self._hedge_after()
+        if hedge_after is None:
+            return await self.fetch(item)
+        first = asyncio.ensure_future(self.fetch(item))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            if not done:
+                self._hedged += 1
+                pending.add(asyncio.ensure_future(self.fetch(item)))
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return first.result()  # Both failed: raise the first one's error
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _hedge_after(self) -> float | None:
+        if (
+            self.hedge_percentile is None
+            or len(self._recent_latencies) < self.hedge_min_samples
+        ):
+            return None
+        # 999 cut points, so fractional percentiles like 99.5 count too.
+        cut_points = statistics.quantiles(self._recent_latencies, n=1000)
+        rank = min(max(round(self.hedge_percentile * 10), 1), len(cut_points))
+        return cut_points[rank - 1]
+
+    def _backoff_delay(self, attempt: int, after: float | None = None) -> float:
+        return backoff_delay(attempt, after, self.backoff, self.max_backoff)
+
+
+class _Retry(Exception):
+    """Raised by `_fetch_one` when the item should be tried again.
+
+    `after` is how long the server asked us to wait, if it said.
+    """
+
+    def __init__(self, after: float | None = None) -> None:
+        super().__init__(after)
+        self.after = after
+
+
+def call_with_retries(
+    fetch: Callable[[], ResultT],
+    retry_on: tuple[type[Exception], ...] = (TimeoutError,),
+    max_attempts: int = MAX_ATTEMPTS,
+    backoff: float = BACKOFF_SECONDS,
+    max_backoff: float = MAX_BACKOFF_SECONDS,
+    max_retry_after: float = MAX_RETRY_AFTER_SECONDS,
+) -> ResultT:
+    """Call `fetch()`, retrying it with the engine's backoff until it succeeds.
+
+    A 429/5xx is retried, and so is any of `retry_on` (e.g. `requests.Timeout`
+    for a library whose timeouts aren't `TimeoutError`). After `max_attempts`
+    in all, or on any other error, the error is raised.
+    """
+    attempt = 1
+    while True:
+        try:
+            return fetch()
+        except Exception as exc:
+            delay = retry_delay(
+                exc,
+                attempt,
+                retry_on,
+                max_attempts,
+                backoff,
+                max_backoff,
+                max_retry_after,
+            )
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+async def acall_with_retries(
+    fetch: Callable[[], Awaitable[ResultT]],
+    retry_on: tuple[type[Exception], ...] = (TimeoutError,),
+    max_attempts: int = MAX_ATTEMPTS,
+    backoff: float = BACKOFF_SECONDS,
+    max_backoff: float = MAX_BACKOFF_SECONDS,
+    max_retry_after: float = MAX_RETRY_AFTER_SECONDS,
+) -> ResultT:
+    """Like `call_with_retries`, but await `fetch()` and sleep without blocking."""
+    attempt = 1
+    while True:
+        try:
+            return await fetch()
+        except Exception as exc:
+            delay = retry_delay(
+                exc,
+                attempt,
+                retry_on,
+                max_attempts,
+                backoff,
+                max_backoff,
+                max_retry_after,
+            )
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def retry_delay(
+    exc: Exception,
+    attempt: int,
+    retry_on: tuple[type[Exception], ...] = (TimeoutError,),
+    max_attempts: int = MAX_ATTEMPTS,
+    backoff: float = BACKOFF_SECONDS,
+    max_backoff: float = MAX_BACKOFF_SECONDS,
+    max_retry_after: float = MAX_RETRY_AFTER_SECONDS,
+) -> float | None:
+    """How long to wait before retrying after attempt `attempt` failed with `exc`.
+
+    Returns `None` if it shouldn't be retried.
+    """
+    if attempt >= max_attempts or not (
+        isinstance(exc, retry_on) or status_code(exc) in OVERLOAD_STATUSES
+    ):
+        return None
+    after = retry_after(exc)
+    if after is not None and after > max_retry_after:
+        return None
+    return backoff_delay(attempt, after, backoff, max_backoff)
+
+
+def backoff_delay(
+    attempt: int,
+    after: float | None = None,
+    backoff: float = BACKOFF_SECONDS,
+    max_backoff: float = MAX_BACKOFF_SECONDS,
+) -> float:
+    """How long to wait before retry number `attempt` (counting from 1).
+
+    `after` is the server's `Retry-After`, if it sent one. The wait is at least
+    that long. Only the random jitter on top is capped at `max_backoff`; it
+    spreads out retries that the server told to come back together.
+    """
+    jitter = random.uniform(0, min(max_backoff, backoff * 2 ** (attempt - 1)))
+    return max(after or 0.0, 0.0) + jitter
+
+
+def status_code(exc: BaseException) -> int | None:
+    """Pull the HTTP status out of an aiohttp, httpx or requests error."""
+    status = getattr(exc, "status", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds to wait, from the `Retry-After` header of a 429/503 error.
+
+    The header holds either a number of seconds or an HTTP date. Returns
+    `None` for other errors, or when there's no usable header.
+    """
+    if status_code(exc) not in RETRY_AFTER_STATUSES:
+        return None
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("Retry-After") if headers is not None else None
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=UTC)
+    return max((when - datetime.now(UTC)).total_seconds(), 0.0)
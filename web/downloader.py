@@ -0,0 +1,284 @@
+"""Download Pokémon with any of the HTTP clients used in this directory.
+
+The numbered scripts each show one way of downloading. This one runs the same
+crawl through whichever backend you pick by name, so they can be compared like
+for like:
+
+- `requests-sync`: one `requests.Session`, one page at a time.
+- `requests-threaded`: one `requests.Session` shared by a pool of threads.
+- `httpx-sync`: one `httpx.Client`, one page at a time.
+- `httpx-async`: one `httpx.AsyncClient`.
+- `httpx-http2`: the same, allowed to negotiate HTTP/2. Needs the optional
+  `h2` package (`pip install httpx[http2]`).
+- `aiohttp`: one `aiohttp.ClientSession`.
+
+Where a numbered script uses the same client, the backend builds its session
+and fetches pages with that script's own helpers (`make_session`,
+`make_client`, `fetch_text`), so what's compared is the code the scripts run.
+Every backend retries timeouts, dropped connections and 429/5xx replies the
+way the scripts do, and a Pokémon that still fails gets its exception in place
+of its header instead of failing the whole crawl.
+
+Run it with e.g. `python web/downloader.py --backend httpx-async`.
+"""
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import os
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+import aiohttp
+import httpx
+import requests
+from crawl_engine import acall_with_retries, call_with_retries
+from h1_parser import get_h1
+from rich import print
+
+# The numbered scripts whose session setup and fetch helpers the backends share.
+aiohttp_script = importlib.import_module("2_async_aiohttp")
+httpx_script = importlib.import_module("2_async_httpx")
+threaded_script = importlib.import_module("3_threaded")
+
+BASE_URL = os.environ.get("POKEDEX_BASE_URL", "https://pokemondb.net/pokedex")
+
+# Downloads in flight at once for the concurrent backends.
+MAX_IN_FLIGHT = 10
+
+# Give up on (and retry) a download attempt after this long.
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+# Besides 429/5xx replies, retry downloads that fail with these.
+RETRY_ON = (
+    TimeoutError,
+    aiohttp.ClientConnectionError,
+    httpx.TransportError,
+    requests.Timeout,
+    requests.ConnectionError,
+)
+
+HAS_HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Download Pokémon H1s.")
+    parser.add_argument("--backend", choices=available_backends(), default="aiohttp")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    args = parser.parse_args()
+    t0 = time.time()
+    print(f"Downloading with [cyan]{args.backend}[/cyan]...", flush=True)
+    results = download_pokemon_list(
+        args.backend, range(1, args.count + 1), args.base_url, args.max_in_flight
+    )
+    total_seconds = time.time() - t0
+    print(
+        f"\n[bold green]The code ran in [cyan]{total_seconds:,.2f}[green] seconds.",
+        flush=True,
+    )
+    errors = [result for _, result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"[bold red]{len(errors)} Pokémon failed to download.", flush=True)
+    print(f"\n{results=}", flush=True)
+
+
+@dataclass(frozen=True)
+class Download:
+    """One downloaded Pokémon and how long it took, parsing and retries included.
+
+    `header` is the exception instead if the download failed for good.
+    """
+
+    pokemon_num: int
+    header: str | Exception
+    seconds: float
+
+
+def download_pokemon_list(
+    backend: str = "aiohttp",
+    pokemon_nums: Sequence[int] = range(1, 21),
+    base_url: str = BASE_URL,
+    max_in_flight: int = MAX_IN_FLIGHT,
+) -> list[tuple[int, str | Exception]]:
+    """Download a list of Pokémon with the named backend.
+
+    A Pokémon that can't be downloaded gets the exception as its header.
+    """
+    downloads = timed_downloads(backend, pokemon_nums, base_url, max_in_flight)
+    return [(download.pokemon_num, download.header) for download in downloads]
+
+
+def timed_downloads(
+    backend: str,
+    pokemon_nums: Sequence[int],
+    base_url: str = BASE_URL,
+    max_in_flight: int = MAX_IN_FLIGHT,
+) -> list[Download]:
+    """Like `download_pokemon_list`, but keep how long each download took."""
+    if backend not in available_backends():
+        raise ValueError(
+            f"Unknown or unavailable backend {backend!r}, "
+            f"expected one of {', '.join(available_backends())}"
+        )
+    return BACKENDS[backend](base_url, pokemon_nums, max_in_flight)
+
+
+def available_backends() -> list[str]:
+    """Name the backends whose dependencies are installed."""
+    return [name for name in BACKENDS if name != "httpx-http2" or HAS_HTTP2]
+
+
+def requests_sync(
+    base_url: str, pokemon_nums: Sequence[int], max_in_flight: int
+) -> list[Download]:
+    """Download one page at a time; `max_in_flight` is ignored."""
+    with threaded_script.make_session(1) as session:
+        return [
+            timed(
+                num, partial(threaded_script.fetch_text, f"{base_url}/{num}", session)
+            )
+            for num in pokemon_nums
+        ]
+
+
+def requests_threaded(
+    base_url: str, pokemon_nums: Sequence[int], max_in_flight: int
+) -> list[Download]:
+    """Download with `max_in_flight` threads sharing one connection pool."""
+    session = threaded_script.make_session(max_in_flight)
+    with session, ThreadPoolExecutor(max_in_flight) as pool:
+        return list(
+            pool.map(
+                lambda num: timed(
+                    num,
+                    partial(threaded_script.fetch_text, f"{base_url}/{num}", session),
+                ),
+                pokemon_nums,
+            )
+        )
+
+
+def httpx_sync(
+    base_url: str, pokemon_nums: Sequence[int], max_in_flight: int
+) -> list[Download]:
+    """Download one page at a time; `max_in_flight` is ignored."""
+    with httpx.Client(follow_redirects=True, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        return [
+            timed(num, partial(get_httpx, client, f"{base_url}/{num}"))
+            for num in pokemon_nums
+        ]
+
+
+def httpx_async(
+    base_url: str,
+    pokemon_nums: Sequence[int],
+    max_in_flight: int,
+    http2: bool = False,
+) -> list[Download]:
+    """Download up to `max_in_flight` pages at once on an event loop."""
+
+    async def download_all() -> list[Download]:
+        semaphore = asyncio.Semaphore(max_in_flight)
+        async with httpx_script.make_client(http2=http2) as client:
+            return await asyncio.gather(
+                *(
+                    atimed(
+                        num,
+                        partial(httpx_script.fetch_text, client, f"{base_url}/{num}"),
+                        semaphore,
+                    )
+                    for num in pokemon_nums
+                )
+            )
+
+    return asyncio.run(download_all())
+
+
+def aiohttp_async(
+    base_url: str, pokemon_nums: Sequence[int], max_in_flight: int
+) -> list[Download]:
+    """Download up to `max_in_flight` pages at once on an event loop."""
+
+    async def download_all() -> list[Download]:
+        semaphore = asyncio.Semaphore(max_in_flight)
+        async with aiohttp_script.make_session() as session:
+            return await asyncio.gather(
+                *(
+                    atimed(
+                        num,
+                        partial(
+                            aiohttp_script.fetch_text, session, f"{base_url}/{num}"
+                        ),
+                        semaphore,
+                    )
+                    for num in pokemon_nums
+                )
+            )
+
+    return asyncio.run(download_all())
+
+
+Backend = Callable[[str, Sequence[int], int], list[Download]]
+
+BACKENDS: dict[str, Backend] = {
+    "requests-sync": requests_sync,
+    "requests-threaded": requests_threaded,
+    "httpx-sync": httpx_sync,
+    "httpx-async": httpx_async,
+    "httpx-http2": partial(httpx_async, http2=True),
+    "aiohttp": aiohttp_async,
+}
+
+
+def timed(pokemon_num: int, fetch: Callable[[], str]) -> Download:
+    """Fetch (with retries) and parse one page, timing both."""
+    t0 = time.perf_counter()
+    try:
+        header: str | Exception = get_h1(call_with_retries(fetch, RETRY_ON))
+    except Exception as exc:  # noqa: BLE001
+        header = exc
+    seconds = time.perf_counter() - t0
+    print(f"[green]Retrieved [magenta]{pokemon_num:02}={header}", flush=True)
+    return Download(pokemon_num, header, seconds)
+
+
+async def atimed(
+    pokemon_num: int,
+    fetch: Callable[[], Awaitable[str]],
+    semaphore: asyncio.Semaphore,
+) -> Download:
+    """Fetch (with retries) and parse one page once `semaphore` lets it, timing both.
+
+    Each attempt is given up on after `REQUEST_TIMEOUT_SECONDS`.
+    """
+
+    async def fetch_in_time() -> str:
+        async with asyncio.timeout(REQUEST_TIMEOUT_SECONDS):
+            return await fetch()
+
+    async with semaphore:
+        t0 = time.perf_counter()
+        try:
+            header: str | Exception = get_h1(
+                await acall_with_retries(fetch_in_time, RETRY_ON)
+            )
+        except Exception as exc:  # noqa: BLE001
+            header = exc
+        seconds = time.perf_counter() - t0
+    print(f"[green]Retrieved [magenta]{pokemon_num:02}={header}", flush=True)
+    return Download(pokemon_num, header, seconds)
+
+
+def get_httpx(client: httpx.Client, url: str) -> str:
+    resp = client.get(url)
+    resp.raise_for_status()
+    return resp.text
+
+
+if __name__ == "__main__":
+    main()
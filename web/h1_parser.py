@@ -0,0 +1,170 @@
+"""Find the first H1 on a page without building a whole BeautifulSoup tree.
+
+Every downloader only wants the text of the first `<h1>`. BeautifulSoup builds
+a tree of the entire page to get it. `H1Parser` uses the same tokenizer
+(`html.parser.HTMLParser`) but keeps nothing except the H1's text, and stops
+as soon as that H1 closes. It can be fed a page in chunks as they arrive, so
+a download can stop reading the body once the H1 has been found.
+"""
+import codecs
+from collections.abc import AsyncIterable, Callable, Iterable
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+# BeautifulSoup leaves the text inside these tags out of `.text`.
+_HIDDEN_TEXT_TAGS = frozenset({"script", "style", "template", "rt", "rp"})
+# ...and keeps whitespace as is inside these, instead of collapsing it.
+_PRESERVE_WHITESPACE_TAGS = frozenset({"pre", "textarea"})
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+
+class _H1Closed(Exception):
+    """Raised from inside the parser to stop it once the first H1 is done."""
+
+
+class H1Parser(HTMLParser):
+    """Incrementally collect the text of the first `<h1>` tag.
+
+    Text is gathered the way BeautifulSoup's `.text` would: a run of text
+    that is only whitespace collapses to a single newline or space, and text
+    inside `<script>`, `<style>` and friends is skipped.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.done = False
+        self._depth = 0
+        self._hidden_depth = 0
+        self._preserve_depth = 0
+        self._found = False
+        self._pending: list[str] = []
+        self._parts: list[str] = []
+
+    @property
+    def text(self) -> str | None:
+        """The H1's text so far, or `None` if no H1 has started."""
+        return "".join(self._parts + self._pending) if self._found else None
+
+    def feed(self, data: str) -> None:
+        """Parse another chunk of the page. Does nothing once the H1 is done."""
+        if self.done:
+            return
+        try:
+            super().feed(data)
+        except _H1Closed:
+            self.done = True
+
+    def close(self) -> None:
+        """Flush any buffered text at the end of the page."""
+        if self.done:
+            return
+        try:
+            super().close()
+        except _H1Closed:
+            pass
+        self._end_text()
+        self.done = True
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self._end_text()
+        if tag == "h1" and (self._depth or not self._found):
+            self._found = True
+            self._depth += 1
+        elif self._depth and tag in _HIDDEN_TEXT_TAGS:
+            self._hidden_depth += 1
+        elif self._depth and tag in _PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        self._end_text()
+        if tag == "h1" and self._depth:
+            self._depth -= 1
+            if not self._depth:
+                raise _H1Closed
+        elif self._hidden_depth and tag in _HIDDEN_TEXT_TAGS:
+            self._hidden_depth -= 1
+        elif self._preserve_depth and tag in _PRESERVE_WHITESPACE_TAGS:
+            self._preserve_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._depth and not self._hidden_depth:
+            self._pending.append(data)
+
+    def handle_comment(self, data: str) -> None:
+        self._end_text()
+
+    def unknown_decl(self, data: str) -> None:
+        self._end_text()
+        if data.upper().startswith("CDATA["):
+            self.handle_data(data[len("CDATA[") :])
+            self._end_text()
+
+    def _end_text(self) -> None:
+        """Finish the current run of text, as BeautifulSoup does at each tag."""
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
+        if not self._preserve_depth and not text.strip(_ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        self._parts.append(text)
+
+
+def get_h1(html: str) -> str:
+    """Parse the HTML and return the first H1 tag."""
+    parser = H1Parser()
+    parser.feed(html)
+    return _header(parser)
+
+
+def get_h1_from_chunks(chunks: Iterable[str | bytes], encoding: str = "utf-8") -> str:
+    """Feed a page to an `H1Parser` chunk by chunk until the first H1 closes.
+
+    Stops pulling chunks as soon as the H1 is found, so the caller can close
+    the response without reading (or decoding) the rest of the page.
+    """
+    parser, decode = H1Parser(), _decoder(encoding)
+    for chunk in chunks:
+        parser.feed(decode(chunk))
+        if parser.done:
+            break
+    return _header(parser)
+
+
+async def aget_h1_from_chunks(
+    chunks: AsyncIterable[str | bytes], encoding: str = "utf-8"
+) -> str:
+    """Like `get_h1_from_chunks`, but for a response body read asynchronously."""
+    parser, decode = H1Parser(), _decoder(encoding)
+    async for chunk in chunks:
+        parser.feed(decode(chunk))
+        if parser.done:
+            break
+    return _header(parser)
+
+
+def get_h1_soup(html: str) -> str:
+    """Parse the HTML with BeautifulSoup and return the first H1 tag.
+
+    This is the original, full-tree implementation, kept as a reference.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.h1.text
+
+
+def _header(parser: H1Parser) -> str:
+    parser.close()
+    if parser.text is None:
+        raise ValueError("The page has no <h1> tag")
+    return parser.text
+
+
+def _decoder(encoding: str) -> Callable[[str | bytes], str]:
+    """Return a function that decodes byte chunks, even if split mid-character."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    def decode(chunk: str | bytes) -> str:
+        return chunk if isinstance(chunk, str) else decoder.decode(chunk)
+
+    return decode
@@ -0,0 +1,247 @@
+"""An on-disk HTTP cache shared by the requests, httpx and aiohttp downloaders.
+
+Bodies are stored one file per URL. A small JSON index records each URL's
+validators (`ETag` / `Last-Modified`), charset, size and when it was stored.
+The index is kept in least-recently-used order, so once the cache grows past
+`max_bytes` the stalest pages are evicted first.
+
+Within `ttl` seconds a cached page is used without touching the network.
+After that it's revalidated with a conditional request, and a
+`304 Not Modified` reply reuses the body on disk. If another thread evicted
+the page in the meantime, the `304` is no use, and the page is fetched again
+unconditionally.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import astuple, dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+import aiohttp
+import httpx
+import requests
+
+DEFAULT_DIRECTORY = Path(__file__).with_name(".http_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# requests waits forever for a stalled server unless it's given a timeout.
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+
+@dataclass
+class CacheEntry:
+    """What the index knows about one cached URL."""
+
+    filename: str
+    etag: str | None
+    last_modified: str | None
+    charset: str
+    size: int
+    stored_at: float
+
+
+class HTTPCache:
+    """A size-bounded LRU cache of response bodies, revalidated after `ttl`.
+
+    Safe to share between threads. Use it as a context manager, or call
+    `save()`, to write the index back to disk.
+    """
+
+    def __init__(
+        self,
+        directory: Path = DEFAULT_DIRECTORY,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._total_bytes = 0
+        self._load()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.save()
+
+    def summary(self) -> str:
+        """Describe the hit/miss counters, for the final timing printout."""
+        return (
+            f"{self.hits} hits, {self.revalidated} revalidated (304), "
+            f"{self.misses} misses"
+        )
+
+    def cached_text(self, url: str) -> str | None:
+        """Return the cached body if it's younger than `ttl`, else `None`."""
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None or time.time() - entry.stored_at > self.ttl:
+                return None
+            text = self._read(url, entry)
+            if text is not None:
+                self._index.move_to_end(url)
+                self.hits += 1
+            return text
+
+    def validators(self, url: str) -> dict[str, str]:
+        """Return the headers that turn a request into a conditional one."""
+        with self._lock:
+            entry = self._index.get(url)
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def not_modified(self, url: str) -> str | None:
+        """Record a `304 Not Modified` reply and return the cached body.
+
+        Returns `None` if the page was evicted since its validators were sent,
+        in which case it has to be fetched again without them.
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            text = None if entry is None else self._read(url, entry)
+            if text is None:
+                return None
+            entry.stored_at = time.time()
+            self._index.move_to_end(url)
+            self.revalidated += 1
+            return text
+
+    def store(
+        self, url: str, body: bytes, headers: Mapping[str, str], charset: str | None
+    ) -> str:
+        """Cache a freshly downloaded body and return it decoded."""
+        entry = CacheEntry(
+            filename=hashlib.sha1(url.encode()).hexdigest(),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            charset=charset or "utf-8",
+            size=len(body),
+            stored_at=time.time(),
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            # Written under the lock, so an eviction can't delete it meanwhile.
+            (self.directory / entry.filename).write_bytes(body)
+            self.misses += 1
+            old = self._index.pop(url, None)
+            self._total_bytes += entry.size - (old.size if old else 0)
+            self._index[url] = entry
+            self._evict()
+        return body.decode(entry.charset, errors="replace")
+
+    def save(self) -> None:
+        """Write the index to disk (atomically, so a crash can't corrupt it)."""
+        with self._lock:
+            index = {url: astuple(entry) for url, entry in self._index.items()}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / "index.json.tmp"
+        tmp_path.write_text(json.dumps(index, separators=(",", ":")))
+        os.replace(tmp_path, self.directory / "index.json")
+
+    def _load(self) -> None:
+        try:
+            index = json.loads((self.directory / "index.json").read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for url, fields in index.items():
+            entry = CacheEntry(*fields)
+            self._index[url] = entry
+            self._total_bytes += entry.size
+
+    def _read(self, url: str, entry: CacheEntry) -> str | None:
+        """Read `url`'s body, or forget it and return `None` if it's gone.
+
+        Call with the lock held.
+        """
+        try:
+            body = (self.directory / entry.filename).read_bytes()
+        except FileNotFoundError:
+            del self._index[url]
+            self._total_bytes -= entry.size
+            return None
+        return body.decode(entry.charset, errors="replace")
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits `max_bytes`."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            _, entry = self._index.popitem(last=False)
+            self._total_bytes -= entry.size
+            (self.directory / entry.filename).unlink(missing_ok=True)
+
+
+def cached_get_requests(
+    cache: HTTPCache,
+    url: str,
+    session: requests.Session | None = None,
+    timeout: float | None = REQUEST_TIMEOUT_SECONDS,
+) -> str:
+    """GET `url` through `cache` with requests and return the body.
+
+    Gives up on a server that stalls for `timeout` seconds (`None` waits
+    forever).
+    """
+    if (text := cache.cached_text(url)) is not None:
+        return text
+    http = session or requests
+    resp = http.get(
+        url, headers=cache.validators(url), allow_redirects=True, timeout=timeout
+    )
+    if resp.status_code == 304:
+        if (text := cache.not_modified(url)) is not None:
+            return text
+        resp = http.get(url, allow_redirects=True, timeout=timeout)
+    resp.raise_for_status()
+    return cache.store(url, resp.content, resp.headers, resp.encoding)
+
+
+async def cached_get_httpx(
+    cache: HTTPCache, client: httpx.AsyncClient, url: str
+) -> str:
+    """GET `url` through `cache` with httpx and return the body."""
+    if (text := cache.cached_text(url)) is not None:
+        return text
+    resp = await client.get(url, headers=cache.validators(url), follow_redirects=True)
+    if resp.status_code == 304:
+        if (text := cache.not_modified(url)) is not None:
+            return text
+        resp = await client.get(url, follow_redirects=True)
+    resp.raise_for_status()
+    return cache.store(url, resp.content, resp.headers, resp.charset_encoding)
+
+
+async def cached_get_aiohttp(
+    cache: HTTPCache, session: aiohttp.ClientSession, url: str
+) -> str:
+    """GET `url` through `cache` with aiohttp and return the body."""
+    if (text := cache.cached_text(url)) is not None:
+        return text
+    async with session.get(url, headers=cache.validators(url)) as resp:
+        if resp.status != 304:
+            resp.raise_for_status()
+            return cache.store(url, await resp.read(), resp.headers, resp.charset)
+        if (text := cache.not_modified(url)) is not None:
+            return text
+    async with session.get(url) as resp:
+        resp.raise_for_status()
+        return cache.store(url, await resp.read(), resp.headers, resp.charset)
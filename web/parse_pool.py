@@ -0,0 +1,94 @@
+"""Parse pages off the event loop, in a thread or process pool.
+
+`get_h1` is CPU bound: while BeautifulSoup works through a page, the event loop
+can't service any of the other downloads in flight. `ParseStage` takes pages
+from the fetchers through a bounded queue and runs the parser in an executor.
+A full queue makes fetchers wait, so parsing falling behind slows fetching
+down instead of piling pages up in memory.
+"""
+import asyncio
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor
+from types import TracebackType
+from typing import Any, Self
+
+
+class ParseStage:
+    """Feed HTML pages through a queue to `parse` running in `executor`.
+
+    With a `ProcessPoolExecutor`, `parse` must be a module level function so
+    it can be pickled, and so must whatever is passed to it.
+    """
+
+    def __init__(
+        self,
+        parse: Callable[..., str],
+        executor: Executor,
+        workers: int | None = None,
+        queue_size: int | None = None,
+    ) -> None:
+        self.parse_func = parse
+        self.executor = executor
+        self.workers = workers or os.cpu_count() or 1
+        self._queue: asyncio.Queue[
+            tuple[tuple[Any, ...], asyncio.Future[str]]
+        ] = asyncio.Queue(queue_size or self.workers * 2)
+        self.max_queue_depth = 0
+        self.blocked_seconds = 0.0
+        self._worker_tasks: list[asyncio.Task[None]] = []
+
+    async def __aenter__(self) -> Self:
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+    @property
+    def queue_depth(self) -> int:
+        """Pages waiting for a parser."""
+        return self._queue.qsize()
+
+    async def parse(self, *args: Any) -> str:
+        """Queue a page (usually its HTML) for parsing and wait for the result.
+
+        While the queue is full this waits for room; `blocked_seconds` adds
+        up how long callers were held back that way.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self._queue.full():
+            t0 = time.perf_counter()
+            await self._queue.put((args, future))
+            self.blocked_seconds += time.perf_counter() - t0
+        else:
+            self._queue.put_nowait((args, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            args, future = await self._queue.get()
+            try:
+                result = await loop.run_in_executor(
+                    self.executor, self.parse_func, *args
+                )
+            except Exception as exc:  # noqa: BLE001
+                if not future.cancelled():
+                    future.set_exception(exc)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
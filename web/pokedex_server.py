@@ -0,0 +1,367 @@
+"""A local stand-in for 'pokemondb.net' to benchmark the downloaders against.
+
+Run it on its own with `python web/pokedex_server.py` (see `--help` for the
+latency, jitter, error rate and rate limit it can inject) and point the
+downloaders at it with `POKEDEX_BASE_URL=http://127.0.0.1:8080/pokedex`.
+Or start it from a benchmark with `serve_in_thread()` or, to keep it from
+competing with the code under test for the GIL, `serve_in_process()`.
+
+Injected faults are drawn from a seeded random number generator, so the same
+settings give the same error and jitter rates on every run.
+"""
+import argparse
+import asyncio
+import functools
+import multiprocessing
+import random
+import threading
+import time
+import zlib
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from multiprocessing.connection import Connection
+
+from aiohttp import web
+from rich import print
+
+POKEMON_NAMES = (
+    "Bulbasaur", "Ivysaur", "Venusaur", "Charmander", "Charmeleon", "Charizard",
+    "Squirtle", "Wartortle", "Blastoise", "Caterpie", "Metapod", "Butterfree",
+    "Weedle", "Kakuna", "Beedrill", "Pidgey", "Pidgeotto", "Pidgeot", "Rattata",
+    "Raticate", "Spearow", "Fearow", "Ekans", "Arbok", "Pikachu", "Raichu",
+    "Sandshrew", "Sandslash", "Nidoran♀", "Nidorina", "Nidoqueen", "Nidoran♂",
+    "Nidorino", "Nidoking", "Clefairy", "Clefable", "Vulpix", "Ninetales",
+    "Jigglypuff", "Wigglytuff", "Zubat", "Golbat", "Oddish", "Gloom", "Vileplume",
+    "Paras", "Parasect", "Venonat", "Venomoth", "Diglett", "Dugtrio", "Meowth",
+    "Persian", "Psyduck", "Golduck", "Mankey", "Primeape", "Growlithe", "Arcanine",
+    "Poliwag", "Poliwhirl", "Poliwrath", "Abra", "Kadabra", "Alakazam", "Machop",
+    "Machoke", "Machamp", "Bellsprout", "Weepinbell", "Victreebel", "Tentacool",
+    "Tentacruel", "Geodude", "Graveler", "Golem", "Ponyta", "Rapidash", "Slowpoke",
+    "Slowbro", "Magnemite", "Magneton", "Farfetch'd", "Doduo", "Dodrio", "Seel",
+    "Dewgong", "Grimer", "Muk", "Shellder", "Cloyster", "Gastly", "Haunter",
+    "Gengar", "Onix", "Drowzee", "Hypno", "Krabby", "Kingler", "Voltorb",
+    "Electrode", "Exeggcute", "Exeggutor", "Cubone", "Marowak", "Hitmonlee",
+    "Hitmonchan", "Lickitung", "Koffing", "Weezing", "Rhyhorn", "Rhydon",
+    "Chansey", "Tangela", "Kangaskhan", "Horsea", "Seadra", "Goldeen", "Seaking",
+    "Staryu", "Starmie", "Mr. Mime", "Scyther", "Jynx", "Electabuzz", "Magmar",
+    "Pinsir", "Tauros", "Magikarp", "Gyarados", "Lapras", "Ditto", "Eevee",
+    "Vaporeon", "Jolteon", "Flareon", "Porygon", "Omanyte", "Omastar", "Kabuto",
+    "Kabutops", "Aerodactyl", "Snorlax", "Articuno", "Zapdos", "Moltres",
+    "Dratini", "Dragonair", "Dragonite", "Mewtwo", "Mew",
+)  # fmt: skip
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a stand-in Pokédex.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    for field in fields(ServerSettings):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}",
+            type=type(field.default),
+            help=f"default: {field.default}",
+        )
+    args = parser.parse_args()
+    settings = ServerSettings(
+        **{
+            field.name: getattr(args, field.name)
+            for field in fields(ServerSettings)
+            if getattr(args, field.name) is not None
+        }
+    )
+    print(
+        f"[bold green]Serving the Pokédex on [cyan]http://{args.host}:{args.port}/pokedex"
+    )
+    print(f"[green]{settings}")
+    web.run_app(
+        make_app(settings), host=args.host, port=args.port, access_log=None, print=None
+    )
+
+
+def pokemon_name(pokemon_num: int) -> str:
+    """Return the name of a Pokémon, inventing one past the first generation."""
+    if 1 <= pokemon_num <= len(POKEMON_NAMES):
+        return POKEMON_NAMES[pokemon_num - 1]
+    return f"Pokémon #{pokemon_num:04}"
+
+
+def render_page(pokemon_num: int, table_rows: int = 600) -> str:
+    """Render a Pokédex page shaped like the real one: a big head, then the H1."""
+    name = pokemon_name(pokemon_num)
+    head = "\n".join(
+        f'<link rel="preload" href="/static/chunk-{i:03}.js" as="script">'
+        for i in range(40)
+    )
+    rows = "\n".join(
+        f'<tr><th>Stat {i}</th><td class="cell-num">{(pokemon_num * 31 + i) % 255}'
+        f'</td><td><div class="barchart-bar" style="width:{i % 100}%"></div></td></tr>'
+        for i in range(table_rows)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{name} Pokédex: stats, moves, evolution &amp; locations | Pokémon Database</title>
+{head}
+</head>
+<body>
+<nav class="main-menu"><a href="/">Pokémon Database</a> <a href="/pokedex">Pokédex</a></nav>
+<main class="main-content grid-container">
+<h1>{name}</h1>
+<p>{name} is Pokémon number <em>{pokemon_num:04}</em> in the National Pokédex.</p>
+<table class="vitals-table"><tbody>
+{rows}
+</tbody></table>
+</main>
+</body>
+</html>
+"""
+
+
+@dataclass(frozen=True)
+class ServerSettings:
+    """How the stand-in server should behave."""
+
+    # Wait `latency` seconds before answering each page request.
+    latency: float = 0.0
+    # Rows in each page's stats table; the default makes pages about 70 KB.
+    table_rows: int = 600
+    # Send pages `chunk_bytes` at a time, waiting `chunk_delay` seconds before
+    # each chunk, like a slow link would. 0 sends each page in one go.
+    chunk_bytes: int = 0
+    chunk_delay: float = 0.0
+    # Add up to `jitter` more seconds of latency, picked at random per request.
+    jitter: float = 0.0
+    # Answer this fraction of page requests with a 503 Service Unavailable.
+    error_rate: float = 0.0
+    # Answer with 429 Too Many Requests once clients go over `rate_limit`
+    # requests per second (with bursts of up to `rate_limit` requests, or one
+    # request when that's less than one).
+    # 0 means no limit.
+    rate_limit: float = 0.0
+    # Seed for the random jitter and errors.
+    seed: int = 0
+    # Keep this many rendered pages in memory. Set it to at least the number of
+    # Pokémon a benchmark requests, or pages get rendered again mid-run.
+    cached_pages: int = 1024
+
+
+class TokenBucket:
+    """Allow `rate` requests per second, in bursts of up to `rate` requests.
+
+    The bucket always holds at least one token's worth, so rates below one
+    request per second still let a request through now and then.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        """Spend a token if there is one."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+DEFAULT_SETTINGS = ServerSettings()
+
+SETTINGS = web.AppKey("settings", ServerSettings)
+STATS = web.AppKey("stats", dict[str, int])
+RANDOM = web.AppKey("random", random.Random)
+BUCKET = web.AppKey("bucket", TokenBucket)
+PAGES = web.AppKey("pages", Callable[[int, int], tuple[bytes, str]])
+
+# How long `serve_in_thread()` and `serve_in_process()` wait for the server to
+# start listening before giving up.
+STARTUP_TIMEOUT_SECONDS = 10.0
+
+# The pages never change, so they all claim the same modification date.
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+async def pokedex_handler(request: web.Request) -> web.StreamResponse:
+    """Serve a single Pokédex page."""
+    settings: ServerSettings = request.app[SETTINGS]
+    stats: dict[str, int] = request.app[STATS]
+    stats["requests"] += 1
+    if settings.rate_limit and not request.app[BUCKET].take():
+        stats["rate_limited"] += 1
+        return web.Response(status=429, headers={"Retry-After": "1"})
+    rng = request.app[RANDOM]
+    delay = settings.latency + rng.uniform(0, settings.jitter)
+    if delay:
+        await asyncio.sleep(delay)
+    if rng.random() < settings.error_rate:
+        stats["errors"] += 1
+        return web.Response(status=503)
+    pokemon_num = int(request.match_info["pokemon_num"])
+    body, etag = request.app[PAGES](pokemon_num, settings.table_rows)
+    validators = {"ETag": etag, "Last-Modified": LAST_MODIFIED}
+    if request.headers.get("If-None-Match") == validators["ETag"] or (
+        "If-None-Match" not in request.headers
+        and request.headers.get("If-Modified-Since") == LAST_MODIFIED
+    ):
+        stats["not_modified"] += 1
+        return web.Response(status=304, headers=validators)
+    if not settings.chunk_bytes:
+        stats["bytes_sent"] += len(body)
+        return web.Response(
+            body=body, content_type="text/html", charset="utf-8", headers=validators
+        )
+    resp = web.StreamResponse(headers=validators)
+    resp.content_type, resp.charset = "text/html", "utf-8"
+    resp.content_length = len(body)
+    await resp.prepare(request)
+    for start in range(0, len(body), settings.chunk_bytes):
+        await asyncio.sleep(settings.chunk_delay)
+        chunk = body[start : start + settings.chunk_bytes]
+        try:
+            await resp.write(chunk)
+        except ConnectionResetError:
+            return resp  # The client has stopped reading
+        stats["bytes_sent"] += len(chunk)
+    await resp.write_eof()
+    return resp
+
+
+def page_body(pokemon_num: int, table_rows: int) -> tuple[bytes, str]:
+    """Render and encode a page, returning it with its ETag.
+
+    Each app caches these, keeping up to `ServerSettings.cached_pages` of them.
+    """
+    body = render_page(pokemon_num, table_rows).encode()
+    return body, f'"{zlib.crc32(body):08x}"'
+
+
+async def stats_handler(request: web.Request) -> web.Response:
+    """Report how many requests, 304s and page bytes have been served so far."""
+    return web.json_response(request.app[STATS])
+
+
+def make_app(settings: ServerSettings = DEFAULT_SETTINGS) -> web.Application:
+    """Build the stand-in Pokédex application."""
+    app = web.Application()
+    app[SETTINGS] = settings
+    app[STATS] = {
+        "requests": 0,
+        "not_modified": 0,
+        "errors": 0,
+        "rate_limited": 0,
+        "bytes_sent": 0,
+    }
+    app[RANDOM] = random.Random(settings.seed)
+    app[BUCKET] = TokenBucket(settings.rate_limit)
+    app[PAGES] = functools.lru_cache(maxsize=settings.cached_pages)(page_body)
+    app.router.add_get("/pokedex/{pokemon_num:\\d+}", pokedex_handler)
+    app.router.add_get("/stats", stats_handler)
+    return app
+
+
+@contextmanager
+def serve_in_thread(
+    settings: ServerSettings = DEFAULT_SETTINGS,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> Iterator[str]:
+    """Serve the Pokédex from a background thread and yield its base URL.
+
+    Raises the server's error if it can't start (e.g. the port is taken), or
+    `TimeoutError` if it hasn't started after `STARTUP_TIMEOUT_SECONDS`.
+    """
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(make_app(settings), access_log=None)
+    started = threading.Event()
+    startup_errors: list[Exception] = []
+
+    def serve() -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(runner.setup())
+            loop.run_until_complete(web.TCPSite(runner, host, port).start())
+        except Exception as exc:  # noqa: BLE001
+            startup_errors.append(exc)
+        started.set()
+        if not startup_errors:
+            loop.run_forever()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    if not started.wait(STARTUP_TIMEOUT_SECONDS):
+        loop.call_soon_threadsafe(loop.stop)
+        raise TimeoutError(
+            f"The Pokédex server didn't start in {STARTUP_TIMEOUT_SECONDS}s"
+        )
+    if startup_errors:
+        thread.join()
+        raise startup_errors[0]
+    bound_port = runner.addresses[0][1]
+    try:
+        yield f"http://{host}:{bound_port}/pokedex"
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+@contextmanager
+def serve_in_process(
+    settings: ServerSettings = DEFAULT_SETTINGS,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> Iterator[str]:
+    """Serve the Pokédex from a child process and yield its base URL.
+
+    Raises the server's error if it can't start, or `TimeoutError` if it hasn't
+    started after `STARTUP_TIMEOUT_SECONDS`, like `serve_in_thread()`.
+    """
+    receive_port, send_port = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_serve_forever, args=(settings, host, port, send_port), daemon=True
+    )
+    process.start()
+    if not receive_port.poll(STARTUP_TIMEOUT_SECONDS):
+        process.terminate()
+        process.join()
+        raise TimeoutError(
+            f"The Pokédex server didn't start in {STARTUP_TIMEOUT_SECONDS}s"
+        )
+    bound_port = receive_port.recv()
+    if isinstance(bound_port, Exception):
+        process.join()
+        raise bound_port
+    try:
+        yield f"http://{host}:{bound_port}/pokedex"
+    finally:
+        process.terminate()
+        process.join()
+
+
+def _serve_forever(
+    settings: ServerSettings, host: str, port: int, send_port: Connection
+) -> None:
+    async def serve() -> None:
+        runner = web.AppRunner(make_app(settings), access_log=None)
+        try:
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+        except Exception as exc:  # noqa: BLE001
+            send_port.send(exc)  # Raised again by `serve_in_process()`
+            await runner.cleanup()
+            return
+        send_port.send(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Write `(pokemon_num, header)` results to a JSONL or CSV file as they arrive.
+
+Paired with the downloaders' `iter_pokemon()` generators, a crawl of any size
+keeps only a handful of results in memory: each one is written out as soon as
+it completes, in completion order.
+"""
+import csv
+import json
+from collections.abc import AsyncIterable, Iterable
+from pathlib import Path
+from types import TracebackType
+from typing import Self, TextIO
+
+FORMATS = (".jsonl", ".csv")
+
+
+class ResultSink:
+    """Append results to `path`, choosing JSONL or CSV by its suffix.
+
+    Each row holds `pokemon_num`, `header`, and `error`, which is empty unless
+    the Pokémon failed to download. Use it as a context manager to close the
+    file.
+    """
+
+    def __init__(self, path: Path, flush_every: int = 100) -> None:
+        self.path = Path(path)
+        if self.path.suffix not in FORMATS:
+            raise ValueError(f"Expected a {' or '.join(FORMATS)} file, got {path}")
+        self.flush_every = flush_every
+        self.written = 0
+        self._file: TextIO = self.path.open("w", newline="", encoding="utf-8")
+        self._csv = None
+        if self.path.suffix == ".csv":
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(("pokemon_num", "header", "error"))
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        self._file.close()
+
+    def write(self, pokemon_num: int, header: str | Exception) -> None:
+        """Write one result (or the error it failed with)."""
+        error = ""
+        if isinstance(header, Exception):
+            header, error = "", f"{type(header).__name__}: {header}"
+        if self._csv is not None:
+            self._csv.writerow((pokemon_num, header, error))
+        else:
+            row = {"pokemon_num": pokemon_num, "header": header, "error": error}
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.written += 1
+        if self.written % self.flush_every == 0:
+            self._file.flush()
+
+    def write_all(self, results: Iterable[tuple[int, str | Exception]]) -> int:
+        """Write every result from a (sync) iterator; return how many."""
+        for pokemon_num, header in results:
+            self.write(pokemon_num, header)
+        return self.written
+
+    async def awrite_all(
+        self, results: AsyncIterable[tuple[int, str | Exception]]
+    ) -> int:
+        """Write every result from an async iterator; return how many."""
+        async for pokemon_num, header in results:
+            self.write(pokemon_num, header)
+        return self.written
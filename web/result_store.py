@@ -0,0 +1,144 @@
+"""A persistent store of parsed `(pokemon_num, header)` results.
+
+Each result is kept in SQLite next to a hash of the page it was parsed from
+and the time it was last checked. A crawl can then:
+
+- skip Pokémon it already has a result for, without fetching or parsing, and
+- with `refresh`, re-fetch only results older than `max_age`, skipping the
+  parse too when the page's hash hasn't changed.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+DEFAULT_PATH = Path(__file__).with_name(".results.sqlite3")
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class StoredResult:
+    """One remembered result and where it came from."""
+
+    pokemon_num: int
+    content_hash: str
+    header: str
+    checked_at: float
+
+
+class ResultStore:
+    """Remember parsed headers by Pokédex number and page content hash.
+
+    Safe to share between threads. Use it as a context manager, or call
+    `close()`, to release the database.
+    """
+
+    def __init__(
+        self, path: Path = DEFAULT_PATH, max_age: float = DEFAULT_MAX_AGE_SECONDS
+    ) -> None:
+        self.max_age = max_age
+        self.reused = 0
+        self.unchanged = 0
+        self.parsed = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " pokemon_num INTEGER PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " header TEXT NOT NULL,"
+            " checked_at REAL NOT NULL)"
+        )
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Commit anything outstanding and close the database."""
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def summary(self) -> str:
+        """Describe how much work the store saved, for the final printout."""
+        return (
+            f"{self.reused} reused without fetching, "
+            f"{self.unchanged} unchanged pages not re-parsed, {self.parsed} parsed"
+        )
+
+    def known(
+        self, pokemon_nums: Iterable[int], refresh: bool = False
+    ) -> dict[int, str]:
+        """Return the stored headers that can be used without fetching.
+
+        That's every stored result, or with `refresh` only those checked
+        within `max_age`.
+        """
+        oldest = time.time() - self.max_age if refresh else float("-inf")
+        wanted = set(pokemon_nums)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT pokemon_num, header FROM results WHERE checked_at >= ?",
+                (oldest,),
+            ).fetchall()
+        known = {num: header for num, header in rows if num in wanted}
+        with self._lock:
+            self.reused += len(known)
+        return known
+
+    def get(self, pokemon_num: int) -> StoredResult | None:
+        """Return everything stored about one Pokémon."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT pokemon_num, content_hash, header, checked_at"
+                " FROM results WHERE pokemon_num = ?",
+                (pokemon_num,),
+            ).fetchone()
+        return StoredResult(*row) if row else None
+
+    def header_for(self, pokemon_num: int, content_hash: str) -> str | None:
+        """Return the stored header if it was parsed from this exact page.
+
+        A match also marks the result as freshly checked.
+        """
+        stored = self.get(pokemon_num)
+        if stored is None or stored.content_hash != content_hash:
+            return None
+        with self._lock:
+            self._db.execute(
+                "UPDATE results SET checked_at = ? WHERE pokemon_num = ?",
+                (time.time(), pokemon_num),
+            )
+            self._db.commit()
+            self.unchanged += 1
+        return stored.header
+
+    def put(self, pokemon_num: int, content_hash: str, header: str) -> None:
+        """Store the header freshly parsed from a page."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (pokemon_num, content_hash, header, time.time()),
+            )
+            self._db.commit()
+            self.parsed += 1
+
+
+def content_hash(text: str) -> str:
+    """Hash a page's content to tell whether it changed since it was parsed."""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()